@@ -1,33 +1,28 @@
 # Base Agent Class
 from abc import ABC, abstractmethod
-from openai import OpenAI
-import os
 import json
+from typing import Optional
+from app.services.llm_scheduler import llm_scheduler, PRIORITY_DIAGNOSIS
+from app.services.providers import chat_model, get_chat_client
+from app.services.single_flight import llm_flights, request_key
 
 class BaseAgent(ABC):
     """Base class for all GYAAN-AI agents"""
     
+    priority = PRIORITY_DIAGNOSIS
+    
     def __init__(self):
         self.client = self._get_client()
         self.name = "BaseAgent"
         self.description = "Base agent class"
     
     def _get_client(self):
-        """Get OpenAI or Groq client"""
-        openai_key = os.getenv("OPENAI_API_KEY")
-        groq_key = os.getenv("GROQ_API_KEY")
-        
-        if openai_key:
-            return OpenAI(api_key=openai_key)
-        elif groq_key:
-            return OpenAI(api_key=groq_key, base_url="https://api.groq.com/openai/v1")
-        return None
+        """Get OpenAI or Groq client (shared, created on first use)"""
+        return get_chat_client()
     
     def _get_model(self):
         """Get model name based on available API"""
-        if os.getenv("OPENAI_API_KEY"):
-            return "gpt-3.5-turbo"
-        return "llama-3.1-70b-versatile"
+        return chat_model()
     
     @abstractmethod
     def get_system_prompt(self) -> str:
@@ -39,13 +34,18 @@ class BaseAgent(ABC):
         """Analyze input and return results"""
         pass
     
-    def _call_llm(self, prompt: str) -> dict:
-        """Make LLM API call and parse response"""
+    def _call_llm(self, prompt: str, tenant: str = None) -> dict:
+        """Make LLM API call and parse response (the canned fallback when it fails)"""
+        result = self._try_llm(prompt, tenant)
+        return result if result is not None else self._fallback_response()
+    
+    def _try_llm(self, prompt: str, tenant: str = None) -> Optional[dict]:
+        """Make LLM API call and parse response; None without a client or when the call fails"""
         if not self.client:
-            return self._fallback_response()
+            return None
         
         try:
-            response = self.client.chat.completions.create(
+            request = dict(
                 model=self._get_model(),
                 messages=[
                     {"role": "system", "content": self.get_system_prompt()},
@@ -54,12 +54,20 @@ class BaseAgent(ABC):
                 temperature=0.7,
                 max_tokens=500
             )
+            # Identical prompts already in flight (a whole class on one passage) share one call
+            response = llm_flights.do(
+                request_key(tenant, **request),
+                lambda abandoned: llm_scheduler.chat_completion(
+                    self.client, priority=self.priority, tenant=tenant, cancelled=abandoned, **request
+                ),
+            )
             
             content = response.choices[0].message.content
-            return json.loads(content)
+            result = json.loads(content)
+            return result if isinstance(result, dict) else None
         except Exception as e:
             print(f"[{self.name}] Error: {e}")
-            return self._fallback_response()
+            return None
     
     def _fallback_response(self) -> dict:
         """Return fallback response when API unavailable"""
@@ -1,5 +1,6 @@
 # Comprehension Agent - Tests reading understanding and inference
 from .base_agent import BaseAgent
+from app.services.comprehension_scoring import comprehension_scorer, narrative_backlogged
 
 class ComprehensionAgent(BaseAgent):
     """
@@ -46,20 +47,39 @@ Ask follow-up questions in recommendations to build thinking skills."""
             input_data: {
                 "transcript": "Student's response to questions",
                 "passage": "The text they read",
-                "questions": "Questions asked (optional)"
+                "questions": "Questions asked (optional)",
+                "narrative": "auto" (optional; "sync" always asks the LLM, "skip" never does)
             }
+        
+        Recall and precision are always scored locally (see
+        comprehension_scoring). The LLM adds inference and main-idea feedback
+        unless skipped, or in "auto" mode while the provider is backed up; if
+        that call fails the local result is returned.
         """
         transcript = input_data.get("transcript", "")
         passage = input_data.get("passage", input_data.get("expected_text", ""))
+        mode = input_data.get("narrative", "auto")
         
-        prompt = f"""Analyze this student's comprehension:
+        local = comprehension_scorer.score(passage, transcript)
+        result = None
+        if self.client and (mode == "sync" or (mode == "auto" and not narrative_backlogged(self.client))):
+            prompt = f"""Analyze this student's comprehension:
 
 Passage they read: "{passage}"
 Student's response: "{transcript}"
+Automatic recall check: {local['analysis']}
 
 Evaluate literal recall, inference, main idea, and vocabulary understanding."""
-        
-        result = self._call_llm(prompt)
+            
+            result = self._try_llm(prompt, tenant=input_data.get("section"))
+            if result is not None:
+                result["scored_by"] = "llm"
+        if result is None:
+            # Also when the narrative call failed: the local score stands
+            result = {key: local[key] for key in ("analysis", "concepts", "gaps", "recommendations", "accuracy")}
+            result["scored_by"] = "local"
+        result["recall"] = local["recall"]
+        result["precision"] = local["precision"]
         
         accuracy = result.get("accuracy", 75)
         result["xp_earned"] = int(45 + (accuracy / 2))
@@ -61,7 +61,7 @@ Student's explanation: "{transcript}"
 
 Evaluate understanding, calculation, and reasoning."""
         
-        result = self._call_llm(prompt)
+        result = self._call_llm(prompt, tenant=input_data.get("section"))
         
         accuracy = result.get("accuracy", 70)
         result["xp_earned"] = int(40 + (accuracy / 2))
@@ -1,5 +1,8 @@
 # Progress Agent - Tracks learning path and generates recommendations
 from .base_agent import BaseAgent
+from app.services.concept_graph import concept_index
+from app.services.progress_analytics import analyze_history, analyze_section
+from collections import OrderedDict
 from typing import List, Dict
 
 class ProgressAgent(BaseAgent):
@@ -14,10 +17,13 @@ class ProgressAgent(BaseAgent):
     - Identifies patterns in learning
     """
     
+    SUMMARY_CACHE_SIZE = 5000
+    
     def __init__(self):
         super().__init__()
         self.name = "ProgressAgent"
         self.description = "Tracks progress and recommends learning path"
+        self._summaries = OrderedDict()  # student_id -> (signature, LLM result)
     
     def get_system_prompt(self) -> str:
         return """You are an expert learning path advisor for children aged 6-10.
@@ -48,46 +54,95 @@ Keep it encouraging and actionable!"""
             input_data: {
                 "assessments": List of past assessment results,
                 "current_level": Current student level,
-                "xp": Total XP earned
+                "xp": Total XP earned,
+                "student_id": Optional, lets the LLM summary be reused
             }
         """
         assessments = input_data.get("assessments", [])
         level = input_data.get("current_level", 0)
         xp = input_data.get("xp", 0)
+        student_id = input_data.get("student_id")
         
-        # Calculate scores by subject
-        reading_scores = [a.get("accuracy", 0) for a in assessments if a.get("type") == "reading"]
-        math_scores = [a.get("accuracy", 0) for a in assessments if a.get("type") == "math"]
-        
-        avg_reading = sum(reading_scores) / len(reading_scores) if reading_scores else 0
-        avg_math = sum(math_scores) / len(math_scores) if math_scores else 0
+        # Per-subject means, trends and mastery are computed locally
+        stats = analyze_history(assessments)
+        subjects = stats["subjects"]
         
-        prompt = f"""Analyze this student's learning progress:
+        # Only ask the LLM again when the picture has changed materially
+        signature = self._signature(level, stats)
+        cached = self._summaries.get(student_id) if student_id else None
+        if cached and cached[0] == signature:
+            result = dict(cached[1])
+        else:
+            subject_lines = "\n".join(
+                f"{name.title()}: average {s['average']}%, mastery {s['mastery']}%, "
+                f"trend {s['trend_per_day']:+} pts/day over {s['attempts']} attempts"
+                for name, s in subjects.items()
+            ) or "No assessments yet"
+            
+            prompt = f"""Analyze this student's learning progress:
 
 Current Level: {level}
 Total XP: {xp}
-Average Reading Score: {avg_reading:.1f}%
-Average Math Score: {avg_math:.1f}%
+{subject_lines}
 Total Assessments: {len(assessments)}
+Level progress: {stats['level_progress']}% (ready for next level: {stats['ready_for_next_level']})
 
 Provide progress analysis and recommendations."""
+            
+            result = self._try_llm(prompt, tenant=input_data.get("section"))
+            if result is None:
+                result = self._fallback_response()  # Not cached: the next request asks again
+            elif student_id:
+                self._summaries[student_id] = (signature, dict(result))
+                self._summaries.move_to_end(student_id)
+                while len(self._summaries) > self.SUMMARY_CACHE_SIZE:
+                    self._summaries.popitem(last=False)
         
-        result = self._call_llm(prompt)
-        
-        # Add calculated data
+        # Add calculated data (local numbers win over the LLM's guesses)
         result["current_level"] = level
         result["total_xp"] = xp
-        result["reading_average"] = avg_reading
-        result["math_average"] = avg_math
+        result["reading_average"] = subjects.get("reading", {}).get("average") or 0
+        result["math_average"] = subjects.get("math", {}).get("average") or 0
+        result["subjects"] = subjects
+        result["level_progress"] = stats["level_progress"]
+        result["ready_for_next_level"] = stats["ready_for_next_level"]
         
         return result
     
+    def analyze_section(self, assessments: List[Dict], student_ids: List[str] = None) -> Dict[str, dict]:
+        """Local progress analytics for a whole section at once (no LLM calls)"""
+        return analyze_section(assessments, student_ids)
+    
+    @staticmethod
+    def _signature(level: int, stats: dict) -> tuple:
+        """Coarse fingerprint of progress: mastery in 5-point bands and trend direction"""
+        return (
+            level,
+            stats["ready_for_next_level"],
+            tuple(
+                (name, int(s["mastery"] // 5), (s["trend_per_day"] > 0.5) - (s["trend_per_day"] < -0.5))
+                for name, s in sorted(stats["subjects"].items())
+            ),
+        )
+    
     def calculate_level(self, xp: int) -> int:
         """Calculate level from XP"""
         return xp // 200  # Every 200 XP = 1 level
     
-    def get_next_lessons(self, strengths: List[str], gaps: List[str]) -> List[str]:
+    def get_next_lessons(self, strengths: List[str], gaps: List[str], student_id: str = None) -> List[str]:
         """Recommend next lessons based on strengths and gaps"""
+        # Gaps name the subjects (and languages) to prioritise
+        gap_text = " ".join(gaps).lower()
+        subjects = [s for s in ("reading", "math", "vocabulary") if s in gap_text]
+        language = next((l for l in ("hindi", "malayalam", "english") if l in gap_text), None)
+        
+        # Unlocked lessons from the prerequisite graph, if this student is loaded
+        state = concept_index.cached(student_id) if student_id else None
+        if state is not None:
+            lessons = concept_index.next_lessons(state, 3, subjects, language)
+            if lessons:
+                return lessons
+        
         lessons = []
         
         # Prioritize gaps but include some strengths for confidence
@@ -61,7 +61,7 @@ Student read: "{transcript}"
 
 Evaluate pronunciation, fluency, word recognition, and pace."""
         
-        result = self._call_llm(prompt)
+        result = self._call_llm(prompt, tenant=input_data.get("section"))
         
         # Calculate XP based on accuracy
         accuracy = result.get("accuracy", 75)
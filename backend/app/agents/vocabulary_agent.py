@@ -1,5 +1,6 @@
 # Vocabulary Agent - Checks word knowledge and usage
 from .base_agent import BaseAgent
+from app.services.vocabulary_scoring import score_vocabulary
 
 class VocabularyAgent(BaseAgent):
     """
@@ -46,28 +47,75 @@ Suggest fun ways to learn new words!"""
             input_data: {
                 "transcript": "Student's word usage/explanation",
                 "target_words": "Words being tested",
-                "context": "Sentence or paragraph context"
+                "context": "Sentence or paragraph context",
+                "language": "english" (optional; also "hindi", "malayalam")
             }
+        
+        Scored locally against the lexicon; only words the lexicon cannot
+        judge (see vocabulary_scoring) are escalated to the LLM, and if that
+        call fails the lexicon result is returned. Without any target words
+        the LLM judges the response as a whole, or, with no LLM configured or
+        a failed call, the result is left unscored (accuracy None, no XP).
         """
         transcript = input_data.get("transcript", "")
         words = input_data.get("target_words", "")
         context = input_data.get("context", "")
         
-        prompt = f"""Analyze this student's vocabulary:
+        local = score_vocabulary(words, transcript, input_data.get("language", "english"))
+        if not local["words"]:
+            return self._without_targets(transcript, context, input_data.get("section"))
+        result = None
+        if local["ambiguous"] and self.client:
+            verdicts = ", ".join(f"{word}: {status}" for word, status in local["words"].items())
+            prompt = f"""Analyze this student's vocabulary:
 
 Words tested: "{words}"
 Context: "{context}"
 Student's response: "{transcript}"
+Dictionary check: {verdicts}
 
-Evaluate word meaning, usage, and understanding."""
-        
-        result = self._call_llm(prompt)
+Evaluate word meaning, usage, and understanding, especially for the words marked ambiguous."""
+            
+            result = self._try_llm(prompt, tenant=input_data.get("section"))
+            if result is not None:
+                result["scored_by"] = "llm"
+        if result is None:
+            # Also when the LLM call failed: the lexicon verdicts stand
+            result = {key: local[key] for key in ("analysis", "concepts", "gaps", "recommendations", "accuracy")}
+            result["scored_by"] = "lexicon"
+        result["words"] = local["words"]
         
         accuracy = result.get("accuracy", 80)
         result["xp_earned"] = int(35 + (accuracy / 2))
         
         return result
     
+    def _without_targets(self, transcript: str, context: str, section: str = None) -> dict:
+        """No target words to check against the lexicon"""
+        if self.client:
+            prompt = f"""Analyze this student's vocabulary (no specific words were being tested):
+
+Context: "{context}"
+Student's response: "{transcript}"
+
+Evaluate the range and correctness of the words the student used."""
+            result = self._try_llm(prompt, tenant=section)
+            if result is not None:
+                result["scored_by"] = "llm"
+                result["words"] = {}
+                result["xp_earned"] = int(35 + (result.get("accuracy", 80) / 2))
+                return result
+        return {
+            "analysis": "No target words were given, so vocabulary was not scored.",
+            "concepts": [],
+            "gaps": [],
+            "recommendations": ["Choose a few words to practice and try again"],
+            "accuracy": None,
+            "scored_by": "none",
+            "words": {},
+            "xp_earned": 0,
+        }
+    
     def _fallback_response(self) -> dict:
         return {
             "analysis": "Student knows basic vocabulary but struggles with descriptive words. Good noun recognition.",
@@ -1,19 +1,56 @@
 # GYAAN-AI FastAPI Backend
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from dotenv import load_dotenv
+import asyncio
 import os
 
 # Load environment variables
 load_dotenv()
 
-from app.routes import audio, diagnose, students, teacher, content, chatbot
+from app.routes import audio, diagnose, students, teacher, content, chatbot, lessons
+from app.database import AsyncSessionLocal, init_db
+from app.services.audio_store import audio_store
+from app.services.concept_graph import concept_index
+from app.services.hint_pool import hint_pool
+from app.services.http_encoding import CompressionMiddleware, ETagMiddleware
+from app.services.leaderboard import leaderboard
+from app.services.lesson_catalog import lesson_catalog
+from app.services.providers import warmup, warmup_status
+from app.services.question_bank import question_bank
+from app.services.shared_state import shared_state
+from app.services.speech import warm_transcriber
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create tables, load in-memory indexes, then warm provider SDKs in the background"""
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        await concept_index.reload(db)
+        await leaderboard.rebuild(db)
+        await lesson_catalog.rebuild(db)
+    background_tasks = [
+        asyncio.create_task(run_in_threadpool(warmup)),
+        asyncio.create_task(run_in_threadpool(warm_transcriber)),
+        asyncio.create_task(hint_pool.run()),
+        asyncio.create_task(question_bank.run()),
+        asyncio.create_task(shared_state.watch()),
+        asyncio.create_task(audio_store.run()),
+    ]
+    yield
+    for task in background_tasks:
+        task.cancel()
 
 # Create FastAPI app
 app = FastAPI(
     title="GYAAN-AI API",
     description="AI-powered learning diagnosis platform API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS Configuration
@@ -25,6 +62,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Conditional GETs for read-heavy endpoints, then compression (outermost, so ETags
+# are computed over the uncompressed body)
+app.add_middleware(ETagMiddleware, prefixes=("/api/student/", "/api/teacher/", "/api/content/list/"))
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=int(os.getenv("COMPRESS_MIN_BYTES", "1024")),
+    gzip_level=int(os.getenv("GZIP_LEVEL", "6")),
+    brotli_quality=int(os.getenv("BROTLI_QUALITY", "4")),
+)
+
+# Development aid: log endpoints that run more SQL statements than this (N+1 detection)
+if int(os.getenv("QUERY_BUDGET", "0")) > 0:
+    from app.services.query_counter import QueryBudgetMiddleware
+    app.add_middleware(QueryBudgetMiddleware, max_queries=int(os.getenv("QUERY_BUDGET")))
+
 # Include routers
 app.include_router(audio.router, prefix="/api/audio", tags=["Audio"])
 app.include_router(diagnose.router, prefix="/api/diagnose", tags=["Diagnosis"])
@@ -32,6 +84,7 @@ app.include_router(students.router, prefix="/api/student", tags=["Students"])
 app.include_router(teacher.router, prefix="/api/teacher", tags=["Teacher"])
 app.include_router(content.router, prefix="/api/content", tags=["Content"])
 app.include_router(chatbot.router, prefix="/api/chat", tags=["Chatbot"])
+app.include_router(lessons.router, prefix="/api/lessons", tags=["Lessons"])
 
 @app.get("/")
 async def root():
@@ -44,3 +97,11 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+@app.get("/ready")
+async def readiness_check():
+    """Ready once provider SDKs are imported and clients are built"""
+    status = warmup_status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {"status": "ready", **status}
@@ -1,5 +1,5 @@
 # GYAAN-AI Database Models
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, ForeignKey, Index, JSON
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -22,6 +22,13 @@ class User(Base):
     assessments = relationship("Assessment", back_populates="user")
     progress = relationship("Progress", back_populates="user", uselist=False)
 
+    # Keyset pagination of student listings (see services/student_queries.py)
+    __table_args__ = (
+        Index("ix_users_role_section_username", "role", "section", "username", "id"),
+        Index("ix_users_role_username", "role", "username", "id"),
+        Index("ix_users_role_created", "role", "created_at", "id"),
+    )
+
 
 class Assessment(Base):
     """Store assessment results from AI agents"""
@@ -30,6 +37,7 @@ class Assessment(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(String, ForeignKey("users.id"), nullable=False)
     agent_type = Column(String(50), nullable=False)  # 'reading', 'math', 'comprehension', 'vocabulary'
+    lesson_id = Column(String, ForeignKey("lessons.id"), nullable=True)  # Lesson the attempt counted towards
     transcript = Column(String, nullable=True)
     expected_text = Column(String, nullable=True)
     analysis = Column(String, nullable=True)
@@ -43,6 +51,11 @@ class Assessment(Base):
     # Relationships
     user = relationship("User", back_populates="assessments")
 
+    # Newest-first history per student (detail view, at-risk index, replays)
+    __table_args__ = (
+        Index("ix_assessments_user_created", "user_id", "created_at"),
+    )
+
 
 class Progress(Base):
     """Track student progress and XP"""
@@ -57,11 +70,19 @@ class Progress(Base):
     comprehension_score = Column(Float, default=0.0)
     vocabulary_score = Column(Float, default=0.0)
     lessons_completed = Column(JSON, default=list)
+    rage_progress = Column(Integer, default=0)  # XP towards the next reward, reset by claiming
+    reward_available = Column(Boolean, default=False)  # rage_progress has reached the threshold
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     user = relationship("User", back_populates="progress")
 
+    __table_args__ = (
+        Index("ix_progress_xp", "xp", "user_id"),
+        Index("ix_progress_level", "level", "user_id"),
+        Index("ix_progress_reward", "reward_available"),
+    )
+
 
 class Lesson(Base):
     """Available lessons and content"""
@@ -76,3 +97,140 @@ class Lesson(Base):
     level = Column(Integer, default=1)
     xp_reward = Column(Integer, default=25)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class LessonPrerequisite(Base):
+    """Explicit prerequisite edge between lessons (beyond the implicit level order)"""
+    __tablename__ = "lesson_prerequisites"
+    
+    lesson_id = Column(String, ForeignKey("lessons.id"), primary_key=True)
+    prerequisite_id = Column(String, ForeignKey("lessons.id"), primary_key=True)
+
+
+class ChatSession(Base):
+    """Server-side chatbot conversation with a rolling summary of older turns"""
+    __tablename__ = "chat_sessions"
+    
+    id = Column(String, primary_key=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=True)
+    context = Column(String(100), nullable=True)
+    summary = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    turns = relationship("ChatTurn", back_populates="session", order_by="ChatTurn.id")
+
+
+class ChatTurn(Base):
+    """Single chatbot message; summarized turns are folded into ChatSession.summary"""
+    __tablename__ = "chat_turns"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    session_id = Column(String, ForeignKey("chat_sessions.id"), nullable=False, index=True)
+    role = Column(String(20), nullable=False)  # 'user' or 'assistant'
+    content = Column(String, nullable=False)
+    summarized = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    session = relationship("ChatSession", back_populates="turns")
+
+
+class SharedStateEntry(Base):
+    """Key/value state shared by all API workers (reward config, uploaded content)"""
+    __tablename__ = "shared_state"
+    
+    namespace = Column(String(50), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    value = Column(JSON, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class SharedStateVersion(Base):
+    """Per-namespace change counter that workers poll to invalidate caches"""
+    __tablename__ = "shared_state_versions"
+    
+    namespace = Column(String(50), primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+
+
+class SharedLease(Base):
+    """Time-limited claim on a job so only one API worker runs it"""
+    __tablename__ = "shared_leases"
+    
+    name = Column(String(255), primary_key=True)
+    owner = Column(String(100), nullable=False)
+    expires_at = Column(Float, nullable=False)  # Unix time
+
+
+class SharedEvent(Base):
+    """Broadcast message for every API worker (database shared-state backend)"""
+    __tablename__ = "shared_events"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    channel = Column(String(50), nullable=False)
+    origin = Column(String(100), nullable=False)  # Publishing worker, which delivered it locally already
+    payload = Column(JSON, nullable=False)
+    created_at = Column(Float, nullable=False, index=True)  # Unix time, for pruning
+
+
+class DiagnosisNarrative(Base):
+    """Deferred AI narrative for a provisional comprehension diagnosis"""
+    __tablename__ = "diagnosis_narratives"
+    
+    id = Column(String(32), primary_key=True)
+    status = Column(String(20), nullable=False, default="pending")  # pending, ready or failed
+    result = Column(JSON, nullable=True)  # analysis, conceptsIdentified, gapsFound, recommendations
+    created_at = Column(Float, nullable=False, index=True)  # Unix time, for pruning
+
+
+class AudioObject(Base):
+    """One stored recording, addressed by the SHA-256 of its bytes"""
+    __tablename__ = "audio_objects"
+    
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(Integer, nullable=False)
+    content_type = Column(String(100), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AudioUpload(Base):
+    """An upload of a stored recording; objects without uploads are garbage collected"""
+    __tablename__ = "audio_uploads"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    sha256 = Column(String(64), ForeignKey("audio_objects.sha256"), nullable=False, index=True)
+    owner_id = Column(String, nullable=True, index=True)
+    filename = Column(String(255), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class TranscriptionCacheEntry(Base):
+    """Persistent tier of the transcription cache (audio hash + engine + language)"""
+    __tablename__ = "transcription_cache"
+    
+    key = Column(String(200), primary_key=True)
+    text = Column(String, nullable=False)
+    confidence = Column(Float, default=0.0)
+    duration = Column(Float, default=0.0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Question(Base):
+    """Pre-generated quiz question for uploaded content, by concept and difficulty"""
+    __tablename__ = "questions"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    content_id = Column(String, nullable=False)
+    concept = Column(String(200), nullable=False)
+    difficulty = Column(String(10), nullable=False)  # 'easy', 'medium', 'hard'
+    chunk = Column(Integer, default=0)  # Which part of the content it was generated from
+    question = Column(String, nullable=False)
+    options = Column(JSON, nullable=False)
+    answer = Column(Integer, nullable=False)  # Index into options
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_questions_content_concept_difficulty", "content_id", "concept", "difficulty"),
+    )
@@ -1,85 +1,288 @@
 # Audio Routes - Real Transcription with Groq Whisper
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-import os
-import tempfile
-from groq import Groq
+import hashlib
+import json
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, Optional
+from app.database import AsyncSessionLocal, get_db
+from app.services.assessment_events import missing_reference, record_assessment
+from app.services.audio_store import AudioStoreError, MB, RangeFileResponse, audio_store, upload_chunks
+from app.services.live_reading import LiveReadingSession
+from app.services.local_stt import TranscriberBusy
+from app.services.llm_scheduler import llm_scheduler, PRIORITY_DIAGNOSIS
+from app.services.providers import get_groq_client
+from app.services.speech import SpeechNotConfigured, get_transcriber
+from app.services.transcription_cache import transcription_cache
 
 router = APIRouter()
 
-# Initialize Groq client
-groq_client = None
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
-if GROQ_API_KEY:
-    groq_client = Groq(api_key=GROQ_API_KEY)
-
 class TranscriptionResponse(BaseModel):
     text: str
     confidence: float
     duration: float
+    cached: bool = False
+
+
+async def _request_chunks(request: Request) -> AsyncIterator[bytes]:
+    async for chunk in request.stream():
+        if chunk:
+            yield chunk
+
+
+def _transcription_engine():
+    """(transcriber, groq_client, cache engine/model) for this deployment"""
+    try:
+        transcriber = get_transcriber()
+    except SpeechNotConfigured:
+        return None, None, None
+    if transcriber.name == "local":
+        return transcriber, None, ("local", transcriber.model)
+    groq_client = get_groq_client()
+    return transcriber, groq_client, ("groq", "whisper-large-v3") if groq_client else None
+
+
+async def _transcribe_bytes(audio_content: bytes, transcriber, groq_client, language: Optional[str]) -> TranscriptionResponse:
+    # Local CPU Whisper when this deployment runs one (no network needed)
+    if transcriber is not None and transcriber.name == "local":
+        text, duration = await run_in_threadpool(transcriber.transcribe_file, audio_content, language)
+        return TranscriptionResponse(text=text, confidence=0.9, duration=duration)
+
+    # Transcribe with Groq Whisper. The upload is built from the bytes on
+    # every attempt, so a retry after a 429 sends the whole file again
+    # rather than an already-read handle.
+    transcription = await llm_scheduler.run(
+        llm_scheduler.call,
+        "groq",
+        lambda: groq_client.audio.transcriptions.create(
+            model="whisper-large-v3",
+            file=("audio.webm", audio_content),
+            response_format="verbose_json",  # Includes the decoded duration
+            **({"language": language} if language else {})
+        ),
+        PRIORITY_DIAGNOSIS,
+    )
+
+    return TranscriptionResponse(
+        text=transcription.text,
+        confidence=0.95,  # Whisper doesn't provide confidence
+        duration=float(getattr(transcription, "duration", None) or 0.0)
+    )
+
 
 @router.post("/transcribe", response_model=TranscriptionResponse)
-async def transcribe_audio(audio: UploadFile = File(...)):
+async def transcribe_audio(request: Request, language: Optional[str] = None, db: AsyncSession = Depends(get_db)):
     """
-    Transcribe audio file using Whisper via Groq API
+    Transcribe audio using Whisper (local or via Groq API)
+
+    Send either a multipart form with an "audio" file or the raw audio as
+    the request body (Content-Type audio/*). Transcripts are cached by the
+    SHA-256 of the audio: clients that send X-Audio-SHA256 get a cache hit
+    before any of the body is read. Raw bodies are hashed as they stream
+    in; multipart files are hashed once the form has been parsed. Audio
+    over audio_store.max_upload_bytes is rejected with 413, like /upload.
     """
+    transcriber, groq_client, engine = _transcription_engine()
+    if engine is None:
+        raise HTTPException(status_code=503, detail="No transcription backend configured")
     try:
-        # Read audio file
-        audio_content = await audio.read()
-        
-        # If Groq API key is available, use real transcription
-        if groq_client:
-            # Save to temp file (Groq requires file path)
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".webm") as temp_file:
-                temp_file.write(audio_content)
-                temp_path = temp_file.name
-            
-            try:
-                # Transcribe with Groq Whisper
-                with open(temp_path, "rb") as audio_file:
-                    transcription = groq_client.audio.transcriptions.create(
-                        model="whisper-large-v3",
-                        file=audio_file,
-                        response_format="json"
-                    )
-                
-                return TranscriptionResponse(
-                    text=transcription.text,
-                    confidence=0.95,  # Whisper doesn't provide confidence
-                    duration=len(audio_content) / 16000  # Approximate
-                )
-            finally:
-                # Clean up temp file
-                os.unlink(temp_path)
+        claimed = request.headers.get("x-audio-sha256", "").strip().lower()
+        if audio_store.valid_id(claimed):
+            cached = await transcription_cache.get(db, transcription_cache.key(claimed, *engine, language))
+            if cached:
+                return TranscriptionResponse(**cached, cached=True)
+
+        limit = audio_store.max_upload_bytes
+        too_large = HTTPException(status_code=413, detail=f"Audio larger than {limit // MB} MB")
+        hasher = hashlib.sha256()
+        parts, size = [], 0
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            audio = form.get("audio")
+            if audio is None or isinstance(audio, str):
+                raise HTTPException(status_code=422, detail="Form field 'audio' must be a file")
+            chunks = upload_chunks(audio)
         else:
-            # Fallback to mock for demo
-            return TranscriptionResponse(
-                text="The student read: The quick brown fox jumps over the lazy dog. Good fluency observed.",
-                confidence=0.92,
-                duration=8.5
-            )
-        
+            length = request.headers.get("content-length", "")
+            if length.isdigit() and int(length) > limit:
+                raise too_large
+            chunks = _request_chunks(request)
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > limit:
+                raise too_large
+            hasher.update(chunk)
+            parts.append(chunk)
+        audio_content = b"".join(parts)
+        if not audio_content:
+            raise HTTPException(status_code=422, detail="No audio received")
+
+        key = transcription_cache.key(hasher.hexdigest(), *engine, language)
+        cached = await transcription_cache.get(db, key)
+        if cached:
+            return TranscriptionResponse(**cached, cached=True)
+        result = await _transcribe_bytes(audio_content, transcriber, groq_client, language)
+        await transcription_cache.put(db, key, result.text, result.confidence, result.duration)
+        return result
+
+    except HTTPException:
+        raise
+    except TranscriberBusy:
+        raise HTTPException(status_code=503, detail="Transcription is busy, please retry", headers={"Retry-After": "2"})
     except Exception as e:
         print(f"Transcription error: {e}")
-        # Return mock on error
-        return TranscriptionResponse(
-            text="Audio transcription completed. Student reading detected.",
-            confidence=0.85,
-            duration=5.0
-        )
+        raise HTTPException(status_code=500, detail="Transcription failed")
+
+@router.post("/files/{audio_id}/transcribe", response_model=TranscriptionResponse)
+async def transcribe_stored_audio(audio_id: str, language: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Transcribe a stored recording; its id is the content hash, so repeat
+    requests are answered from the cache without touching the file
+    """
+    found = await audio_store.open(db, audio_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    transcriber, groq_client, engine = _transcription_engine()
+    if engine is None:
+        raise HTTPException(status_code=503, detail="No transcription backend configured")
+    key = transcription_cache.key(audio_id, *engine, language)
+    cached = await transcription_cache.get(db, key)
+    if cached:
+        return TranscriptionResponse(**cached, cached=True)
+
+    path, _ = found
+    with open(path, "rb") as stored:
+        audio_content = await run_in_threadpool(stored.read)
+    try:
+        result = await _transcribe_bytes(audio_content, transcriber, groq_client, language)
+    except TranscriberBusy:
+        raise HTTPException(status_code=503, detail="Transcription is busy, please retry", headers={"Retry-After": "2"})
+    await transcription_cache.put(db, key, result.text, result.confidence, result.duration)
+    return result
 
 @router.post("/upload")
-async def upload_audio(audio: UploadFile = File(...)):
+async def upload_audio(
+    audio: UploadFile = File(...),
+    studentId: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
     """
-    Upload and store audio file for later processing
+    Upload and store audio file for later processing (deduplicated by content)
     """
     try:
-        content = await audio.read()
-        return {
-            "filename": audio.filename,
-            "status": "uploaded",
-            "size": len(content)
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        stored = await audio_store.store(
+            db, upload_chunks(audio), audio.content_type, audio.filename, owner_id=studentId
+        )
+    except AudioStoreError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    return {
+        "id": stored["id"],
+        "filename": audio.filename,
+        "status": "uploaded",
+        "size": stored["size"],
+        "deduplicated": stored["deduplicated"],
+        "url": f"/api/audio/files/{stored['id']}"
+    }
+
+@router.get("/files/{audio_id}")
+async def play_audio(audio_id: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Stream a stored recording (supports Range requests for seeking)
+    """
+    found = await audio_store.open(db, audio_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    if request.headers.get("if-none-match") == f'"{audio_id}"':
+        return Response(status_code=304, headers={"ETag": f'"{audio_id}"'})
+    path, stored = found
+    return RangeFileResponse(path, stored.size, stored.content_type, audio_id, request.headers.get("range"))
+
+def _control_type(text: str) -> Optional[str]:
+    """The "type" of a JSON control frame, or None for anything else"""
+    try:
+        message = json.loads(text)
+    except ValueError:
+        return None
+    return message.get("type") if isinstance(message, dict) else None
+
+@router.websocket("/live")
+async def live_reading(websocket: WebSocket):
+    """
+    Live read-aloud session.
+
+    Client -> server: a JSON "start" message {"type": "start", "expectedText",
+    "language"?, "studentId"?, "lessonId"?}, then binary frames of 16 kHz mono
+    PCM16 audio, then {"type": "stop"}.
+    Server -> client: "ready", "partial" (newly aligned words with status
+    correct/miscue/skipped), and "final" with the transcript and diagnosis.
+    Sessions on the simulated backend are flagged and not recorded.
+    """
+    await websocket.accept()
+    session = None
+    try:
+        start = await websocket.receive_json()
+        if start.get("type") != "start" or not start.get("expectedText"):
+            await websocket.send_json({"type": "error", "message": "Send a start message with expectedText first"})
+            await websocket.close(code=1008)
+            return
+        async with AsyncSessionLocal() as db:
+            error = await missing_reference(db, start.get("studentId"), start.get("lessonId"))
+        if error:
+            await websocket.send_json({"type": "error", "message": error})
+            await websocket.close(code=1008)
+            return
+
+        try:
+            session = LiveReadingSession(start["expectedText"], websocket.send_json, start.get("language", "english"))
+        except SpeechNotConfigured as e:
+            await websocket.send_json({"type": "error", "message": str(e)})
+            await websocket.close(code=1011)
+            return
+        simulated = session.transcriber.name == "simulated"
+        await websocket.send_json({"type": "ready", "words": len(session.alignment.expected), "simulated": simulated})
+
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes"):
+                session.add_audio(message["bytes"])
+            elif message.get("text") and _control_type(message["text"]) == "stop":
+                break
+
+        result = await session.finish()
+        diagnosis = result["diagnosis"]
+        diagnosis["xp_earned"] = int(50 + diagnosis["accuracy"] / 2)  # Same 50-100 XP range as /diagnose/reading
+        if start.get("studentId") and not simulated:  # The stand-in echoes the passage; never score it
+            async with AsyncSessionLocal() as db:
+                await record_assessment(
+                    db, start["studentId"], "reading", diagnosis,
+                    transcript=result["transcript"], expected_text=start["expectedText"],
+                    lesson_id=start.get("lessonId"),
+                )
+        await websocket.send_json({
+            "type": "final",
+            "simulated": simulated,
+            "transcript": result["transcript"],
+            "words": result["words"],
+            "diagnosis": {
+                "type": "reading",
+                "analysis": diagnosis["analysis"],
+                "conceptsIdentified": diagnosis["concepts"],
+                "gapsFound": diagnosis["gaps"],
+                "recommendations": diagnosis["recommendations"],
+                "xpEarned": diagnosis["xp_earned"],
+                "accuracy": diagnosis["accuracy"],
+                "wordsPerMinute": diagnosis["wordsPerMinute"],
+            },
+        })
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "message": str(e)})
+        await websocket.close(code=1009)
+    finally:
+        if session:
+            session.cancel()  # Stops the transcription worker whatever ended the session
@@ -1,20 +1,20 @@
 # Chatbot Routes - Gemini AI Student Assistant
-from fastapi import APIRouter
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
-import os
-import google.generativeai as genai
+import json
+import time
+from app.database import AsyncSessionLocal, get_db
+from app.services.answer_cache import answer_cache
+from app.services.chat_sessions import chat_sessions
+from app.services.hint_pool import hint_pool
+from app.services.response_catalog import classify_context, normalize_language, response_catalog
+from app.services.llm_scheduler import llm_scheduler, PRIORITY_BATCH, PRIORITY_CHAT
+from app.services.providers import get_genai, get_groq_chat_client
 
 router = APIRouter()
 
-# Initialize Gemini
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
-
-# Fallback to Groq if no Gemini key
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
 class ChatMessage(BaseModel):
     role: str  # "user" or "assistant"
     content: str
@@ -22,11 +22,16 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     message: str
     context: Optional[str] = None  # Current subject/topic
-    history: List[ChatMessage] = []
+    sessionId: Optional[str] = None  # Server-side history; omit to start a new session
+    history: List[ChatMessage] = []  # Deprecated: only used by clients without sessions
+    section: Optional[str] = None  # Used for fair scheduling across classes
+    studentId: Optional[str] = None
+    language: str = "english"  # english, hindi or malayalam
 
 class ChatResponse(BaseModel):
     reply: str
     suggestions: List[str]
+    sessionId: Optional[str] = None
 
 # System prompt for student helper
 SYSTEM_PROMPT = """You are GYAAN, a friendly AI tutor for children aged 6-12 learning in rural India.
@@ -43,9 +48,10 @@ Current context: {context}
 
 Remember: You're talking to a child. Be patient, simple, and encouraging!"""
 
-def get_gemini_response(message: str, context: str, history: list) -> str:
+def get_gemini_response(message: str, context: str, history: list, section: str = None) -> str:
     """Get response from Gemini AI"""
-    if not GOOGLE_API_KEY:
+    genai = get_genai()
+    if not genai:
         return None
     
     try:
@@ -60,8 +66,11 @@ def get_gemini_response(message: str, context: str, history: list) -> str:
         # Add system context
         prompt = f"[Context: {context}]\n\nStudent asks: {message}"
         
-        response = chat.send_message(
-            SYSTEM_PROMPT.format(context=context) + "\n\n" + prompt
+        response = llm_scheduler.call(
+            "gemini",
+            lambda: chat.send_message(SYSTEM_PROMPT.format(context=context) + "\n\n" + prompt),
+            priority=PRIORITY_CHAT,
+            tenant=section,
         )
         
         return response.text
@@ -69,24 +78,22 @@ def get_gemini_response(message: str, context: str, history: list) -> str:
         print(f"Gemini error: {e}")
         return None
 
-def get_groq_response(message: str, context: str, history: list) -> str:
+def get_groq_response(message: str, context: str, history: list, section: str = None) -> str:
     """Fallback to Groq LLaMA if Gemini not available"""
-    if not GROQ_API_KEY:
+    client = get_groq_chat_client()
+    if not client:
         return None
     
     try:
-        from openai import OpenAI
-        client = OpenAI(
-            api_key=GROQ_API_KEY,
-            base_url="https://api.groq.com/openai/v1"
-        )
-        
         messages = [{"role": "system", "content": SYSTEM_PROMPT.format(context=context)}]
         for h in history[-6:]:
             messages.append({"role": h.role, "content": h.content})
         messages.append({"role": "user", "content": message})
         
-        response = client.chat.completions.create(
+        response = llm_scheduler.chat_completion(
+            client,
+            priority=PRIORITY_CHAT,
+            tenant=section,
             model="llama-3.1-70b-versatile",
             messages=messages,
             temperature=0.7,
@@ -98,41 +105,165 @@ def get_groq_response(message: str, context: str, history: list) -> str:
         print(f"Groq chat error: {e}")
         return None
 
+def summarize_history(summary: Optional[str], turns: List[dict]) -> Optional[str]:
+    """Fold older chat turns into a short running summary (None on failure)"""
+    client = get_groq_chat_client()
+    if not client:
+        return None
+    
+    try:
+        transcript = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+        response = llm_scheduler.chat_completion(
+            client,
+            priority=PRIORITY_BATCH,
+            model="llama-3.1-8b-instant",
+            messages=[
+                {
+                    "role": "system",
+                    "content": "Summarize this tutoring chat with a child in 2-3 short sentences. Keep topics, difficulties and progress. Reply with the summary only."
+                },
+                {"role": "user", "content": f"Summary so far: {summary or 'none'}\n\nNew messages:\n{transcript}"}
+            ],
+            temperature=0.3,
+            max_tokens=150
+        )
+        
+        return response.choices[0].message.content
+    except Exception as e:
+        print(f"Chat summary error: {e}")
+        return None
+
+chat_sessions.summarizer = summarize_history
+
+async def compact_session(session_id: str):
+    """Background task: roll older turns into the session summary"""
+    async with AsyncSessionLocal() as db:
+        await chat_sessions.compact(db, session_id)
+
 @router.post("/ask", response_model=ChatResponse)
-async def chat_with_assistant(request: ChatRequest):
+async def chat_with_assistant(
+    request: ChatRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
+):
     """Chat with GYAAN AI assistant"""
     
     context = request.context or "general learning"
+    language = normalize_language(request.language)
+    cache_namespace = f"{language} {context}"
+    prompt_context = context
+    history = request.history
+    session_id = request.sessionId
+    
+    # Server-side history: recent turns verbatim, older ones as a summary
+    if session_id or not history:
+        if session_id:
+            state = await chat_sessions.load(db, session_id)
+            if state is None:
+                raise HTTPException(status_code=404, detail="Chat session not found")
+        else:
+            session_id = await chat_sessions.create(db, context, request.studentId)
+            state = await chat_sessions.load(db, session_id)
+        
+        history = [ChatMessage(**turn) for turn in state.recent()]
+        if state.summary:
+            prompt_context = f"{context}. Earlier in this chat: {state.summary}"
+    
+    # Common standalone questions are answered from the semantic cache. A reply
+    # generated with earlier turns or a summary depends on that conversation
+    # ("explain that again"), so it is neither served from nor stored in it.
+    cacheable = not history and prompt_context == context and answer_cache.cacheable(request.message)
+    cached = answer_cache.get(request.message, cache_namespace) if cacheable else None
+    reply = cached.answer if cached else None
     
-    # Try Gemini first, then Groq
-    reply = get_gemini_response(request.message, context, request.history)
     if not reply:
-        reply = get_groq_response(request.message, context, request.history)
+        started = time.perf_counter()
+        # Try Gemini first, then Groq
+        reply = await llm_scheduler.run(
+            get_gemini_response, request.message, prompt_context, history, request.section
+        )
+        if not reply:
+            reply = await llm_scheduler.run(
+                get_groq_response, request.message, prompt_context, history, request.section
+            )
+        if reply and cacheable:
+            answer_cache.put(request.message, cache_namespace, reply, time.perf_counter() - started)
     
     # Fallback response
     if not reply:
-        reply = "I'm here to help! Could you tell me more about what you're working on? Are you doing reading or math today?"
+        reply = response_catalog.fallback(language)
+    
+    if session_id:
+        await chat_sessions.append(db, session_id, "user", request.message)
+        await chat_sessions.append(db, session_id, "assistant", reply)
+        if chat_sessions.needs_compaction(session_id):
+            background_tasks.add_task(compact_session, session_id)
     
-    # Generate helpful suggestions based on context
-    suggestions = []
-    if "math" in context.lower():
-        suggestions = ["Show me step by step", "Give me a hint", "Try an easier problem"]
-    elif "reading" in context.lower():
-        suggestions = ["Explain this word", "Read it slower", "What happens next?"]
-    else:
-        suggestions = ["Help with reading", "Help with math", "I'm stuck"]
+    # Helpful suggestions from the precomputed catalog
+    suggestions = list(response_catalog.suggestions(context, language))
     
-    return ChatResponse(reply=reply, suggestions=suggestions)
+    return ChatResponse(reply=reply, suggestions=suggestions, sessionId=session_id)
+
+@router.get("/cache-stats")
+async def get_cache_stats():
+    """Semantic answer cache hit rate and latency savings"""
+    return answer_cache.stats()
 
 @router.post("/encourage")
-async def get_encouragement():
+async def get_encouragement(language: str = "english"):
     """Get encouraging message for struggling student"""
-    messages = [
-        "You're doing great! Every warrior started as a beginner. Keep trying! 💪",
-        "Mistakes help us learn. The best students make lots of mistakes and try again!",
-        "I believe in you! Take a deep breath and let's try one more time together.",
-        "You've already learned so much! This is just one more step on your journey.",
-        "Even Kratos had to practice. Every try makes you stronger! ⚔️"
-    ]
-    import random
-    return {"message": random.choice(messages)}
+    return {"message": response_catalog.encouragement(language)}
+
+@router.get("/catalog")
+async def get_response_catalog(request: Request, language: str = "english"):
+    """
+    Full localized response catalog so clients can pick encouragement and
+    suggestions locally; cacheable by browsers and nginx via ETag
+    """
+    body, etag = response_catalog.payload(language)
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@router.get("/hint/{lesson_id}")
+async def get_lesson_hint(lesson_id: str, language: str = "english", context: Optional[str] = None):
+    """Tutor hint for a lesson from the pre-generated pool"""
+    language = normalize_language(language)
+    pooled = await hint_pool.get(lesson_id, language)
+    if pooled:
+        _, _, hint = pooled
+        return {"hint": hint, "language": language, "source": "pool"}
+    
+    category = classify_context(context or "")
+    return {"hint": response_catalog.hint(category, language), "language": language, "source": "catalog"}
+
+def generate_lesson_hints(lesson) -> Optional[List[str]]:
+    """Ask the LLM for a handful of short hints for one lesson"""
+    client = get_groq_chat_client()
+    if not client:
+        return None
+    
+    try:
+        response = llm_scheduler.chat_completion(
+            client,
+            priority=PRIORITY_BATCH,
+            model="llama-3.1-8b-instant",
+            messages=[
+                {
+                    "role": "system",
+                    "content": f"Write 5 short, kind hints (one sentence each) in {lesson.language} for a child aged 6-12 doing this {lesson.subject} lesson. Return a JSON array of strings only."
+                },
+                {"role": "user", "content": f"{lesson.title}\n\n{lesson.content[:1500]}"}
+            ],
+            temperature=0.7,
+            max_tokens=300
+        )
+        
+        hints = json.loads(response.choices[0].message.content)
+        return [h for h in hints if isinstance(h, str)] if isinstance(hints, list) else None
+    except Exception as e:
+        print(f"Hint generation error: {e}")
+        return None
+
+hint_pool.generator = generate_lesson_hints
@@ -1,28 +1,13 @@
 # Content Processing - AI-powered textbook analysis
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import List, Optional
-import os
-from openai import OpenAI
+from app.services.question_bank import DIFFICULTIES, content_store, question_bank
+from app.services.providers import chat_model, get_chat_client
+from app.services.llm_scheduler import llm_scheduler, PRIORITY_BATCH, PRIORITY_DIAGNOSIS
 
 router = APIRouter()
 
-# Initialize OpenAI client
-openai_client = None
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
-if OPENAI_API_KEY:
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
-elif GROQ_API_KEY:
-    openai_client = OpenAI(
-        api_key=GROQ_API_KEY,
-        base_url="https://api.groq.com/openai/v1"
-    )
-
-# In-memory storage for demo
-uploaded_content = {}
-
 class ContentUpload(BaseModel):
     name: str
     type: str  # textbook, topic, passage, problem
@@ -39,6 +24,13 @@ class ContentResponse(BaseModel):
     conceptsExtracted: List[str]
     questionsGenerated: int
 
+class QuizAnswer(BaseModel):
+    questionId: int
+    answer: int  # Index of the chosen option
+
+class QuizSubmission(BaseModel):
+    answers: List[QuizAnswer]
+
 class MatchRequest(BaseModel):
     studentResponse: str
     contentId: str
@@ -49,14 +41,18 @@ class MatchResponse(BaseModel):
     conceptsMissing: List[str]
     feedback: str
 
-def extract_concepts_from_content(content: str, subject: str) -> List[str]:
+def extract_concepts_from_content(content: str, subject: str, teacher_id: str = None) -> List[str]:
     """Use AI to extract key concepts from textbook content"""
+    openai_client = get_chat_client()
     if not openai_client:
         return ["Concept 1", "Concept 2", "Concept 3"]
     
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-3.5-turbo" if OPENAI_API_KEY else "llama-3.1-70b-versatile",
+        response = llm_scheduler.chat_completion(
+            openai_client,
+            priority=PRIORITY_BATCH,
+            tenant=teacher_id,
+            model=chat_model(),
             messages=[
                 {
                     "role": "system",
@@ -75,14 +71,18 @@ def extract_concepts_from_content(content: str, subject: str) -> List[str]:
         print(f"Concept extraction error: {e}")
         return ["Reading Skills", "Vocabulary", "Comprehension"]
 
-def match_response_to_content(student_response: str, content: str) -> dict:
+def match_response_to_content(student_response: str, content: str, teacher_id: str = None) -> dict:
     """Use AI to match student response against curriculum content"""
+    openai_client = get_chat_client()
     if not openai_client:
         return {"score": 0.75, "covered": ["Basic understanding"], "missing": ["Details"], "feedback": "Good effort!"}
     
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-3.5-turbo" if OPENAI_API_KEY else "llama-3.1-70b-versatile",
+        response = llm_scheduler.chat_completion(
+            openai_client,
+            priority=PRIORITY_DIAGNOSIS,
+            tenant=teacher_id,
+            model=chat_model(),
             messages=[
                 {
                     "role": "system",
@@ -112,27 +112,34 @@ async def upload_content(content: ContentUpload):
     content_id = str(uuid.uuid4())
     
     # Extract concepts using AI
-    concepts = extract_concepts_from_content(content.content, content.subject)
+    concepts = await llm_scheduler.run(
+        extract_concepts_from_content, content.content, content.subject, content.teacherId
+    )
     
     # Store content
-    uploaded_content[content_id] = {
+    await content_store.set(content_id, {
         "id": content_id,
         "name": content.name,
         "type": content.type,
         "subject": content.subject,
         "content": content.content,
         "concepts": concepts,
-        "teacherId": content.teacherId
-    }
+        "teacherId": content.teacherId,
+        "status": "processing",
+        "questionsGenerated": 0
+    })
+    
+    # Questions are generated in the background; status becomes "ready" when the bank is built
+    question_bank.enqueue(content_id)
     
     return ContentResponse(
         id=content_id,
         name=content.name,
         type=content.type,
         subject=content.subject,
-        status="ready",
+        status="processing",
         conceptsExtracted=concepts,
-        questionsGenerated=len(concepts) * 3  # 3 questions per concept
+        questionsGenerated=0
     )
 
 @router.get("/list/{teacher_id}")
@@ -144,9 +151,11 @@ async def list_content(teacher_id: str):
             "name": c["name"],
             "type": c["type"],
             "subject": c["subject"],
-            "conceptCount": len(c["concepts"])
+            "conceptCount": len(c["concepts"]),
+            "status": c.get("status", "ready"),
+            "questionsGenerated": c.get("questionsGenerated", 0)
         }
-        for c in uploaded_content.values()
+        for c in (await content_store.items()).values()
         if c["teacherId"] == teacher_id
     ]
     return {"content": teacher_content}
@@ -155,11 +164,13 @@ async def list_content(teacher_id: str):
 async def match_student_response(request: MatchRequest):
     """Match student response against curriculum content"""
     
-    if request.contentId not in uploaded_content:
+    content = await content_store.get(request.contentId)
+    if content is None:
         raise HTTPException(status_code=404, detail="Content not found")
     
-    content = uploaded_content[request.contentId]
-    result = match_response_to_content(request.studentResponse, content["content"])
+    result = await llm_scheduler.run(
+        match_response_to_content, request.studentResponse, content["content"], content["teacherId"]
+    )
     
     return MatchResponse(
         matchScore=result.get("score", 0.7),
@@ -168,10 +179,45 @@ async def match_student_response(request: MatchRequest):
         feedback=result.get("feedback", "Keep practicing!")
     )
 
+@router.get("/{content_id}/quiz")
+async def get_quiz(
+    content_id: str,
+    count: int = Query(10, ge=1, le=50),
+    concept: Optional[str] = None,
+    difficulty: Optional[str] = Query(None, pattern="^(easy|medium|hard)$")
+):
+    """Random quiz from the pre-generated question bank (never waits on an LLM)"""
+    content = await content_store.get(content_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Content not found")
+    questions = await question_bank.quiz(content_id, count, concept, difficulty)
+    return {"contentId": content_id, "status": content.get("status", "ready"), "questions": questions}
+
+@router.post("/{content_id}/quiz/grade")
+async def grade_quiz(content_id: str, submission: QuizSubmission):
+    """Grade quiz answers against the question bank (quizzes are served without the key)"""
+    if await content_store.get(content_id) is None:
+        raise HTTPException(status_code=404, detail="Content not found")
+    graded = await question_bank.grade(content_id, {a.questionId: a.answer for a in submission.answers})
+    return {"contentId": content_id, **graded}
+
+@router.get("/{content_id}/questions")
+async def get_question_bank_summary(content_id: str):
+    """Question counts per concept and difficulty"""
+    content = await content_store.get(content_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Content not found")
+    return {
+        "contentId": content_id,
+        "status": content.get("status", "ready"),
+        "difficulties": list(DIFFICULTIES),
+        "concepts": await question_bank.summary(content_id)
+    }
+
 @router.delete("/{content_id}")
 async def delete_content(content_id: str):
     """Delete uploaded content"""
-    if content_id in uploaded_content:
-        del uploaded_content[content_id]
+    if await content_store.delete(content_id):
+        await question_bank.delete(content_id)
         return {"status": "deleted"}
     raise HTTPException(status_code=404, detail="Content not found")
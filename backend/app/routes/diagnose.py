@@ -1,34 +1,45 @@
 # Diagnosis Routes - Real AI Agent Analysis
-from fastapi import APIRouter
+import time
+import uuid
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List
-import os
-from openai import OpenAI
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+from app.database import AsyncSessionLocal, get_db
+from app.models import Assessment, DiagnosisNarrative
+from app.services.assessment_events import missing_reference, record_assessment
+from app.services.comprehension_scoring import comprehension_scorer, narrative_backlogged
+from app.services.providers import chat_model, get_chat_client
+from app.services.llm_scheduler import llm_scheduler, PRIORITY_DIAGNOSIS
+from app.services.single_flight import llm_flights, request_key
 
 router = APIRouter()
 
-# Initialize OpenAI client (works with OpenAI or compatible APIs)
-openai_client = None
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-
-# Try OpenAI first, then Groq
-if OPENAI_API_KEY:
-    openai_client = OpenAI(api_key=OPENAI_API_KEY)
-elif GROQ_API_KEY:
-    openai_client = OpenAI(
-        api_key=GROQ_API_KEY,
-        base_url="https://api.groq.com/openai/v1"
-    )
+# Deferred comprehension narratives are stored in the database so any worker
+# can answer a poll; when a student is given, the assessment row is patched too
+NARRATIVE_RETENTION_SECONDS = 3600
 
 class ReadingRequest(BaseModel):
     transcript: str
     expectedText: str
+    section: Optional[str] = None  # Used for fair scheduling across classes
+    studentId: Optional[str] = None  # When set, the diagnosis is stored for progress tracking
+    lessonId: Optional[str] = None  # Lesson being practiced (defaults to the student's current one)
+
+class ComprehensionRequest(ReadingRequest):
+    # auto: AI narrative inline unless the LLM queue is backed up, then deferred
+    # sync: always inline; defer: always deferred; skip: local score only
+    narrative: Literal["auto", "sync", "defer", "skip"] = "auto"
 
 class MathRequest(BaseModel):
     transcript: str
     problem: str
     expectedAnswer: str
+    section: Optional[str] = None
+    studentId: Optional[str] = None
+    lessonId: Optional[str] = None
 
 class DiagnosisResponse(BaseModel):
     type: str
@@ -38,9 +49,19 @@ class DiagnosisResponse(BaseModel):
     recommendations: List[str]
     xpEarned: int
     accuracy: int
+    provisional: bool = False  # Locally scored; the AI narrative is still on its way
+    narrativeId: Optional[str] = None  # Poll GET /narrative/{narrativeId} for it
 
-def get_ai_diagnosis(prompt: str, diagnosis_type: str) -> dict:
-    """Get AI diagnosis using LLM"""
+class NarrativeResponse(BaseModel):
+    status: str  # pending, ready or failed
+    analysis: Optional[str] = None
+    conceptsIdentified: Optional[List[str]] = None
+    gapsFound: Optional[List[str]] = None
+    recommendations: Optional[List[str]] = None
+
+async def get_ai_diagnosis(prompt: str, diagnosis_type: str, section: str = None) -> dict:
+    """Get AI diagnosis using LLM (identical requests in flight share one call)"""
+    openai_client = get_chat_client()
     if not openai_client:
         return None
     
@@ -56,8 +77,8 @@ def get_ai_diagnosis(prompt: str, diagnosis_type: str) -> dict:
         Respond in JSON format:
         {"analysis": "...", "concepts": [...], "gaps": [...], "recommendations": [...], "accuracy": 85}"""
         
-        response = openai_client.chat.completions.create(
-            model="gpt-3.5-turbo" if OPENAI_API_KEY else "llama-3.1-70b-versatile",
+        request = dict(
+            model=chat_model(),
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": prompt}
@@ -65,6 +86,12 @@ def get_ai_diagnosis(prompt: str, diagnosis_type: str) -> dict:
             temperature=0.7,
             max_tokens=500
         )
+        response = await llm_flights.run(
+            request_key(section, **request),
+            lambda abandoned: llm_scheduler.chat_completion(
+                openai_client, priority=PRIORITY_DIAGNOSIS, tenant=section, cancelled=abandoned, **request
+            ),
+        )
         
         import json
         result = json.loads(response.choices[0].message.content)
@@ -73,9 +100,35 @@ def get_ai_diagnosis(prompt: str, diagnosis_type: str) -> dict:
         print(f"AI diagnosis error: {e}")
         return None
 
+async def check_references(db: AsyncSession, student_id: Optional[str], lesson_id: Optional[str]):
+    """Reject unknown students and lessons before any model call (the assessment would fail to insert)"""
+    error = await missing_reference(db, student_id, lesson_id)
+    if error:
+        raise HTTPException(status_code=404, detail=error)
+
+async def store_diagnosis(db: AsyncSession, student_id: str, diagnosis: DiagnosisResponse, transcript: str, expected_text: str, lesson_id: Optional[str] = None):
+    """Persist a real (non-fallback) diagnosis and update progress indexes"""
+    return await record_assessment(
+        db,
+        student_id,
+        diagnosis.type,
+        {
+            "analysis": diagnosis.analysis,
+            "concepts": diagnosis.conceptsIdentified,
+            "gaps": diagnosis.gapsFound,
+            "recommendations": diagnosis.recommendations,
+            "accuracy": diagnosis.accuracy,
+            "xp_earned": diagnosis.xpEarned,
+        },
+        transcript=transcript,
+        expected_text=expected_text,
+        lesson_id=lesson_id,
+    )
+
 @router.post("/reading", response_model=DiagnosisResponse)
-async def diagnose_reading(request: ReadingRequest):
+async def diagnose_reading(request: ReadingRequest, db: AsyncSession = Depends(get_db)):
     """Analyze reading fluency using AI agents"""
+    await check_references(db, request.studentId, request.lessonId)
     
     prompt = f"""Analyze this student's reading attempt:
     
@@ -84,14 +137,14 @@ Student read: "{request.transcript}"
 
 Evaluate: pronunciation accuracy, fluency, word recognition, and reading pace."""
 
-    ai_result = get_ai_diagnosis(prompt, "reading")
+    ai_result = await get_ai_diagnosis(prompt, "reading", request.section)
     
     if ai_result:
         # Calculate XP based on accuracy
         accuracy = ai_result.get("accuracy", 75)
         xp = int(50 + (accuracy / 2))  # 50-100 XP range
         
-        return DiagnosisResponse(
+        diagnosis = DiagnosisResponse(
             type="reading",
             analysis=ai_result.get("analysis", "Analysis complete."),
             conceptsIdentified=ai_result.get("concepts", ["Reading Fluency"]),
@@ -100,6 +153,9 @@ Evaluate: pronunciation accuracy, fluency, word recognition, and reading pace.""
             xpEarned=xp,
             accuracy=accuracy
         )
+        if request.studentId:
+            await store_diagnosis(db, request.studentId, diagnosis, request.transcript, request.expectedText, request.lessonId)
+        return diagnosis
     
     # Fallback mock
     return DiagnosisResponse(
@@ -113,8 +169,9 @@ Evaluate: pronunciation accuracy, fluency, word recognition, and reading pace.""
     )
 
 @router.post("/math", response_model=DiagnosisResponse)
-async def diagnose_math(request: MathRequest):
+async def diagnose_math(request: MathRequest, db: AsyncSession = Depends(get_db)):
     """Analyze math reasoning using AI agents"""
+    await check_references(db, request.studentId, request.lessonId)
     
     prompt = f"""Analyze this student's math problem solving:
     
@@ -124,13 +181,13 @@ Student's explanation: "{request.transcript}"
 
 Evaluate: problem understanding, calculation steps, reasoning, and final answer."""
 
-    ai_result = get_ai_diagnosis(prompt, "math")
+    ai_result = await get_ai_diagnosis(prompt, "math", request.section)
     
     if ai_result:
         accuracy = ai_result.get("accuracy", 70)
         xp = int(40 + (accuracy / 2))
         
-        return DiagnosisResponse(
+        diagnosis = DiagnosisResponse(
             type="math",
             analysis=ai_result.get("analysis", "Analysis complete."),
             conceptsIdentified=ai_result.get("concepts", ["Basic Math"]),
@@ -139,6 +196,9 @@ Evaluate: problem understanding, calculation steps, reasoning, and final answer.
             xpEarned=xp,
             accuracy=accuracy
         )
+        if request.studentId:
+            await store_diagnosis(db, request.studentId, diagnosis, request.transcript, request.problem, request.lessonId)
+        return diagnosis
     
     # Fallback mock
     return DiagnosisResponse(
@@ -151,40 +211,121 @@ Evaluate: problem understanding, calculation steps, reasoning, and final answer.
         accuracy=70
     )
 
+async def create_narrative(db: AsyncSession) -> str:
+    """Record a pending narrative (pruning expired ones) and return its id"""
+    now = time.time()
+    narrative_id = uuid.uuid4().hex
+    await db.execute(delete(DiagnosisNarrative).where(DiagnosisNarrative.created_at < now - NARRATIVE_RETENTION_SECONDS))
+    db.add(DiagnosisNarrative(id=narrative_id, status="pending", created_at=now))
+    await db.commit()
+    return narrative_id
+
+async def complete_narrative(narrative_id: str, prompt: str, section: Optional[str], assessment_id: Optional[int]):
+    """Background task: AI narrative for a provisional comprehension score"""
+    ai_result = await get_ai_diagnosis(prompt, "comprehension", section)
+    narrative = ai_result and {
+        "analysis": ai_result.get("analysis", "Analysis complete."),
+        "conceptsIdentified": ai_result.get("concepts", ["Basic Comprehension"]),
+        "gapsFound": ai_result.get("gaps", ["Inference skills"]),
+        "recommendations": ai_result.get("recommendations", ["Practice comprehension"]),
+    }
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(DiagnosisNarrative).where(DiagnosisNarrative.id == narrative_id)
+            .values(status="ready" if narrative else "failed", result=narrative)
+        )
+        await db.commit()
+    if not narrative:
+        return
+    if assessment_id is not None:
+        # Accuracy and XP stay as scored locally; the narrative replaces the text
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(Assessment).where(Assessment.id == assessment_id).values(
+                    analysis=narrative["analysis"],
+                    concepts_identified=narrative["conceptsIdentified"],
+                    gaps_found=narrative["gapsFound"],
+                    recommendations=narrative["recommendations"],
+                )
+            )
+            await db.commit()
+
 @router.post("/comprehension", response_model=DiagnosisResponse)
-async def diagnose_comprehension(request: ReadingRequest):
-    """Analyze reading comprehension using AI agents"""
+async def diagnose_comprehension(
+    request: ComprehensionRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
+):
+    """Analyze reading comprehension: local recall/precision score plus an AI narrative"""
+    await check_references(db, request.studentId, request.lessonId)
+    
+    local = await run_in_threadpool(comprehension_scorer.score, request.expectedText, request.transcript)
     
     prompt = f"""Analyze this student's comprehension:
     
 Passage: "{request.expectedText}"
 Student's response: "{request.transcript}"
+Automatic recall check: {local['analysis']}
 
 Evaluate: literal recall, inference, main idea understanding, and vocabulary."""
 
-    ai_result = get_ai_diagnosis(prompt, "comprehension")
-    
-    if ai_result:
-        accuracy = ai_result.get("accuracy", 75)
-        xp = int(45 + (accuracy / 2))
-        
-        return DiagnosisResponse(
-            type="comprehension",
-            analysis=ai_result.get("analysis", "Analysis complete."),
-            conceptsIdentified=ai_result.get("concepts", ["Basic Comprehension"]),
-            gapsFound=ai_result.get("gaps", ["Inference skills"]),
-            recommendations=ai_result.get("recommendations", ["Practice comprehension"]),
-            xpEarned=xp,
-            accuracy=accuracy
-        )
+    mode = request.narrative
+    client = get_chat_client()
+    if not client:
+        mode = "skip"
+    elif mode == "auto":
+        mode = "defer" if narrative_backlogged(client) else "sync"
+
+    if mode == "sync":
+        ai_result = await get_ai_diagnosis(prompt, "comprehension", request.section)
+        if ai_result:
+            accuracy = ai_result.get("accuracy", local["accuracy"])
+            xp = int(45 + (accuracy / 2))
+            
+            diagnosis = DiagnosisResponse(
+                type="comprehension",
+                analysis=ai_result.get("analysis", "Analysis complete."),
+                conceptsIdentified=ai_result.get("concepts", ["Basic Comprehension"]),
+                gapsFound=ai_result.get("gaps", ["Inference skills"]),
+                recommendations=ai_result.get("recommendations", ["Practice comprehension"]),
+                xpEarned=xp,
+                accuracy=accuracy
+            )
+            if request.studentId:
+                await store_diagnosis(db, request.studentId, diagnosis, request.transcript, request.expectedText, request.lessonId)
+            return diagnosis
     
-    # Fallback mock
-    return DiagnosisResponse(
+    # Local score, returned now; a deferred narrative follows in the background
+    accuracy = local["accuracy"]
+    diagnosis = DiagnosisResponse(
         type="comprehension",
-        analysis="Student demonstrated literal recall. Inference skills need development.",
-        conceptsIdentified=["Basic Comprehension", "Literal Recall"],
-        gapsFound=["Inference", "Drawing Conclusions"],
-        recommendations=["Practice 'why' and 'how' questions", "Discuss story predictions"],
-        xpEarned=65,
-        accuracy=75
+        analysis=local["analysis"],
+        conceptsIdentified=local["concepts"],
+        gapsFound=local["gaps"],
+        recommendations=local["recommendations"],
+        xpEarned=int(45 + (accuracy / 2)),
+        accuracy=accuracy,
+        provisional=mode == "defer",
     )
+    assessment = None
+    if request.studentId:
+        assessment = await store_diagnosis(db, request.studentId, diagnosis, request.transcript, request.expectedText, request.lessonId)
+    if mode == "defer":
+        diagnosis.narrativeId = await create_narrative(db)
+        background_tasks.add_task(
+            complete_narrative, diagnosis.narrativeId, prompt, request.section, assessment.id if assessment else None
+        )
+    return diagnosis
+
+@router.get("/narrative/{narrative_id}", response_model=NarrativeResponse)
+async def get_narrative(narrative_id: str, db: AsyncSession = Depends(get_db)):
+    """AI narrative for a provisional comprehension diagnosis"""
+    narrative = await db.get(DiagnosisNarrative, narrative_id)
+    if narrative is None:
+        raise HTTPException(status_code=404, detail="Narrative not found")
+    return NarrativeResponse(status=narrative.status, **(narrative.result or {}))
+
+@router.get("/coalescing-stats")
+async def get_coalescing_stats():
+    """How many identical in-flight LLM requests were merged into one call"""
+    return llm_flights.stats()
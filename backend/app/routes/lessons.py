@@ -0,0 +1,76 @@
+# Lesson Routes - Offline-friendly lesson bundles
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.database import get_db
+from app.services.http_encoding import choose_encoding
+from app.services.lesson_catalog import EncodedBody, lesson_catalog
+
+router = APIRouter()
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def _encoded_response(request: Request, body: EncodedBody, etag: str, cache_control: str) -> Response:
+    headers = {"ETag": f'"{etag}"', "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == f'"{etag}"':
+        return Response(status_code=304, headers=headers)
+    content, encoding = body.get(choose_encoding(request.headers.get("accept-encoding", "")))
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=content, media_type="application/json", headers=headers)
+
+
+@router.get("/catalog")
+async def get_catalog(language: Optional[str] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Current bundle version for every (language, level); download the
+    versioned url, which never changes once published
+    """
+    return {"bundles": await lesson_catalog.catalog(db, language)}
+
+
+@router.get("/bundles/{language}/{level}")
+async def get_latest_bundle(language: str, level: int, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    Latest bundle for a level (revalidated on every use; prefer the
+    versioned url from the catalog)
+    """
+    bundle = await lesson_catalog.latest(db, language, level)
+    if bundle is None:
+        raise HTTPException(status_code=404, detail="No lessons for this language and level")
+    return _encoded_response(request, bundle.body, bundle.version, "public, no-cache")
+
+
+@router.get("/bundles/{language}/{level}/delta")
+async def get_bundle_delta(
+    language: str,
+    level: int,
+    request: Request,
+    base: str = Query(..., alias="from", description="Bundle version the device already has"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Lessons changed or removed since the given version. 410 when that
+    version is too old to diff against; download the full bundle instead.
+    """
+    # Look up the base first: a version from another worker refreshes this one's catalog
+    previous = await lesson_catalog.version(db, language, level, base)
+    target = await lesson_catalog.latest(db, language, level)
+    if target is None:
+        raise HTTPException(status_code=404, detail="No lessons for this language and level")
+    if previous is None:
+        raise HTTPException(status_code=410, detail="Base version no longer available, download the full bundle")
+    body = await lesson_catalog.delta(previous, target)
+    return _encoded_response(request, body, f"{base}-{target.version}", "public, no-cache")
+
+
+@router.get("/bundles/{language}/{level}/{version}")
+async def get_bundle(language: str, level: int, version: str, request: Request, db: AsyncSession = Depends(get_db)):
+    """
+    A specific bundle version (immutable, cacheable forever)
+    """
+    bundle = await lesson_catalog.version(db, language, level, version)
+    if bundle is None:
+        raise HTTPException(status_code=404, detail="Bundle version not found")
+    return _encoded_response(request, bundle.body, bundle.version, IMMUTABLE)
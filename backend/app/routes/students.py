@@ -1,7 +1,16 @@
 # Student Routes
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+from app.database import get_db
+from app.services.assessment_events import missing_reference
+from app.services.concept_graph import concept_index
+from app.services.knowledge_tracing import MASTERED, knowledge_tracer, lesson_key
+from app.services.leaderboard import leaderboard
+from app.services.rewards import claim_reward, rage_meter, reward_events
+from app.services.xp_events import award_xp
 
 router = APIRouter()
 
@@ -19,6 +28,7 @@ class ConceptStatus(BaseModel):
     category: str
     status: str  # mastered, learning, locked
     xpReward: int
+    mastery: Optional[float] = None  # BKT estimate that the concept is known
 
 @router.get("/{student_id}/progress", response_model=StudentProgress)
 async def get_student_progress(student_id: str):
@@ -35,11 +45,41 @@ async def get_student_progress(student_id: str):
         conceptsMastered=["c1", "c2", "m1", "m2", "comp1"]
     )
 
+class NextLesson(BaseModel):
+    id: str
+    title: str
+    subject: str
+    language: str
+    level: int
+    xpReward: int
+
 @router.get("/{student_id}/concepts", response_model=List[ConceptStatus])
-async def get_student_concepts(student_id: str):
+async def get_student_concepts(student_id: str, db: AsyncSession = Depends(get_db)):
     """
     Get all concepts with status for a student
     """
+    await concept_index.fresh(db)
+    graph = concept_index.graph
+    if graph.nodes:
+        state = await concept_index.student(db, student_id)
+        knowledge = await knowledge_tracer.student(db, student_id)
+        concepts = []
+        for lesson_id in graph.topo_order:
+            mastery = knowledge_tracer.mastery(knowledge, lesson_key(lesson_id))
+            status = state.status(lesson_id)
+            if status == "learning" and mastery is not None and mastery >= MASTERED:
+                status = "mastered"
+            concepts.append(ConceptStatus(
+                id=lesson_id,
+                name=graph.nodes[lesson_id].title,
+                category=graph.nodes[lesson_id].subject,
+                status=status,
+                xpReward=graph.nodes[lesson_id].xp_reward,
+                mastery=None if mastery is None else round(mastery, 3)
+            ))
+        return concepts
+    
+    # Demo data until lessons are loaded
     return [
         ConceptStatus(id="c1", name="Letter Recognition", category="reading", status="mastered", xpReward=50),
         ConceptStatus(id="c2", name="Word Formation", category="reading", status="mastered", xpReward=75),
@@ -49,25 +89,84 @@ async def get_student_concepts(student_id: str):
         ConceptStatus(id="m3", name="Addition", category="math", status="learning", xpReward=100),
     ]
 
+@router.get("/{student_id}/next-lessons", response_model=List[NextLesson])
+async def get_next_lessons(
+    student_id: str,
+    limit: int = 3,
+    subject: Optional[str] = None,
+    language: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Unlocked lessons the student should do next, from the prerequisite graph
+    """
+    state = await concept_index.student(db, student_id)
+    lesson_ids = concept_index.next_lessons(state, limit, language=language, subject=subject)
+    nodes = concept_index.graph.nodes
+    return [
+        NextLesson(
+            id=i,
+            title=nodes[i].title,
+            subject=nodes[i].subject,
+            language=nodes[i].language,
+            level=nodes[i].level,
+            xpReward=nodes[i].xp_reward
+        )
+        for i in lesson_ids
+    ]
+
 @router.get("/{student_id}/rage-meter")
-async def get_rage_meter(student_id: str):
+async def get_rage_meter(student_id: str, db: AsyncSession = Depends(get_db)):
     """
     Get student's current rage meter status
     """
-    return {
-        "rageProgress": 320,
-        "rageThreshold": 500,
-        "percentComplete": 64,
-        "rewardAvailable": False
-    }
+    return await rage_meter(db, student_id)
+
+@router.post("/{student_id}/rewards/claim")
+async def claim_student_reward(student_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Redeem an available reward, emptying one threshold from the rage meter
+    """
+    claimed = await claim_reward(db, student_id)
+    if claimed is None:
+        raise HTTPException(status_code=409, detail="No reward available")
+    return claimed
+
+@router.get("/{student_id}/events")
+async def stream_student_events(student_id: str):
+    """
+    Server-sent events for one student ("reward_available" when the rage meter fills)
+    """
+    return StreamingResponse(reward_events.stream(student_id=student_id), media_type="text/event-stream")
 
 @router.post("/{student_id}/xp")
-async def add_xp(student_id: str, amount: int):
+async def add_xp(student_id: str, amount: int = Query(..., gt=0), db: AsyncSession = Depends(get_db)):
     """
     Add XP to student after completing a challenge
     """
-    # In production, update Supabase database
+    error = await missing_reference(db, student_id, None)
+    if error:
+        raise HTTPException(status_code=404, detail=error)
+    progress = await award_xp(db, student_id, amount)
     return {
         "message": f"Added {amount} XP to student {student_id}",
-        "newTotal": 320 + amount
+        "newTotal": progress.xp,
+        "level": progress.level
     }
+
+@router.get("/leaderboard")
+async def get_leaderboard(section: Optional[str] = None, limit: int = Query(10, ge=1, le=100), db: AsyncSession = Depends(get_db)):
+    """
+    Top students by XP, school-wide or for one section
+    """
+    return await leaderboard.top(db, section, limit)
+
+@router.get("/{student_id}/rank")
+async def get_student_rank(student_id: str, db: AsyncSession = Depends(get_db)):
+    """
+    Student's school-wide and section rank
+    """
+    rank = await leaderboard.rank(db, student_id)
+    if rank is None:
+        raise HTTPException(status_code=404, detail="Student not found")
+    return rank
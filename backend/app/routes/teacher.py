@@ -1,7 +1,21 @@
 # Teacher Routes
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.database import get_db
+from app.models import User
+from app.services.at_risk import at_risk_index
+from app.services.knowledge_tracing import knowledge_tracer
+from app.services.rewards import (
+    RewardConfig, count_reward_ready, get_current_reward_config, rage_meter, reward_events, reward_state
+)
+from app.services.roster import REPORTS, import_roster, stream_report
+from app.services.student_queries import (
+    InvalidQuery, class_overview, fetch_student_detail, list_students, parse_fields, student_detail_cache
+)
 
 router = APIRouter()
 
@@ -13,88 +27,183 @@ class StudentSummary(BaseModel):
     rageProgress: int
     conceptsMastered: int
 
+class AtRiskStudent(BaseModel):
+    id: str
+    username: str
+    riskScore: float
+    accuracyDecline: float
+    recentAccuracy: Optional[float] = None
+    recentXP: int
+    repeatedGaps: List[str]
+
 class DashboardResponse(BaseModel):
     students: List[StudentSummary]
     classStats: dict
-
-class RewardConfig(BaseModel):
-    rageThreshold: int
-    rewardType: str
-    rewardValue: str
-    rewardDescription: str
-
-# In-memory storage for demo
-current_reward_config = RewardConfig(
-    rageThreshold=500,
-    rewardType="bonus_marks",
-    rewardValue="5",
-    rewardDescription="5 Bonus Marks"
-)
+    atRisk: List[AtRiskStudent] = []
 
 @router.get("/dashboard", response_model=DashboardResponse)
-async def get_teacher_dashboard():
+async def get_teacher_dashboard(
+    section: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_db)
+):
     """
-    Get teacher dashboard with class overview
+    Get teacher dashboard with class overview (and at-risk students when a section is given)
     """
-    students = [
-        StudentSummary(id="s1", username="Rahul", level=4, xp=320, rageProgress=320, conceptsMastered=4),
-        StudentSummary(id="s2", username="Priya", level=5, xp=480, rageProgress=480, conceptsMastered=6),
-        StudentSummary(id="s3", username="Amit", level=3, xp=200, rageProgress=200, conceptsMastered=3),
-        StudentSummary(id="s4", username="Sneha", level=6, xp=550, rageProgress=50, conceptsMastered=7),
-    ]
+    students, class_stats = await class_overview(db, section, limit)
+    class_stats["rageReady"] = await count_reward_ready(db, section)
     
-    class_stats = {
-        "totalStudents": len(students),
-        "averageXP": sum(s.xp for s in students) // len(students),
-        "totalMastered": sum(s.conceptsMastered for s in students),
-        "rageReady": sum(1 for s in students if s.rageProgress >= current_reward_config.rageThreshold)
-    }
-    
-    return DashboardResponse(students=students, classStats=class_stats)
+    at_risk = await at_risk_index.top(db, section) if section else []
+    return DashboardResponse(
+        students=[StudentSummary(**s) for s in students], classStats=class_stats, atRisk=at_risk
+    )
+
+@router.get("/events")
+async def stream_section_events(section: str):
+    """
+    Server-sent events for a section ("reward_available" when a student's
+    rage meter fills) so the dashboard does not have to poll
+    """
+    return StreamingResponse(reward_events.stream(section=section), media_type="text/event-stream")
+
+@router.get("/at-risk", response_model=List[AtRiskStudent])
+async def get_at_risk_students(section: str, limit: int = 5, db: AsyncSession = Depends(get_db)):
+    """
+    Students most at risk in a section (accuracy decline, stagnating XP,
+    repeated gaps), read from an index kept current by assessment writes
+    """
+    return await at_risk_index.top(db, section, limit)
 
 @router.get("/students")
-async def get_all_students():
+async def get_all_students(
+    section: Optional[str] = None,
+    approved: Optional[bool] = None,
+    minLevel: Optional[int] = None,
+    maxLevel: Optional[int] = None,
+    minReading: Optional[float] = None,
+    maxReading: Optional[float] = None,
+    minMath: Optional[float] = None,
+    maxMath: Optional[float] = None,
+    minComprehension: Optional[float] = None,
+    maxComprehension: Optional[float] = None,
+    minVocabulary: Optional[float] = None,
+    maxVocabulary: Optional[float] = None,
+    sort: str = "username",
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields, e.g. id,username,xp"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
     """
-    Get all students in the class
+    Get students page by page; pass the returned nextCursor to continue
     """
-    return [
-        {"id": "s1", "username": "Rahul", "level": 4, "xp": 320},
-        {"id": "s2", "username": "Priya", "level": 5, "xp": 480},
-        {"id": "s3", "username": "Amit", "level": 3, "xp": 200},
-        {"id": "s4", "username": "Sneha", "level": 6, "xp": 550},
-    ]
+    score_ranges = {
+        skill: bounds
+        for skill, bounds in {
+            "reading": (minReading, maxReading),
+            "math": (minMath, maxMath),
+            "comprehension": (minComprehension, maxComprehension),
+            "vocabulary": (minVocabulary, maxVocabulary),
+        }.items()
+        if bounds != (None, None)
+    }
+    try:
+        return await list_students(
+            db,
+            section=section,
+            approved=approved,
+            min_level=minLevel,
+            max_level=maxLevel,
+            score_ranges=score_ranges,
+            sort=sort,
+            descending=order == "desc",
+            fields=parse_fields(fields),
+            limit=limit,
+            cursor=cursor,
+        )
+    except InvalidQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/struggling")
+async def get_struggling_students(section: str, limit: int = 10, db: AsyncSession = Depends(get_db)):
+    """
+    Students in a section with concepts they keep missing, from knowledge
+    tracing (one batched recomputation for the class, no LLM calls)
+    """
+    result = await db.execute(
+        select(User.id, User.username).where(User.section == section, User.role == "student")
+    )
+    names = {student_id: username for student_id, username in result}
+    if not names:
+        return []
+
+    states = await knowledge_tracer.load_class(db, list(names))
+    struggling = []
+    for student_id, state in states.items():
+        summary = knowledge_tracer.summary(state)
+        if summary["struggling"]:
+            struggling.append({"id": student_id, "username": names[student_id], **summary})
+    struggling.sort(key=lambda s: (-len(s["struggling"]), s["averageMastery"]))
+    return struggling[:limit]
 
 @router.get("/student/{student_id}")
-async def get_student_detail(student_id: str):
+async def get_student_detail(student_id: str, db: AsyncSession = Depends(get_db)):
     """
     Get detailed view of a specific student for teacher
     """
-    return {
-        "id": student_id,
-        "username": "Student",
-        "level": 4,
-        "xp": 320,
-        "rageProgress": 320,
-        "conceptsMastered": ["c1", "c2", "m1", "m2"],
-        "recentDiagnoses": [
-            {"type": "reading", "date": "2024-01-15", "accuracy": 85},
-            {"type": "math", "date": "2024-01-14", "accuracy": 70}
-        ],
-        "gapsIdentified": ["Place Value", "Paragraph Fluency"]
-    }
+    detail = student_detail_cache.get(student_id)
+    if detail is None:
+        detail = await fetch_student_detail(db, student_id)
+        if detail is None:
+            raise HTTPException(status_code=404, detail="Student not found")
+        student_detail_cache.put(student_id, detail)
+
+    # Read fresh: claims and threshold changes move it without touching the cached detail
+    meter = await rage_meter(db, student_id)
+    return {**detail, "rageProgress": meter["rageProgress"]}
+
+@router.post("/roster/import")
+async def import_student_roster(
+    file: UploadFile = File(...),
+    section: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Bulk create/update students from a CSV or XLSX roster
+    (columns: id, username, email, section, approved, xp, level, *_score)
+    """
+    try:
+        result = await import_roster(db, file.file, file.filename or "", default_section=section)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return result
+
+@router.get("/reports/export")
+async def export_class_report(report: str = "students", section: Optional[str] = None):
+    """
+    Download a class report as CSV, streamed while rows are read
+    """
+    if report not in REPORTS:
+        raise HTTPException(status_code=400, detail=f"Unknown report: {report}")
+    filename = f"{report}-{section or 'all'}.csv"
+    return StreamingResponse(
+        stream_report(report, section),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @router.get("/rewards", response_model=RewardConfig)
 async def get_reward_config():
     """
     Get current reward configuration
     """
-    return current_reward_config
+    return await get_current_reward_config()
 
 @router.post("/rewards", response_model=RewardConfig)
 async def update_reward_config(config: RewardConfig):
     """
     Update reward configuration
     """
-    global current_reward_config
-    current_reward_config = config
-    return current_reward_config
+    await reward_state.set("config", config.model_dump())
+    return config
@@ -0,0 +1,216 @@
+# Answer Cache - Semantic cache for repeated chatbot questions
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from typing import Dict, Optional, Set
+
+_NON_WORD = re.compile(r"[^\w\s]+", re.UNICODE)
+_SPACES = re.compile(r"\s+")
+_NUMBER = re.compile(r"\d+")
+
+# Words that can differ between two phrasings of the same question; every
+# other word (the content words) must be the same for a similarity match
+STOPWORDS = frozenset(
+    "a an the is are was were be am what whats who how why when where which do does did "
+    "of to in on at for and or about me i you my your please can could tell explain s".split()
+)
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    return _SPACES.sub(" ", _NON_WORD.sub(" ", text.lower())).strip()
+
+
+def content_words(text: str) -> frozenset:
+    """Non-stopword tokens of normalized text"""
+    return frozenset(word for word in text.split() if word not in STOPWORDS)
+
+
+def trigrams(text: str) -> Counter:
+    """Character trigram counts of normalized text (word-boundary padded)"""
+    padded = f"  {text} "
+    return Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class _Entry:
+    __slots__ = ("key", "grams", "numbers", "words", "norm", "answer", "created", "hits")
+
+    def __init__(self, key: str, grams: Counter, answer: str):
+        self.key = key
+        self.grams = grams
+        self.numbers = _NUMBER.findall(key)
+        self.words = content_words(key)
+        self.norm = math.sqrt(sum(v * v for v in grams.values()))
+        self.answer = answer
+        self.created = time.monotonic()
+        self.hits = 0
+
+
+class _Namespace:
+    """Entries for one chat context, with an inverted trigram index"""
+
+    def __init__(self):
+        self.entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self.postings: Dict[str, Set[str]] = defaultdict(set)
+
+    def add(self, entry: _Entry):
+        self.remove(entry.key)
+        self.entries[entry.key] = entry
+        for gram in entry.grams:
+            self.postings[gram].add(entry.key)
+
+    def remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        for gram in entry.grams:
+            keys = self.postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.postings[gram]
+
+
+class SemanticAnswerCache:
+    """
+    Serve near-duplicate student questions without calling an LLM.
+
+    Questions are normalized and compared by cosine similarity of character
+    trigrams, which copes with small rewordings ("what is noun" vs "What is
+    a noun?") without any model download. Numbers and content words must
+    match exactly, so "5 + 3" never gets the answer to "5 + 4" and "plural
+    of mouse" never gets the answer for "plural of house". Each chat context gets its own
+    namespace so a math answer is never served for a reading question.
+    Entries are evicted LRU per namespace and expire after a TTL.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.85,
+        capacity: int = 2000,
+        ttl: float = 24 * 3600,
+        min_words: int = 2,
+        max_chars: int = 200,
+        max_candidates: int = 50,
+    ):
+        self.threshold = threshold
+        self.capacity = capacity
+        self.ttl = ttl
+        self.min_words = min_words
+        self.max_chars = max_chars
+        self.max_candidates = max_candidates
+        self._namespaces: Dict[str, _Namespace] = defaultdict(_Namespace)
+        self._lock = threading.Lock()
+        self._stats = defaultdict(float)
+
+    def cacheable(self, message: str) -> bool:
+        """Only standalone questions are worth sharing between students"""
+        text = normalize(message)
+        return len(text) <= self.max_chars and len(text.split()) >= self.min_words
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return now - entry.created > self.ttl
+
+    def get(self, message: str, context: str) -> Optional[_Entry]:
+        """Return the best cached answer above the similarity threshold"""
+        started = time.perf_counter()
+        key = normalize(message)
+        namespace_key = normalize(context)
+        now = time.monotonic()
+
+        with self._lock:
+            self._stats["lookups"] += 1
+            namespace = self._namespaces.get(namespace_key)
+            match = None
+
+            if namespace is not None:
+                # Exact normalized match first, then trigram similarity
+                entry = namespace.entries.get(key)
+                if entry is not None and not self._expired(entry, now):
+                    match = entry
+                    self._stats["exact_hits"] += 1
+                else:
+                    match = self._nearest(namespace, key, now)
+
+            if match is None:
+                self._stats["misses"] += 1
+                return None
+
+            namespace.entries.move_to_end(match.key)
+            match.hits += 1
+            self._stats["hits"] += 1
+            self._stats["hit_seconds"] += time.perf_counter() - started
+            return match
+
+    def _nearest(self, namespace: _Namespace, key: str, now: float) -> Optional[_Entry]:
+        grams = trigrams(key)
+        numbers = _NUMBER.findall(key)
+        words = content_words(key)
+
+        # Prefix filter: a match above the threshold must share one of the
+        # query's rarest trigrams, so common ones ("wha", "is ") are skipped
+        rarest = sorted(grams, key=lambda g: len(namespace.postings.get(g, ())))
+        prefix = len(rarest) - int(self.threshold ** 2 * len(rarest)) + 1
+        candidates = set()
+        for gram in rarest[:prefix]:
+            candidates.update(namespace.postings.get(gram, ()))
+            if len(candidates) >= self.max_candidates:
+                break
+
+        query_norm = math.sqrt(sum(v * v for v in grams.values()))
+        best, best_score = None, self.threshold
+        for candidate in candidates:
+            entry = namespace.entries[candidate]
+            if self._expired(entry, now):
+                namespace.remove(candidate)
+                continue
+            if entry.numbers != numbers or entry.words != words:
+                continue
+            dot = sum(count * entry.grams.get(gram, 0) for gram, count in grams.items())
+            score = dot / (query_norm * entry.norm) if query_norm and entry.norm else 0.0
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def put(self, message: str, context: str, answer: str, llm_seconds: float = 0.0):
+        """Store an LLM answer and record how long it took to produce"""
+        key = normalize(message)
+        with self._lock:
+            namespace = self._namespaces[normalize(context)]
+            namespace.add(_Entry(key, trigrams(key), answer))
+            while len(namespace.entries) > self.capacity:
+                oldest = next(iter(namespace.entries))
+                namespace.remove(oldest)
+                self._stats["evictions"] += 1
+            self._stats["llm_calls"] += 1
+            self._stats["llm_seconds"] += llm_seconds
+
+    def stats(self) -> dict:
+        """Hit rate and estimated latency saved by serving from cache"""
+        with self._lock:
+            lookups = self._stats["lookups"]
+            hits = self._stats["hits"]
+            avg_llm = self._stats["llm_seconds"] / self._stats["llm_calls"] if self._stats["llm_calls"] else 0.0
+            avg_hit = self._stats["hit_seconds"] / hits if hits else 0.0
+            return {
+                "lookups": int(lookups),
+                "hits": int(hits),
+                "exactHits": int(self._stats["exact_hits"]),
+                "misses": int(self._stats["misses"]),
+                "evictions": int(self._stats["evictions"]),
+                "hitRate": round(hits / lookups, 4) if lookups else 0.0,
+                "avgHitMs": round(avg_hit * 1000, 3),
+                "avgLlmMs": round(avg_llm * 1000, 1),
+                "estimatedSecondsSaved": round(hits * max(avg_llm - avg_hit, 0.0), 2),
+                "entries": sum(len(n.entries) for n in self._namespaces.values()),
+                "namespaces": len(self._namespaces),
+            }
+
+
+answer_cache = SemanticAnswerCache(
+    threshold=float(os.getenv("CHAT_CACHE_THRESHOLD", "0.85")),
+    capacity=int(os.getenv("CHAT_CACHE_CAPACITY", "2000")),
+)
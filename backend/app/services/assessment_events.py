@@ -0,0 +1,65 @@
+# Assessment Events - Persist diagnoses and fan them out to incremental indexes
+from typing import Awaitable, Callable, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Assessment, Lesson, User
+
+AssessmentListener = Callable[[AsyncSession, Assessment], Awaitable[None]]
+
+_listeners: List[AssessmentListener] = []
+
+
+def on_assessment(listener: AssessmentListener) -> AssessmentListener:
+    """Register a coroutine called after every stored assessment (usable as a decorator)"""
+    _listeners.append(listener)
+    return listener
+
+
+async def missing_reference(db: AsyncSession, student_id: Optional[str], lesson_id: Optional[str]) -> Optional[str]:
+    """Error message when the student or lesson an assessment would point to does not exist"""
+    if student_id and await db.scalar(select(User.id).where(User.id == student_id, User.role == "student")) is None:
+        return "Student not found"
+    if lesson_id and await db.scalar(select(Lesson.id).where(Lesson.id == lesson_id)) is None:
+        return "Lesson not found"
+    return None
+
+
+async def record_assessment(
+    db: AsyncSession,
+    student_id: str,
+    agent_type: str,
+    result: dict,
+    transcript: Optional[str] = None,
+    expected_text: Optional[str] = None,
+    lesson_id: Optional[str] = None,
+) -> Assessment:
+    """
+    Store one diagnosis result and notify listeners (mastery graph,
+    knowledge tracing, at-risk index, caches) so they update in O(1)
+    instead of rescanning history.
+    """
+    assessment = Assessment(
+        user_id=student_id,
+        agent_type=agent_type,
+        lesson_id=lesson_id,
+        transcript=transcript,
+        expected_text=expected_text,
+        analysis=result.get("analysis"),
+        concepts_identified=result.get("concepts", []),
+        gaps_found=result.get("gaps", []),
+        recommendations=result.get("recommendations", []),
+        accuracy=int(result.get("accuracy", 0)),
+        xp_earned=int(result.get("xp_earned", 0)),
+    )
+    db.add(assessment)
+    await db.commit()
+
+    for listener in _listeners:
+        try:
+            await listener(db, assessment)
+        except Exception as e:
+            print(f"Assessment listener error ({getattr(listener, '__name__', listener)}): {e}")
+
+    return assessment
@@ -0,0 +1,205 @@
+# At-Risk Index - Per-section ranking of students who may be struggling
+#
+# Each student keeps a short window of recent assessments. From it we
+# derive three signals - accuracy decline (older half vs newer half of the
+# window), stagnating XP (little XP earned in the last few days) and gaps
+# that keep coming back - and combine them into one risk score. Every
+# section keeps its students in a list sorted by score, so a new assessment
+# re-ranks one student in O(log n) and the dashboard reads the top K as a
+# slice. Sections are loaded from the database on first use and rebuilt
+# every refresh_seconds, which also picks up writes made by other workers.
+# Stagnation depends on the clock, so a section is re-scored in place when
+# it is read more than RESCORE_SECONDS after its last scoring.
+import bisect
+import os
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Assessment, User
+from app.services.assessment_events import on_assessment
+
+WINDOW = 10                # Recent assessments kept per student
+STAGNANT_DAYS = 7          # XP look-back period
+XP_TARGET = 100            # XP per look-back period considered healthy
+DECLINE_POINTS = 15.0      # Accuracy drop that counts as one full risk point
+MIN_RISK = 0.5             # Scores below this are not reported
+RESCORE_SECONDS = 60       # Re-score a section read this long after its last scoring
+
+
+def _seconds(value) -> float:
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)  # Stored naive, in UTC (datetime.utcnow)
+        return value.timestamp()
+    return time.time()
+
+
+class StudentRisk:
+    """Recent assessment window and the risk signals derived from it"""
+
+    __slots__ = ("student_id", "username", "section", "recent", "score", "signals")
+
+    def __init__(self, student_id: str, username: str, section: str):
+        self.student_id = student_id
+        self.username = username
+        self.section = section
+        # (timestamp, accuracy, xp_earned, gaps)
+        self.recent: Deque[Tuple[float, int, int, Tuple[str, ...]]] = deque(maxlen=WINDOW)
+        self.score = 0.0
+        self.signals: dict = {}
+
+    def add(self, created_at, accuracy: int, xp_earned: int, gaps) -> None:
+        self.recent.append((_seconds(created_at), accuracy or 0, xp_earned or 0, tuple(gaps or ())))
+
+    def evaluate(self, now: Optional[float] = None) -> float:
+        """Recompute signals from the window (O(WINDOW))"""
+        now = now or time.time()
+        accuracies = [a for _, a, _, _ in self.recent]
+        decline = 0.0
+        if len(accuracies) >= 4:
+            half = len(accuracies) // 2
+            older, newer = accuracies[:half], accuracies[half:]
+            decline = max(0.0, sum(older) / len(older) - sum(newer) / len(newer))
+
+        since = now - STAGNANT_DAYS * 86400
+        recent_xp = sum(xp for t, _, xp, _ in self.recent if t >= since)
+        stagnation = max(0.0, 1.0 - recent_xp / XP_TARGET) if self.recent else 0.0
+
+        gap_counts = Counter(gap for _, _, _, gaps in self.recent for gap in set(gaps))
+        repeated = sorted(gap for gap, n in gap_counts.items() if n >= 2)
+
+        self.score = round(decline / DECLINE_POINTS + stagnation + 0.5 * len(repeated), 3)
+        self.signals = {
+            "accuracyDecline": round(decline, 1),
+            "recentAccuracy": round(sum(accuracies[-3:]) / len(accuracies[-3:]), 1) if accuracies else None,
+            "recentXP": recent_xp,
+            "repeatedGaps": repeated,
+        }
+        return self.score
+
+    def to_dict(self) -> dict:
+        return {"id": self.student_id, "username": self.username, "riskScore": self.score, **self.signals}
+
+
+class SectionRanking:
+    """Students of one section sorted by descending risk"""
+
+    def __init__(self):
+        self.students: Dict[str, StudentRisk] = {}
+        self._order: List[Tuple[float, str]] = []  # (-score, student_id)
+        self.loaded_at = self.scored_at = time.time()
+
+    def upsert(self, risk: StudentRisk) -> None:
+        previous = self.students.get(risk.student_id)
+        if previous is not None:
+            entry = (-previous.score, risk.student_id)
+            position = bisect.bisect_left(self._order, entry)
+            if position < len(self._order) and self._order[position] == entry:
+                self._order.pop(position)
+        self.students[risk.student_id] = risk
+
+    def rescore(self, risk: StudentRisk) -> None:
+        """Re-rank one student after its window changed"""
+        self.upsert(risk)
+        risk.evaluate()
+        bisect.insort(self._order, (-risk.score, risk.student_id))
+
+    def rescore_all(self) -> None:
+        """Re-evaluate every student against the current time (stagnation ages)"""
+        now = time.time()
+        for risk in self.students.values():
+            risk.evaluate(now)
+        self._order = sorted((-risk.score, student_id) for student_id, risk in self.students.items())
+        self.scored_at = now
+
+    def top(self, k: int) -> List[StudentRisk]:
+        result = []
+        for negative_score, student_id in self._order:
+            if -negative_score < MIN_RISK or len(result) >= k:
+                break
+            result.append(self.students[student_id])
+        return result
+
+
+class AtRiskIndex:
+    """Lazily loaded per-section rankings kept current by assessment writes"""
+
+    def __init__(self, refresh_seconds: float = 300):
+        self.refresh_seconds = refresh_seconds
+        self._sections: Dict[str, SectionRanking] = {}
+        self._section_of: Dict[str, str] = {}
+
+    async def load_section(self, db: AsyncSession, section: str) -> SectionRanking:
+        """Build a section from its students' last WINDOW assessments"""
+        users = (await db.execute(
+            select(User.id, User.username).where(User.section == section, User.role == "student")
+        )).all()
+        ranking = SectionRanking()
+        risks = {student_id: StudentRisk(student_id, username, section) for student_id, username in users}
+
+        if risks:
+            # Window function keeps only the newest WINDOW rows per student
+            position = func.row_number().over(
+                partition_by=Assessment.user_id, order_by=Assessment.created_at.desc()
+            ).label("position")
+            recent = (
+                select(Assessment.user_id, Assessment.created_at, Assessment.accuracy,
+                       Assessment.xp_earned, Assessment.gaps_found, position)
+                .where(Assessment.user_id.in_(list(risks)))
+                .subquery()
+            )
+            rows = await db.execute(
+                select(recent.c.user_id, recent.c.created_at, recent.c.accuracy, recent.c.xp_earned, recent.c.gaps_found)
+                .where(recent.c.position <= WINDOW)
+                .order_by(recent.c.user_id, recent.c.created_at)
+            )
+            for student_id, created_at, accuracy, xp_earned, gaps in rows:
+                risks[student_id].add(created_at, accuracy, xp_earned, gaps)
+
+        for risk in risks.values():
+            ranking.rescore(risk)
+            self._section_of[risk.student_id] = section
+        self._sections[section] = ranking
+        return ranking
+
+    async def section(self, db: AsyncSession, section: str) -> SectionRanking:
+        ranking = self._sections.get(section)
+        if ranking is None or time.time() - ranking.loaded_at > self.refresh_seconds:
+            ranking = await self.load_section(db, section)
+        elif time.time() - ranking.scored_at > RESCORE_SECONDS:
+            ranking.rescore_all()
+        return ranking
+
+    async def top(self, db: AsyncSession, section: str, k: int = 5) -> List[dict]:
+        ranking = await self.section(db, section)
+        return [risk.to_dict() for risk in ranking.top(k)]
+
+    async def record(self, db: AsyncSession, assessment: Assessment) -> None:
+        """O(log n) update for a student whose section is already loaded"""
+        section = self._section_of.get(assessment.user_id)
+        risk = self._sections[section].students.get(assessment.user_id) if section in self._sections else None
+        if risk is None:
+            # Added (or moved) since the section was loaded
+            user = (await db.execute(
+                select(User.username, User.section).where(User.id == assessment.user_id, User.role == "student")
+            )).first()
+            if user is None or user.section not in self._sections:
+                return  # Loaded from the database (including this row) on first read
+            section = self._section_of[assessment.user_id] = user.section
+            risk = StudentRisk(assessment.user_id, user.username, section)
+        ranking = self._sections[section]
+        risk.add(assessment.created_at, assessment.accuracy, assessment.xp_earned, assessment.gaps_found)
+        ranking.rescore(risk)
+
+
+at_risk_index = AtRiskIndex(refresh_seconds=float(os.getenv("AT_RISK_REFRESH_SECONDS", "300")))
+
+
+@on_assessment
+async def update_at_risk(db: AsyncSession, assessment: Assessment):
+    await at_risk_index.record(db, assessment)
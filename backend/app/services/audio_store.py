@@ -0,0 +1,324 @@
+# Audio Store - Content-addressed on-disk storage for recordings
+#
+# Uploads are streamed to a temp file in fixed-size chunks while a SHA-256
+# is computed on the fly, then renamed into place at
+# <root>/<h[0:2]>/<h[2:4]>/<h>. Identical recordings are stored once; every
+# upload is a row in audio_uploads pointing at the shared object, and
+# objects no upload refers to are garbage collected. Memory use is one
+# chunk no matter how long the clip is.
+#
+# Limits: per-upload size, per-owner quota (bytes of distinct recordings
+# they uploaded) and total store capacity; a background loop applies the
+# retention period and evicts the oldest uploads when over capacity.
+#
+# Uploads and the sweep are ordered through the database: an upload
+# commits its rows before it looks for or places the file, and the sweep
+# deletes an object only if no upload refers to it inside the same
+# transaction, removing the file before that transaction commits. So an
+# upload either keeps the object alive or finds the file gone and writes
+# its own copy. File system calls run in the threadpool.
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional, Tuple
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import Response
+
+from app.database import AsyncSessionLocal
+from app.models import AudioObject, AudioUpload
+
+CHUNK_SIZE = 256 * 1024
+MB = 1024 * 1024
+
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class AudioStoreError(Exception):
+    status_code = 400
+
+
+class UploadTooLarge(AudioStoreError):
+    status_code = 413
+
+
+class QuotaExceeded(AudioStoreError):
+    status_code = 413
+
+
+class StoreFull(AudioStoreError):
+    status_code = 507
+
+
+class StoreBusy(AudioStoreError):
+    status_code = 503
+
+
+async def upload_chunks(upload: UploadFile, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+class AudioStore:
+    def __init__(
+        self,
+        root: str,
+        max_upload_bytes: int = 50 * MB,
+        quota_bytes: int = 500 * MB,
+        capacity_bytes: int = 20 * 1024 * MB,
+        retention_days: float = 180,
+        sweep_seconds: float = 3600,
+    ):
+        self.root = root
+        self.max_upload_bytes = max_upload_bytes
+        self.quota_bytes = quota_bytes
+        self.capacity_bytes = capacity_bytes
+        self.retention_days = retention_days
+        self.sweep_seconds = sweep_seconds
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def valid_id(self, sha256: str) -> bool:
+        return bool(_SHA256.match(sha256))
+
+    async def owner_usage(self, db: AsyncSession, owner_id: str) -> int:
+        distinct = select(AudioUpload.sha256).where(AudioUpload.owner_id == owner_id).distinct().subquery()
+        used = await db.scalar(
+            select(func.sum(AudioObject.size)).join(distinct, distinct.c.sha256 == AudioObject.sha256)
+        )
+        return used or 0
+
+    async def total_usage(self, db: AsyncSession) -> int:
+        return (await db.scalar(select(func.sum(AudioObject.size)))) or 0
+
+    async def store(
+        self,
+        db: AsyncSession,
+        chunks: AsyncIterator[bytes],
+        content_type: Optional[str] = None,
+        filename: Optional[str] = None,
+        owner_id: Optional[str] = None,
+        on_chunk=None,
+    ) -> dict:
+        """
+        Stream chunks to disk and register the upload. on_chunk(hasher, size)
+        is called after every chunk for callers that act on the running hash.
+        """
+        if await self.total_usage(db) >= self.capacity_bytes:
+            raise StoreFull("Audio storage is full")
+        limit = self.max_upload_bytes
+        if owner_id:
+            remaining = self.quota_bytes - await self.owner_usage(db, owner_id)
+            if remaining <= 0:
+                raise QuotaExceeded("Audio quota used up")
+            limit = min(limit, remaining)
+
+        staging = os.path.join(self.root, "tmp")
+        await run_in_threadpool(os.makedirs, staging, exist_ok=True)
+        hasher = hashlib.sha256()
+        size = 0
+        handle = await run_in_threadpool(tempfile.NamedTemporaryFile, dir=staging, delete=False)
+        try:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > limit:
+                    raise (QuotaExceeded("Upload exceeds the remaining audio quota") if limit < self.max_upload_bytes
+                           else UploadTooLarge(f"Audio larger than {self.max_upload_bytes // MB} MB"))
+                hasher.update(chunk)
+                await run_in_threadpool(handle.write, chunk)
+                if on_chunk is not None:
+                    await on_chunk(hasher, size)
+            await run_in_threadpool(handle.close)
+
+            sha256 = hasher.hexdigest()
+            # Reference the object first so a concurrent sweep cannot collect it
+            await self._register(db, sha256, size, content_type, owner_id, filename)
+            target = self.path(sha256)
+            deduplicated = await run_in_threadpool(self._place, handle.name, target)
+        except BaseException:
+            await run_in_threadpool(self._discard, handle)
+            raise
+        return {"id": sha256, "size": size, "deduplicated": deduplicated, "path": target}
+
+    async def _register(self, db: AsyncSession, sha256: str, size: int, content_type, owner_id, filename):
+        stored = select(AudioObject.sha256).where(AudioObject.sha256 == sha256)
+        upload_added = False
+        for _ in range(3):
+            missing = await db.scalar(stored) is None
+            if missing:
+                db.add(AudioObject(sha256=sha256, size=size, content_type=content_type))
+            if not upload_added:
+                db.add(AudioUpload(sha256=sha256, owner_id=owner_id, filename=filename))
+            try:
+                await db.commit()
+            except IntegrityError:
+                # The same recording was registered concurrently; look again
+                await db.rollback()
+                continue
+            upload_added = True
+            # Foreign keys may not be enforced (SQLite): check a sweep did not
+            # delete the object while our upload was waiting to commit
+            if missing or await db.scalar(stored) is not None:
+                return
+        raise StoreBusy("Could not register the recording, please retry")
+
+    @staticmethod
+    def _place(staged: str, target: str) -> bool:
+        """Move a staged file into place unless the object is already stored; True if it was"""
+        if os.path.exists(target):
+            os.unlink(staged)
+            return True
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(staged, target)  # Atomic: readers never see a partial file
+        return False
+
+    @staticmethod
+    def _discard(handle):
+        handle.close()
+        if os.path.exists(handle.name):
+            os.unlink(handle.name)
+
+    async def open(self, db: AsyncSession, sha256: str) -> Optional[Tuple[str, AudioObject]]:
+        if not self.valid_id(sha256):
+            return None
+        stored = await db.get(AudioObject, sha256)
+        path = self.path(sha256)
+        if stored is None or not await run_in_threadpool(os.path.exists, path):
+            return None
+        return path, stored
+
+    async def sweep(self, db: AsyncSession) -> dict:
+        """Apply retention and capacity, then delete unreferenced objects"""
+        expired = await db.execute(
+            delete(AudioUpload).where(
+                AudioUpload.created_at < datetime.utcnow() - timedelta(days=self.retention_days)
+            )
+        )
+        evicted = 0
+        excess = await self.total_usage(db) - self.capacity_bytes
+        if excess > 0:
+            # Oldest uploads first until enough bytes would be freed; an
+            # object's bytes only count once its last upload is evicted
+            references = dict((await db.execute(
+                select(AudioUpload.sha256, func.count()).group_by(AudioUpload.sha256)
+            )).all())
+            oldest = await db.execute(
+                select(AudioUpload.id, AudioUpload.sha256, AudioObject.size)
+                .join(AudioObject, AudioObject.sha256 == AudioUpload.sha256)
+                .order_by(AudioUpload.created_at, AudioUpload.id)
+            )
+            doomed = []
+            for upload_id, sha256, size in oldest:
+                if excess <= 0:
+                    break
+                doomed.append(upload_id)
+                references[sha256] -= 1
+                if references[sha256] == 0:
+                    excess -= size
+            await db.execute(delete(AudioUpload).where(AudioUpload.id.in_(doomed)))
+            evicted = len(doomed)
+
+        # Unreferenced at delete time, not just when listed: an upload
+        # registered since then keeps its object
+        unreferenced = ~select(AudioUpload.id).where(AudioUpload.sha256 == AudioObject.sha256).exists()
+        orphans = (await db.execute(
+            delete(AudioObject).where(unreferenced).returning(AudioObject.sha256)
+        )).scalars().all()
+        # Remove files before committing, so an upload waiting on these rows
+        # finds its file missing and stores it again
+        await run_in_threadpool(self._unlink_all, orphans)
+        await db.commit()
+        return {"expiredUploads": expired.rowcount, "evictedUploads": evicted, "deletedObjects": len(orphans)}
+
+    def _unlink_all(self, sha256s):
+        for sha256 in sha256s:
+            try:
+                os.unlink(self.path(sha256))
+            except FileNotFoundError:
+                pass
+
+    async def run(self):
+        """Background task: sweep periodically"""
+        while True:
+            await asyncio.sleep(self.sweep_seconds)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await self.sweep(db)
+            except Exception as e:
+                print(f"Audio store sweep error: {e}")
+
+
+class RangeFileResponse(Response):
+    """
+    Immutable file response with single-range support (206/416). Uses the
+    ASGI zero-copy send extension when the server offers it, otherwise
+    reads one chunk at a time with pread.
+    """
+
+    def __init__(self, path: str, size: int, media_type: Optional[str], etag: str, range_header: Optional[str] = None):
+        super().__init__(media_type=media_type or "application/octet-stream")
+        self.path = path
+        self.start, self.end = 0, size - 1
+        headers = {
+            "accept-ranges": "bytes",
+            "etag": f'"{etag}"',
+            "cache-control": "private, max-age=31536000, immutable",
+        }
+        match = _RANGE.match(range_header.strip()) if range_header else None
+        if range_header and match and any(match.groups()):
+            first, last = match.groups()
+            if first:
+                self.start, self.end = int(first), min(int(last), size - 1) if last else size - 1
+            else:
+                self.start = max(0, size - int(last))  # Suffix range: last N bytes
+            if self.start > self.end or self.start >= size:
+                self.status_code, self.start, self.end = 416, 0, -1
+                headers["content-range"] = f"bytes */{size}"
+            else:
+                self.status_code = 206
+                headers["content-range"] = f"bytes {self.start}-{self.end}/{size}"
+        headers["content-length"] = str(self.end - self.start + 1)
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        length = self.end - self.start + 1
+        if scope.get("method") == "HEAD" or length <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        fd = await run_in_threadpool(os.open, self.path, os.O_RDONLY)
+        try:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": fd, "offset": self.start, "count": length})
+                return
+            offset, end = self.start, self.end + 1
+            while offset < end:
+                data = await run_in_threadpool(os.pread, fd, min(CHUNK_SIZE, end - offset), offset)
+                if not data:
+                    break
+                offset += len(data)
+                await send({"type": "http.response.body", "body": data, "more_body": offset < end})
+        finally:
+            os.close(fd)
+
+
+audio_store = AudioStore(
+    root=os.getenv("AUDIO_STORE_DIR", os.path.join(os.getcwd(), "audio_store")),
+    max_upload_bytes=int(float(os.getenv("AUDIO_MAX_UPLOAD_MB", "50")) * MB),
+    quota_bytes=int(float(os.getenv("AUDIO_QUOTA_MB", "500")) * MB),
+    capacity_bytes=int(float(os.getenv("AUDIO_STORE_MAX_MB", "20480")) * MB),
+    retention_days=float(os.getenv("AUDIO_RETENTION_DAYS", "180")),
+)
@@ -0,0 +1,162 @@
+# Chat Sessions - Server-side chatbot history with a rolling summary
+import os
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ChatSession, ChatTurn
+from app.services.llm_scheduler import llm_scheduler
+
+# Turns sent verbatim with each prompt; anything older lives in the summary
+RECENT_TURNS = 6
+# Compact once this many unsummarized turns pile up
+COMPACT_AFTER = 10
+MAX_SUMMARY_CHARS = 800
+
+
+class SessionState:
+    """Hot-tier view of a session: its summary plus unsummarized turns"""
+    __slots__ = ("summary", "turns", "last_id", "updated_at")
+
+    def __init__(self, summary: Optional[str] = None, turns: Optional[list] = None, updated_at=None):
+        self.summary = summary
+        self.turns = turns or []  # [(turn_id, role, content)]
+        self.last_id = self.turns[-1][0] if self.turns else None
+        self.updated_at = updated_at  # Session row's updated_at; changes when any worker compacts
+
+    def recent(self) -> List[dict]:
+        return [{"role": role, "content": content} for _, role, content in self.turns[-RECENT_TURNS:]]
+
+
+def shorten(summary: str, limit: int = MAX_SUMMARY_CHARS) -> str:
+    """Cut the middle out of an overlong summary, keeping its oldest and newest parts"""
+    if len(summary) <= limit:
+        return summary
+    keep = (limit - 5) // 2
+    return f"{summary[:keep]} ... {summary[-keep:]}"
+
+
+def extractive_summary(previous: Optional[str], turns: List[dict]) -> str:
+    """Cheap fallback summary: keep what the student asked, newest last"""
+    asked = [t["content"] for t in turns if t["role"] == "user"]
+    return shorten(" ".join(filter(None, [previous, "Student asked: " + " | ".join(asked) if asked else None])))
+
+
+class ChatSessionStore:
+    """
+    DB-backed chat history with an in-memory LRU hot tier.
+
+    Clients send only a session id; the store supplies the last few turns
+    plus a rolling summary so prompts stay a bounded size however long the
+    conversation runs.
+    """
+
+    def __init__(self, capacity: int = 1000, summarizer: Optional[Callable] = None):
+        self.capacity = capacity
+        self.summarizer = summarizer or extractive_summary
+        self._hot: "OrderedDict[str, SessionState]" = OrderedDict()
+        self._compacting = set()
+
+    def _remember(self, session_id: str, state: SessionState) -> SessionState:
+        self._hot[session_id] = state
+        self._hot.move_to_end(session_id)
+        while len(self._hot) > self.capacity:
+            self._hot.popitem(last=False)
+        return state
+
+    async def create(self, db: AsyncSession, context: Optional[str] = None, user_id: Optional[str] = None) -> str:
+        """Start a new session and return its id"""
+        session_id = str(uuid.uuid4())
+        now = datetime.utcnow()
+        db.add(ChatSession(id=session_id, user_id=user_id, context=context, created_at=now, updated_at=now))
+        await db.commit()
+        self._remember(session_id, SessionState(updated_at=now))
+        return session_id
+
+    async def load(self, db: AsyncSession, session_id: str) -> Optional[SessionState]:
+        """Fetch a session from the hot tier, falling back to the database"""
+        state = self._hot.get(session_id)
+        if state is not None:
+            # Another worker may have appended turns or compacted the session
+            last_id = select(func.max(ChatTurn.id)).where(ChatTurn.session_id == session_id).scalar_subquery()
+            current = (await db.execute(
+                select(last_id, ChatSession.updated_at).where(ChatSession.id == session_id)
+            )).first()
+            if current is not None and tuple(current) == (state.last_id, state.updated_at):
+                self._hot.move_to_end(session_id)
+                return state
+            del self._hot[session_id]
+
+        session = await db.get(ChatSession, session_id)
+        if session is None:
+            return None
+
+        result = await db.execute(
+            select(ChatTurn.id, ChatTurn.role, ChatTurn.content)
+            .where(ChatTurn.session_id == session_id, ChatTurn.summarized == False)  # noqa: E712
+            .order_by(ChatTurn.id)
+        )
+        return self._remember(
+            session_id, SessionState(session.summary, [tuple(row) for row in result], session.updated_at)
+        )
+
+    async def append(self, db: AsyncSession, session_id: str, role: str, content: str):
+        """Persist a turn and add it to the hot tier"""
+        turn = ChatTurn(session_id=session_id, role=role, content=content)
+        db.add(turn)
+        await db.commit()
+
+        state = self._hot.get(session_id)
+        if state is not None:
+            state.turns.append((turn.id, role, content))
+            state.last_id = turn.id
+
+    def needs_compaction(self, session_id: str) -> bool:
+        state = self._hot.get(session_id)
+        return state is not None and len(state.turns) > COMPACT_AFTER
+
+    async def compact(self, db: AsyncSession, session_id: str):
+        """Fold all but the most recent turns into the session summary"""
+        state = await self.load(db, session_id)
+        if state is None or len(state.turns) <= RECENT_TURNS:
+            return
+
+        if session_id in self._compacting:
+            return
+        self._compacting.add(session_id)
+        try:
+            await self._compact(db, session_id, state)
+        finally:
+            self._compacting.discard(session_id)
+
+    async def _compact(self, db: AsyncSession, session_id: str, state: SessionState):
+        old = state.turns[:-RECENT_TURNS]
+        old_turns = [{"role": role, "content": content} for _, role, content in old]
+        summary = await llm_scheduler.run(self.summarizer, state.summary, old_turns)
+        summary = summary or extractive_summary(state.summary, old_turns)
+        if len(summary) > MAX_SUMMARY_CHARS:
+            # Condense the whole summary rather than cutting off its oldest context
+            summary = shorten(await llm_scheduler.run(self.summarizer, summary, []) or summary)
+
+        await db.execute(
+            update(ChatTurn)
+            .where(ChatTurn.id.in_([turn_id for turn_id, _, _ in old]))
+            .values(summarized=True)
+        )
+        updated_at = await db.scalar(
+            update(ChatSession).where(ChatSession.id == session_id).values(summary=summary)
+            .returning(ChatSession.updated_at)
+        )
+        await db.commit()
+
+        # Turns appended while we were summarizing stay unsummarized
+        state.summary = summary
+        state.updated_at = updated_at
+        state.turns = state.turns[len(old):]
+
+
+chat_sessions = ChatSessionStore(capacity=int(os.getenv("CHAT_HOT_SESSIONS", "1000")))
@@ -0,0 +1,225 @@
+# Comprehension Scoring - Fast local recall/precision of a student's retelling
+#
+# Each passage is reduced once to key points, cached by the SHA-256 of its
+# text:
+#   entities  names and numbers (capitalized words that are not just
+#             sentence starts, digits)
+#   events    past-tense verbs, in passage order
+#   facts     the content words of each sentence
+# A response is then scored by matching its words against those points.
+# Words match exactly, by a light English stem, or fuzzily (difflib ratio)
+# so spelling and speech-to-text slips still count. Recall is the weighted
+# share of key points found. Precision is the share of the response's words
+# and word pairs that come from the passage. Accuracy is their F2 score
+# (recall weighs more). Inference and main idea are left to the LLM
+# narrative, which callers skip or defer while the provider queue is backed
+# up (COMPREHENSION_NARRATIVE_MAX_BACKLOG waiting calls).
+import difflib
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Set, Tuple
+
+from app.services.llm_scheduler import llm_scheduler, provider_for
+
+_SENTENCE = re.compile(r"[^.!?।\n]+")
+_TOKEN = re.compile(r"[\w\u0900-\u097F\u0D00-\u0D7F']+")  # Keep Devanagari/Malayalam vowel signs in words
+
+STOPWORDS = {
+    "the", "and", "for", "with", "that", "this", "are", "was", "were", "you", "his", "her", "him", "she",
+    "they", "them", "their", "there", "then", "what", "when", "where", "who", "has", "had", "have", "but",
+    "not", "all", "one", "out", "from", "into", "very", "about", "said", "its", "our", "she's", "he's", "also",
+    "some", "will", "would", "could", "because", "after", "before", "once", "story", "passage",
+}
+IRREGULAR_PAST = {
+    "went", "ran", "saw", "ate", "came", "took", "found", "gave", "made", "told", "got", "fell", "flew",
+    "sat", "stood", "swam", "sang", "drank", "wrote", "rode", "caught", "brought", "bought", "thought",
+    "left", "lost", "met", "ran", "won", "woke", "slept", "felt", "kept", "began", "broke", "chose",
+    "drew", "drove", "forgot", "grew", "hid", "knew", "led", "put", "read", "shook", "threw", "hurt",
+}
+WEIGHTS = {"entities": 0.3, "events": 0.3, "facts": 0.4}
+FUZZY_RATIO = 0.8
+FACT_COVERAGE = 0.5
+ORDER_AGREEMENT = 0.75
+BETA = 2.0  # Recall counts four times as much as precision
+NARRATIVE_MAX_BACKLOG = int(os.getenv("COMPREHENSION_NARRATIVE_MAX_BACKLOG", "4"))
+
+RECOMMENDATIONS = {
+    "entities": "Retell the story by naming who was in it and where it happened",
+    "events": "Put picture cards of the story in order and retell it",
+    "facts": "Reread one paragraph at a time and say what happened in it",
+    "precision": "Check the story again to find where each part of your answer comes from",
+}
+
+
+def narrative_backlogged(client) -> bool:
+    """True when the LLM narrative should not hold up a response"""
+    return llm_scheduler.queued(provider_for(client)) >= NARRATIVE_MAX_BACKLOG
+
+
+def _stem(word: str) -> str:
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[: -len(suffix)]
+    return word
+
+
+def _content(tokens: List[str]) -> List[str]:
+    return [t for t in tokens if (len(t) > 2 or t.isdigit()) and t not in STOPWORDS]
+
+
+class KeyPoints(NamedTuple):
+    entities: Tuple[str, ...]
+    events: Tuple[str, ...]
+    facts: Tuple[Tuple[str, ...], ...]
+    vocabulary: frozenset  # Stems of every content word
+    bigrams: frozenset  # Adjacent content-word stem pairs
+
+
+def extract_key_points(passage: str) -> KeyPoints:
+    entities: List[str] = []
+    events: List[str] = []
+    facts: List[Tuple[str, ...]] = []
+    vocabulary: Set[str] = set()
+    bigrams: Set[Tuple[str, str]] = set()
+
+    sentences = [_TOKEN.findall(s) for s in _SENTENCE.findall(passage or "")]
+    mid_sentence_capitals = {w for s in sentences for w in s[1:] if w[:1].isupper()}
+    lowercase = {w for s in sentences for w in s if w.islower()}
+    for words in sentences:
+        for position, word in enumerate(words):
+            lower = word.lower()
+            # A capitalized sentence start is a name unless it also appears lowercase ("The", "Later")
+            is_name = word[:1].isupper() and (
+                position > 0 or word in mid_sentence_capitals or (len(word) > 2 and lower not in lowercase)
+            )
+            if (is_name and lower not in STOPWORDS or word.isdigit()) and lower not in entities:
+                entities.append(lower)
+            if (lower in IRREGULAR_PAST or (lower.endswith("ed") and len(lower) > 4)) and lower not in events:
+                events.append(lower)
+        content = _content([w.lower() for w in words])
+        stems = [_stem(w) for w in content]
+        vocabulary.update(stems)
+        bigrams.update(zip(stems, stems[1:]))
+        if len(content) >= 2:
+            facts.append(tuple(dict.fromkeys(content)))
+    return KeyPoints(tuple(entities), tuple(events), tuple(facts), frozenset(vocabulary), frozenset(bigrams))
+
+
+class _Matcher:
+    """Exact, stem or fuzzy membership of words in a bag of words (memoized per call)"""
+
+    def __init__(self, words):
+        self.words = set(words)
+        self.stems = {_stem(w) for w in self.words}
+        self._memo: Dict[str, bool] = {}
+
+    def __contains__(self, word: str) -> bool:
+        found = self._memo.get(word)
+        if found is None:
+            found = word in self.words or _stem(word) in self.stems or (
+                len(word) >= 4 and any(
+                    abs(len(word) - len(w)) <= 2 and difflib.SequenceMatcher(None, word, w).ratio() >= FUZZY_RATIO
+                    for w in self.words
+                )
+            )
+            self._memo[word] = found
+        return found
+
+
+class ComprehensionScorer:
+    def __init__(self, cache_size: int = 512):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, KeyPoints]" = OrderedDict()
+        self._lock = threading.Lock()  # Called from threadpool workers
+
+    def key_points(self, passage: str) -> KeyPoints:
+        digest = hashlib.sha256((passage or "").encode()).hexdigest()
+        with self._lock:
+            points = self._cache.get(digest)
+            if points is not None:
+                self._cache.move_to_end(digest)
+                return points
+        points = extract_key_points(passage)
+        with self._lock:
+            self._cache[digest] = points
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return points
+
+    def score(self, passage: str, response: str) -> dict:
+        points = self.key_points(passage)
+        tokens = [t.lower() for t in _TOKEN.findall(response or "")]
+        content = _content(tokens)
+        said = _Matcher(content)
+
+        found = {
+            "entities": [e for e in points.entities if e in said],
+            "events": [e for e in points.events if e in said],
+            "facts": [
+                fact for fact in points.facts
+                if sum(word in said for word in fact) >= max(2, FACT_COVERAGE * len(fact))
+            ],
+        }
+        totals = {"entities": len(points.entities), "events": len(points.events), "facts": len(points.facts)}
+        present = {kind: w for kind, w in WEIGHTS.items() if totals[kind]}
+        recall = (
+            sum(w * len(found[kind]) / totals[kind] for kind, w in present.items()) / sum(present.values())
+            if present else 0.0
+        )
+
+        passage_words = _Matcher(points.vocabulary)
+        stems = [_stem(w) for w in content]
+        unigram = sum(w in passage_words for w in content) / len(content) if content else 0.0
+        pairs = list(zip(stems, stems[1:]))
+        bigram = sum(pair in points.bigrams for pair in pairs) / len(pairs) if pairs else unigram
+        precision = 0.7 * unigram + 0.3 * bigram  # Word pairs reward retelling over keyword lists
+
+        denominator = BETA ** 2 * precision + recall
+        f_score = (1 + BETA ** 2) * precision * recall / denominator if denominator else 0.0
+        accuracy = round(100 * f_score)
+
+        kind_recall = {kind: len(found[kind]) / totals[kind] for kind in present}
+        concepts, gaps, recommendations = [], [], []
+        if kind_recall.get("entities", 0) >= 0.5:
+            concepts.append("Character Identification")
+        if kind_recall.get("events", 0) >= 0.5:
+            # Share of event pairs said in passage order; a fuzzy match can land one event early
+            said_at = [next((i for i, t in enumerate(tokens) if t in _Matcher([e])), 0) for e in found["events"]]
+            pairs = [(a, b) for n, a in enumerate(said_at) for b in said_at[n + 1:]]
+            in_order = not pairs or sum(a <= b for a, b in pairs) / len(pairs) >= ORDER_AGREEMENT
+            concepts.append("Sequence of Events" if in_order else "Recalling Events")
+        if kind_recall.get("facts", 0) >= 0.5:
+            concepts.append("Literal Recall")
+        for kind, label in (("entities", "Key names and details"), ("events", "Sequence of events"), ("facts", "Literal recall")):
+            if kind in kind_recall and kind_recall[kind] < 0.5:
+                gaps.append(label)
+                recommendations.append(RECOMMENDATIONS[kind])
+        if content and precision < 0.5:
+            gaps.append("Sticking to the text")
+            recommendations.append(RECOMMENDATIONS["precision"])
+
+        missed = [e for e in points.entities if e not in found["entities"]] + \
+                 [e for e in points.events if e not in found["events"]]
+        key_count = sum(totals.values())
+        analysis = (
+            f"Student recalled {sum(len(v) for v in found.values())} of {key_count} key points "
+            f"(recall {recall:.0%}, precision {precision:.0%})."
+        )
+        if missed:
+            analysis += f" Missed: {', '.join(missed[:5])}."
+        return {
+            "analysis": analysis,
+            "concepts": concepts or ["Basic Comprehension"],
+            "gaps": gaps,
+            "recommendations": recommendations or ["Ask 'why do you think...?' questions about the story"],
+            "accuracy": accuracy,
+            "recall": round(recall, 3),
+            "precision": round(precision, 3),
+            "missed": missed,
+        }
+
+
+comprehension_scorer = ComprehensionScorer()
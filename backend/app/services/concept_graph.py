@@ -0,0 +1,285 @@
+# Concept Graph - Lesson prerequisite graph with per-student mastery frontiers
+#
+# Lessons form a DAG: within a (subject, language) track every lesson at
+# level L depends on the lessons at the previous level, plus any explicit
+# edges in lesson_prerequisites. For each student we keep the set of
+# mastered lessons and a sorted frontier (unmastered lessons whose
+# prerequisites are all mastered), so "what next?" is a slice of a list and
+# a newly mastered lesson only touches its direct dependents.
+#
+# Frontiers are an LRU of at most CONCEPT_INDEX_MAX_STUDENTS students (the
+# rest reload from Progress on their next request), and every mastery is
+# broadcast through shared_state so other workers update their copy too.
+# The graph is re-read every refresh_seconds (CONCEPT_GRAPH_REFRESH_SECONDS)
+# so lessons and prerequisites added later show up without a restart.
+# Masteries are appended to Progress.lessons_completed with a compare on
+# updated_at, retried when another write got there first.
+import asyncio
+import bisect
+import os
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Lesson, LessonPrerequisite, Progress
+from app.services.shared_state import shared_state
+
+# Assessment agent -> lesson subject it counts towards
+AGENT_SUBJECTS = {
+    "reading": "reading",
+    "comprehension": "reading",
+    "math": "math",
+    "vocabulary": "vocabulary",
+}
+
+
+class LessonNode:
+    __slots__ = ("id", "subject", "language", "level", "title", "xp_reward", "order")
+
+    def __init__(self, id: str, subject: str, language: str, level: int, title: str, xp_reward: int):
+        self.id = id
+        self.subject = subject
+        self.language = language
+        self.level = level
+        self.title = title
+        self.xp_reward = xp_reward
+        self.order = 0  # Position in topological order
+
+
+class ConceptGraph:
+    """Immutable prerequisite DAG over lessons"""
+
+    def __init__(self, lessons: Iterable[LessonNode], edges: Iterable[Tuple[str, str]] = ()):
+        self.nodes: Dict[str, LessonNode] = {lesson.id: lesson for lesson in lessons}
+        prereqs: Dict[str, Set[str]] = defaultdict(set)
+
+        # Implicit edges: previous level of the same subject/language track
+        tracks: Dict[tuple, Dict[int, List[str]]] = defaultdict(lambda: defaultdict(list))
+        for node in self.nodes.values():
+            tracks[(node.subject, node.language)][node.level].append(node.id)
+        for levels in tracks.values():
+            ordered = sorted(levels)
+            for previous, level in zip(ordered, ordered[1:]):
+                for lesson_id in levels[level]:
+                    prereqs[lesson_id].update(levels[previous])
+
+        for lesson_id, prerequisite_id in edges:
+            if lesson_id in self.nodes and prerequisite_id in self.nodes:
+                prereqs[lesson_id].add(prerequisite_id)
+
+        self.prereqs: Dict[str, FrozenSet[str]] = {i: frozenset(prereqs.get(i, ())) for i in self.nodes}
+        dependents: Dict[str, List[str]] = defaultdict(list)
+        for lesson_id, required in self.prereqs.items():
+            for prerequisite_id in required:
+                dependents[prerequisite_id].append(lesson_id)
+        self.dependents: Dict[str, Tuple[str, ...]] = {i: tuple(dependents.get(i, ())) for i in self.nodes}
+
+        self.topo_order = self._topological_order()
+        for position, lesson_id in enumerate(self.topo_order):
+            self.nodes[lesson_id].order = position
+        self.roots = tuple(i for i in self.topo_order if not self.prereqs[i])
+
+    def _topological_order(self) -> Tuple[str, ...]:
+        """Kahn's algorithm, tie-broken by (level, id); cycles are dropped"""
+        missing = {i: len(p) for i, p in self.prereqs.items()}
+        ready = sorted((self.nodes[i].level, i) for i, n in missing.items() if n == 0)
+        order = []
+        while ready:
+            _, lesson_id = ready.pop(0)
+            order.append(lesson_id)
+            for dependent in self.dependents[lesson_id]:
+                missing[dependent] -= 1
+                if missing[dependent] == 0:
+                    bisect.insort(ready, (self.nodes[dependent].level, dependent))
+        if len(order) < len(self.nodes):
+            print(f"Concept graph: {len(self.nodes) - len(order)} lessons are in a prerequisite cycle")
+        return tuple(order)
+
+    def sort_key(self, lesson_id: str) -> tuple:
+        node = self.nodes[lesson_id]
+        return (node.level, node.order)
+
+
+class StudentFrontier:
+    """One student's mastered set and sorted frontier, updated incrementally"""
+
+    __slots__ = ("mastered", "missing", "frontier")
+
+    def __init__(self, graph: ConceptGraph, mastered: Iterable[str] = ()):
+        self.mastered: Set[str] = {i for i in mastered if i in graph.nodes}
+        self.missing: Dict[str, int] = {
+            i: sum(1 for p in graph.prereqs[i] if p not in self.mastered) for i in graph.nodes
+        }
+        self.frontier: List[tuple] = sorted(
+            graph.sort_key(i) + (i,) for i, n in self.missing.items() if n == 0 and i not in self.mastered
+        )
+
+    def master(self, graph: ConceptGraph, lesson_id: str) -> bool:
+        """Mark a lesson mastered; O(dependents) frontier update"""
+        if lesson_id in self.mastered or lesson_id not in graph.nodes:
+            return False
+        self.mastered.add(lesson_id)
+        entry = graph.sort_key(lesson_id) + (lesson_id,)
+        position = bisect.bisect_left(self.frontier, entry)
+        if position < len(self.frontier) and self.frontier[position] == entry:
+            self.frontier.pop(position)
+        for dependent in graph.dependents[lesson_id]:
+            self.missing[dependent] -= 1
+            if self.missing[dependent] == 0 and dependent not in self.mastered:
+                bisect.insort(self.frontier, graph.sort_key(dependent) + (dependent,))
+        return True
+
+    def status(self, lesson_id: str) -> str:
+        if lesson_id in self.mastered:
+            return "mastered"
+        return "learning" if self.missing.get(lesson_id) == 0 else "locked"
+
+
+MASTERY_WRITE_ATTEMPTS = 5
+
+
+class ConceptIndex:
+    """Graph plus lazily loaded per-student frontiers"""
+
+    def __init__(self, max_students: int = 5000, refresh_seconds: float = 300):
+        self.graph = ConceptGraph([])
+        self.max_students = max_students
+        self.refresh_seconds = refresh_seconds
+        self.loaded_at = 0.0
+        self._signature: Optional[tuple] = None
+        self._reloading = asyncio.Lock()
+        self._students: "OrderedDict[str, StudentFrontier]" = OrderedDict()
+
+    async def reload(self, db: AsyncSession):
+        """Rebuild the graph from the lessons tables if they changed (frontiers are rebuilt lazily)"""
+        lessons = (await db.execute(
+            select(Lesson.id, Lesson.subject, Lesson.language, Lesson.level, Lesson.title, Lesson.xp_reward)
+            .order_by(Lesson.id)
+        )).all()
+        edges = (await db.execute(
+            select(LessonPrerequisite.lesson_id, LessonPrerequisite.prerequisite_id)
+            .order_by(LessonPrerequisite.lesson_id, LessonPrerequisite.prerequisite_id)
+        )).all()
+        self.loaded_at = time.time()
+        signature = (tuple(tuple(l) for l in lessons), tuple(tuple(edge) for edge in edges))
+        if signature == self._signature:
+            return
+        self.graph = ConceptGraph(
+            [LessonNode(l.id, l.subject, l.language or "english", l.level or 1, l.title, l.xp_reward or 0) for l in lessons],
+            [tuple(edge) for edge in edges],
+        )
+        self._signature = signature
+        self._students.clear()
+
+    async def fresh(self, db: AsyncSession):
+        """Reload the graph when it is older than refresh_seconds"""
+        if time.time() - self.loaded_at <= self.refresh_seconds:
+            return
+        async with self._reloading:
+            # Requests that waited on the lock find the graph already reloaded
+            if time.time() - self.loaded_at > self.refresh_seconds:
+                await self.reload(db)
+
+    async def student(self, db: AsyncSession, student_id: str) -> StudentFrontier:
+        """Frontier for a student, seeded from Progress.lessons_completed"""
+        await self.fresh(db)
+        state = self._students.get(student_id)
+        if state is not None:
+            self._students.move_to_end(student_id)
+            return state
+        completed = await db.scalar(select(Progress.lessons_completed).where(Progress.user_id == student_id))
+        state = StudentFrontier(self.graph, completed or [])
+        self._students[student_id] = state
+        while len(self._students) > self.max_students:
+            self._students.popitem(last=False)
+        return state
+
+    def cached(self, student_id: str) -> Optional[StudentFrontier]:
+        """Frontier if already loaded (for synchronous callers)"""
+        return self._students.get(student_id)
+
+    async def mastered_elsewhere(self, event: dict):
+        """A worker (this one included) recorded a mastery; apply it to our copy if loaded"""
+        state = self._students.get(event["student"])
+        if state is not None:
+            state.master(self.graph, event["lesson"])
+
+    def next_lessons(
+        self,
+        state: StudentFrontier,
+        limit: int = 3,
+        subjects: Optional[Iterable[str]] = None,
+        language: Optional[str] = None,
+        subject: Optional[str] = None,
+    ) -> List[str]:
+        """Lowest-level unlocked lessons, preferring the given subjects (only `subject`'s when set)"""
+        preferred = set(subjects or ())
+        picked, others = [], []
+        for _, _, lesson_id in state.frontier:
+            node = self.graph.nodes[lesson_id]
+            if (language and node.language != language) or (subject and node.subject != subject):
+                continue
+            (picked if not preferred or node.subject in preferred else others).append(lesson_id)
+            if len(picked) >= limit:
+                break
+        return (picked + others)[:limit]
+
+    def current_lesson(self, state: StudentFrontier, agent_type: str) -> Optional[str]:
+        """The unlocked lesson an assessment of this type counts towards"""
+        subject = AGENT_SUBJECTS.get(agent_type)
+        for _, _, lesson_id in state.frontier:
+            if self.graph.nodes[lesson_id].subject == subject:
+                return lesson_id
+        return None
+
+    async def master(self, db: AsyncSession, student_id: str, lesson_id: str) -> bool:
+        """Mark mastered in memory and persist to Progress.lessons_completed"""
+        state = await self.student(db, student_id)
+        if not state.master(self.graph, lesson_id):
+            return False
+        await self._persist_mastery(db, student_id, lesson_id)
+        await shared_state.publish("concept_mastery", {"student": student_id, "lesson": lesson_id})
+        return True
+
+    async def _persist_mastery(self, db: AsyncSession, student_id: str, lesson_id: str):
+        """Append to lessons_completed unless another write changed the row since it was read (then re-read)"""
+        for _ in range(MASTERY_WRITE_ATTEMPTS):
+            row = (await db.execute(
+                select(Progress.id, Progress.lessons_completed, Progress.updated_at)
+                .where(Progress.user_id == student_id)
+            )).first()
+            if row is None:
+                db.add(Progress(user_id=student_id, lessons_completed=[lesson_id]))
+                try:
+                    await db.commit()
+                    return
+                except IntegrityError:
+                    await db.rollback()  # Another worker created the row first
+                    continue
+
+            completed = list(row.lessons_completed or [])
+            if lesson_id in completed:  # Another worker may have recorded it first
+                return
+            result = await db.execute(
+                update(Progress)
+                .where(Progress.id == row.id, Progress.updated_at == row.updated_at)
+                .values(lessons_completed=completed + [lesson_id], updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            if result.rowcount:
+                return
+        print(f"Concept graph: could not record mastery of {lesson_id} for {student_id}")
+
+
+concept_index = ConceptIndex(
+    max_students=int(os.getenv("CONCEPT_INDEX_MAX_STUDENTS", "5000")),
+    refresh_seconds=float(os.getenv("CONCEPT_GRAPH_REFRESH_SECONDS", "300")),
+)
+shared_state.on_event("concept_mastery", concept_index.mastered_elsewhere)
+
@@ -0,0 +1,100 @@
+# Hint Pool - Pre-generated LLM tutor hints per lesson, refreshed in background
+#
+# Pools live in shared state, so every worker serves the same hints and a
+# pool is generated once for the whole deployment: each worker's refresh
+# loop claims a lesson with a lease before calling the LLM and skips
+# lessons another worker is already on. Pools of lessons that no longer
+# exist are dropped on every pass.
+import asyncio
+import os
+import random
+import time
+from typing import Callable, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal
+from app.models import Lesson
+from app.services.llm_scheduler import llm_scheduler
+from app.services.response_catalog import normalize_language
+from app.services.shared_state import shared_state
+
+HINT_LEASE_SECONDS = 120  # One lesson's generation; another worker takes over if this one dies
+
+# "{lesson_id}:{language}" -> {"lesson", "subject", "language", "hints", "generated_at"}
+hint_store = shared_state.namespace("lesson_hints")
+
+
+def _pool_key(lesson_id: str, language: str) -> str:
+    return f"{lesson_id}:{language}"
+
+
+class HintPool:
+    """
+    Keeps a small pool of tutor hints for every lesson so students asking
+    for a hint never wait on an LLM. A background loop regenerates pools
+    older than max_age, one lesson at a time at batch priority. Pools are
+    keyed by lesson and language, so a hint is only served in the language
+    it was written in.
+    """
+
+    def __init__(self, generator: Optional[Callable] = None, refresh_seconds: float = 900, max_age: float = 24 * 3600):
+        self.generator = generator
+        self.refresh_seconds = refresh_seconds
+        self.max_age = max_age
+
+    async def get(self, lesson_id: str, language: str) -> Optional[Tuple[str, str, str]]:
+        """Random pooled hint in the given language as (subject, language, hint), or None"""
+        pool = await hint_store.get(_pool_key(lesson_id, normalize_language(language)))
+        if not pool or not pool["hints"]:
+            return None
+        return pool["subject"], pool["language"], random.choice(pool["hints"])
+
+    def _stale(self, pool: Optional[dict], now: float) -> bool:
+        return pool is None or now - pool["generated_at"] > self.max_age
+
+    async def refresh(self):
+        """Regenerate hints for lessons with missing or stale pools and drop pools of deleted lessons"""
+        if self.generator is None:
+            return
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Lesson.id, Lesson.subject, Lesson.language, Lesson.title, Lesson.content))
+            lessons = result.all()
+
+        lesson_ids = {lesson.id for lesson in lessons}
+        for key, pool in (await hint_store.items()).items():
+            if pool["lesson"] not in lesson_ids:
+                await hint_store.delete(key)
+
+        for lesson in lessons:
+            language = normalize_language(lesson.language)
+            key = _pool_key(lesson.id, language)
+            if not self._stale(await hint_store.get(key), time.time()):
+                continue
+            lease = f"hints:{key}"
+            if not await shared_state.acquire(lease, HINT_LEASE_SECONDS):
+                continue  # Another worker is generating this pool
+            try:
+                # It may have been refreshed between our check and the lease
+                if self._stale(await hint_store.get(key), time.time()):
+                    hints = await llm_scheduler.run(self.generator, lesson)
+                    if hints:
+                        await hint_store.set(key, {
+                            "lesson": lesson.id, "subject": lesson.subject, "language": language,
+                            "hints": list(hints), "generated_at": time.time(),
+                        })
+            finally:
+                await shared_state.release(lease)
+
+    async def run(self):
+        """Background loop started with the app"""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Hint pool refresh error: {e}")
+            await asyncio.sleep(self.refresh_seconds)
+
+
+hint_pool = HintPool(refresh_seconds=float(os.getenv("HINT_REFRESH_SECONDS", "900")))
@@ -0,0 +1,168 @@
+# HTTP Encoding - Response compression and conditional GETs
+#
+# CompressionMiddleware negotiates brotli (when the optional brotli package
+# is installed) or gzip from Accept-Encoding and compresses complete text
+# and JSON bodies above a size threshold. Streaming responses (SSE, report
+# exports, audio) are passed through untouched so events are not held
+# back in a compressor buffer.
+#
+# ETagMiddleware gives read-heavy GET endpoints a weak ETag over the
+# uncompressed body and answers a matching If-None-Match with 304, so
+# polling dashboards skip the transfer when nothing changed. It must sit
+# inside CompressionMiddleware so the tag is the same for every encoding.
+import gzip
+import hashlib
+from typing import Iterable, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli  # Optional: br is preferred over gzip when available
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def _accepted(header: str) -> dict:
+    """Accept-Encoding -> {coding: q}"""
+    accepted = {}
+    for item in header.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            accepted[coding.lower()] = q
+    return accepted
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = _accepted(accept_encoding)
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete responses of at least minimum_size bytes"""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality  # Low qualities are fast enough for dynamic responses
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def _compressible(self, status: int, headers: MutableHeaders, size: int) -> bool:
+        return (
+            size >= self.minimum_size
+            and status not in (204, 206, 304)
+            and "content-encoding" not in headers
+            and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        pending = None  # The start message, held until the first body chunk decides
+
+        async def send_compressed(message):
+            nonlocal pending
+            if message["type"] == "http.response.start":
+                pending = message
+                return
+            if pending is None:
+                await send(message)
+                return
+            start, pending = pending, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=list(start["headers"]))
+            if (
+                message["type"] != "http.response.body"
+                or message.get("more_body", False)
+                or not self._compressible(start["status"], headers, len(body))
+            ):
+                await send(start)
+                await send(message)
+                return
+            body = self.compress(body, encoding)
+            headers["content-encoding"] = encoding
+            headers["content-length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send({**start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+class ETagMiddleware:
+    """ASGI middleware adding ETags and 304 responses to GETs under the given path prefixes"""
+
+    def __init__(self, app, prefixes: Iterable[str]):
+        self.app = app
+        self.prefixes = tuple(prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not scope["path"].startswith(self.prefixes):
+            await self.app(scope, receive, send)
+            return
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        pending = None
+
+        async def send_tagged(message):
+            nonlocal pending
+            if message["type"] == "http.response.start":
+                pending = message
+                return
+            if pending is None:
+                await send(message)
+                return
+            start, pending = pending, None
+            headers = MutableHeaders(raw=list(start["headers"]))
+            if (
+                message["type"] != "http.response.body"
+                or message.get("more_body", False)
+                or start["status"] != 200
+                or "etag" in headers
+            ):
+                await send(start)
+                await send(message)
+                return
+            body = message.get("body", b"")
+            etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+            headers["etag"] = etag
+            if "cache-control" not in headers:
+                headers["cache-control"] = "private, no-cache"  # Always revalidate; 304s are cheap
+            if if_none_match and _etag_matches(if_none_match, etag):
+                del headers["content-length"]
+                del headers["content-type"]
+                await send({**start, "status": 304, "headers": headers.raw})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send({**start, "headers": headers.raw})
+            await send(message)
+
+        await self.app(scope, receive, send_tagged)
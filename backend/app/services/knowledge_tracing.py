@@ -0,0 +1,247 @@
+# Knowledge Tracing - Bayesian Knowledge Tracing per student x concept
+#
+# Each assessment is turned into binary observations: the lesson it counted
+# towards (correct when accuracy >= CORRECT_ACCURACY), every skill the agent
+# reported in "concepts" (correct) and every skill in "gaps" (incorrect).
+# A student's state is two compact arrays indexed by a shared concept
+# registry: P(known) as float32 and attempt counts as uint16. One update is
+# O(1); rebuilding a whole class replays history with NumPy, one vector
+# step per attempt number instead of one Python step per observation.
+#
+# States are an LRU of at most KNOWLEDGE_TRACER_MAX_STUDENTS students. Each
+# new assessment is announced through shared_state, and other workers drop
+# their copy of that student so the next read replays the full history.
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Assessment
+from app.services.assessment_events import on_assessment
+from app.services.concept_graph import concept_index
+from app.services.shared_state import WORKER_ID, shared_state
+
+# Default BKT parameters (shared by all concepts)
+P_INIT = 0.2      # Known before any practice
+P_TRANSIT = 0.15  # Learned after one practice opportunity
+P_SLIP = 0.1      # Known but answered wrong
+P_GUESS = 0.2     # Unknown but answered right
+
+MASTERED = 0.95          # P(known) that counts as mastered
+STRUGGLING = 0.4         # P(known) below this after MIN_ATTEMPTS is a struggle
+MIN_ATTEMPTS = 2
+CORRECT_ACCURACY = 70    # Assessment accuracy that counts as a correct answer
+
+_NON_WORD = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def skill_key(name: str) -> str:
+    """Registry key for a free-text skill name from an agent result"""
+    return "skill:" + _NON_WORD.sub("-", name.lower()).strip("-")
+
+
+def lesson_key(lesson_id: str) -> str:
+    return "lesson:" + lesson_id
+
+
+def bkt_update(p_known, correct):
+    """Posterior given the observation, then the learning transition (scalar or array)"""
+    if_correct = p_known * (1 - P_SLIP) / (p_known * (1 - P_SLIP) + (1 - p_known) * P_GUESS)
+    if_wrong = p_known * P_SLIP / (p_known * P_SLIP + (1 - p_known) * (1 - P_GUESS))
+    posterior = np.where(correct, if_correct, if_wrong) if isinstance(p_known, np.ndarray) else (
+        if_correct if correct else if_wrong
+    )
+    return posterior + (1 - posterior) * P_TRANSIT
+
+
+def observations(assessment: Assessment) -> List[Tuple[str, bool]]:
+    """Binary evidence contained in one stored assessment"""
+    found = []
+    if assessment.lesson_id:
+        found.append((lesson_key(assessment.lesson_id), (assessment.accuracy or 0) >= CORRECT_ACCURACY))
+    found.extend((skill_key(name), True) for name in assessment.concepts_identified or [])
+    found.extend((skill_key(name), False) for name in assessment.gaps_found or [])
+    return found
+
+
+class ConceptRegistry:
+    """Stable concept key -> array index mapping shared by all students"""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.keys: List[str] = []
+
+    def id(self, key: str) -> int:
+        concept_id = self.index.get(key)
+        if concept_id is None:
+            concept_id = self.index[key] = len(self.keys)
+            self.keys.append(key)
+        return concept_id
+
+
+class StudentKnowledge:
+    """Compact per-student arrays; NaN means no evidence yet (prior applies)"""
+
+    __slots__ = ("p_known", "attempts")
+
+    def __init__(self, size: int = 0):
+        self.p_known = np.full(size, np.nan, dtype=np.float32)
+        self.attempts = np.zeros(size, dtype=np.uint16)
+
+    def _grow(self, size: int):
+        if size > len(self.p_known):
+            size = max(size, 2 * len(self.p_known))
+            grown = np.full(size, np.nan, dtype=np.float32)
+            grown[:len(self.p_known)] = self.p_known
+            self.p_known = grown
+            self.attempts = np.concatenate([self.attempts, np.zeros(size - len(self.attempts), dtype=np.uint16)])
+
+    def get(self, concept_id: int) -> float:
+        if concept_id >= len(self.p_known) or np.isnan(self.p_known[concept_id]):
+            return P_INIT
+        return float(self.p_known[concept_id])
+
+    def observe(self, concept_id: int, correct: bool) -> float:
+        """O(1) BKT update for one observation"""
+        self._grow(concept_id + 1)
+        p = bkt_update(self.get(concept_id), correct)
+        self.p_known[concept_id] = p
+        self.attempts[concept_id] = min(int(self.attempts[concept_id]) + 1, 65535)
+        return p
+
+
+class KnowledgeTracer:
+    """BKT states for loaded students, replayed from assessment history on first use"""
+
+    def __init__(self, max_students: int = 5000):
+        self.registry = ConceptRegistry()
+        self.max_students = max_students
+        self._students: "OrderedDict[str, StudentKnowledge]" = OrderedDict()
+
+    def _remember(self, states: Dict[str, StudentKnowledge]):
+        for student_id, state in states.items():
+            self._students[student_id] = state
+            self._students.move_to_end(student_id)
+        while len(self._students) > self.max_students:
+            self._students.popitem(last=False)
+
+    def cached(self, student_id: str) -> Optional[StudentKnowledge]:
+        return self._students.get(student_id)
+
+    async def assessed_elsewhere(self, event: dict):
+        """Another worker stored an assessment: forget our copy, it lacks that evidence"""
+        if event["origin"] != WORKER_ID:
+            self._students.pop(event["student"], None)
+
+    def replay(self, assessments: Sequence[Assessment], student_ids: Iterable[str]) -> Dict[str, StudentKnowledge]:
+        """
+        Batched recomputation: replay every student's history at once.
+        Observations are grouped by (student, concept) pair and ranked in
+        time order; step k updates the k-th observation of every pair.
+        """
+        student_index = {student_id: i for i, student_id in enumerate(student_ids)}
+        rows = []
+        for assessment in sorted(assessments, key=lambda a: (a.created_at is None, a.created_at, a.id or 0)):
+            student = student_index.get(assessment.user_id)
+            if student is None:
+                continue
+            for key, correct in observations(assessment):
+                rows.append((student, self.registry.id(key), correct))
+
+        size = len(self.registry.keys)
+        states = {student_id: StudentKnowledge(size) for student_id in student_index}
+        if not rows:
+            return states
+
+        student, concept, correct = (np.asarray(column) for column in zip(*rows))
+        pair = student.astype(np.int64) * size + concept
+        order = np.argsort(pair, kind="stable")  # Stable sort keeps time order within a pair
+        pair, correct = pair[order], correct[order].astype(bool)
+        unique_pairs, starts, counts = np.unique(pair, return_index=True, return_counts=True)
+        slot = np.repeat(np.arange(len(unique_pairs)), counts)
+        rank = np.arange(len(pair)) - starts[slot]
+
+        p_known = np.full(len(unique_pairs), P_INIT, dtype=np.float64)
+        for step in range(int(counts.max())):
+            at_step = rank == step
+            p_known[slot[at_step]] = bkt_update(p_known[slot[at_step]], correct[at_step])
+
+        names = list(student_index)
+        for pair_id, p, n in zip(unique_pairs, p_known, counts):
+            state = states[names[pair_id // size]]
+            state.p_known[pair_id % size] = p
+            state.attempts[pair_id % size] = min(int(n), 65535)
+        return states
+
+    async def student(self, db: AsyncSession, student_id: str) -> StudentKnowledge:
+        state = self._students.get(student_id)
+        if state is not None:
+            self._students.move_to_end(student_id)
+            return state
+        history = (await db.execute(select(Assessment).where(Assessment.user_id == student_id))).scalars().all()
+        state = self.replay(history, [student_id])[student_id]
+        self._remember({student_id: state})
+        return state
+
+    async def load_class(self, db: AsyncSession, student_ids: List[str]) -> Dict[str, StudentKnowledge]:
+        """Recompute and cache states for a whole class in one batch"""
+        history = (await db.execute(select(Assessment).where(Assessment.user_id.in_(student_ids)))).scalars().all()
+        states = self.replay(history, student_ids)
+        self._remember(states)
+        return states
+
+    def mastery(self, state: StudentKnowledge, key: str) -> Optional[float]:
+        """P(known) for a concept, or None if the student has no evidence for it"""
+        concept_id = self.registry.index.get(key)
+        if concept_id is None or concept_id >= len(state.p_known) or np.isnan(state.p_known[concept_id]):
+            return None
+        return float(state.p_known[concept_id])
+
+    def struggles(self, state: StudentKnowledge) -> List[Tuple[str, float]]:
+        """Concepts practiced MIN_ATTEMPTS+ times that still look unknown, weakest first"""
+        p = state.p_known
+        weak = np.flatnonzero((state.attempts >= MIN_ATTEMPTS) & (p < STRUGGLING))
+        return sorted(((self.registry.keys[i], float(p[i])) for i in weak), key=lambda item: item[1])
+
+    def summary(self, state: StudentKnowledge) -> dict:
+        seen = ~np.isnan(state.p_known)
+        return {
+            "conceptsTracked": int(seen.sum()),
+            "conceptsMastered": int((state.p_known[seen] >= MASTERED).sum()),
+            "averageMastery": round(float(state.p_known[seen].mean()), 3) if seen.any() else None,
+            "struggling": [
+                {"concept": key.split(":", 1)[1], "mastery": round(p, 3)} for key, p in self.struggles(state)
+            ],
+        }
+
+
+knowledge_tracer = KnowledgeTracer(max_students=int(os.getenv("KNOWLEDGE_TRACER_MAX_STUDENTS", "5000")))
+shared_state.on_event("knowledge_assessment", knowledge_tracer.assessed_elsewhere)
+
+
+@on_assessment
+async def trace_assessment(db: AsyncSession, assessment: Assessment):
+    """Update BKT for the new evidence; mastering a lesson advances the frontier"""
+    frontier = await concept_index.student(db, assessment.user_id)
+    if assessment.lesson_id is None:
+        lesson_id = concept_index.current_lesson(frontier, assessment.agent_type)
+        if lesson_id is not None:
+            assessment.lesson_id = lesson_id
+            await db.commit()
+
+    cached = knowledge_tracer.cached(assessment.user_id) is not None
+    state = await knowledge_tracer.student(db, assessment.user_id)
+    if cached:
+        # A freshly replayed state already includes this assessment
+        for key, correct in observations(assessment):
+            state.observe(knowledge_tracer.registry.id(key), correct)
+    await shared_state.publish("knowledge_assessment", {"student": assessment.user_id, "origin": WORKER_ID})
+
+    if assessment.lesson_id:
+        p = knowledge_tracer.mastery(state, lesson_key(assessment.lesson_id))
+        if p is not None and p >= MASTERED:
+            await concept_index.master(db, assessment.user_id, assessment.lesson_id)
@@ -0,0 +1,156 @@
+# Leaderboard - School-wide and per-section XP rankings kept in memory
+#
+# Each board is a list of (-xp, student_id) kept sorted with bisect, so a
+# student's rank is one binary search (O(log n)), the top K is a slice and
+# an XP change moves one entry. Boards are rebuilt from the database (one
+# sort per board) at startup and every refresh_seconds, which also picks up
+# XP written by other workers; concurrent requests that find the boards
+# stale share a single rebuild. In between, boards follow award_xp through
+# on_xp.
+import asyncio
+import bisect
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Progress, User
+from app.services.xp_events import XPChange, on_xp
+
+SCHOOL = "__school__"
+
+
+class Board:
+    """One ranking; ties share a rank and are listed by student id"""
+
+    def __init__(self):
+        self._entries: List[Tuple[int, str]] = []
+        self._xp: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @classmethod
+    def build(cls, xp_by_student: Dict[str, int]) -> "Board":
+        """A board from a full snapshot, sorted once"""
+        board = cls()
+        board._xp = xp_by_student
+        board._entries = sorted((-xp, student_id) for student_id, xp in xp_by_student.items())
+        return board
+
+    def set(self, student_id: str, xp: int):
+        previous = self._xp.get(student_id)
+        if previous == xp:
+            return
+        if previous is not None:
+            position = bisect.bisect_left(self._entries, (-previous, student_id))
+            del self._entries[position]
+        bisect.insort(self._entries, (-xp, student_id))
+        self._xp[student_id] = xp
+
+    def xp(self, student_id: str) -> Optional[int]:
+        return self._xp.get(student_id)
+
+    def rank(self, student_id: str) -> Optional[int]:
+        """1 + number of students with strictly more XP"""
+        xp = self._xp.get(student_id)
+        if xp is None:
+            return None
+        return bisect.bisect_left(self._entries, (-xp, "")) + 1
+
+    def top(self, k: int) -> List[Tuple[int, str, int]]:
+        """(rank, student_id, xp) for the first k entries"""
+        result, rank = [], 0
+        for position, (negative_xp, student_id) in enumerate(self._entries[:k]):
+            if position == 0 or negative_xp != self._entries[position - 1][0]:
+                rank = position + 1
+            result.append((rank, student_id, -negative_xp))
+        return result
+
+
+class Leaderboard:
+    """School board plus one board per section"""
+
+    def __init__(self, refresh_seconds: float = 60):
+        self.refresh_seconds = refresh_seconds
+        self._boards: Dict[str, Board] = {SCHOOL: Board()}
+        self._students: Dict[str, Tuple[str, str]] = {}  # id -> (username, section)
+        self.loaded_at = 0.0
+        self._rebuilding = asyncio.Lock()
+
+    async def rebuild(self, db: AsyncSession):
+        """Reload every board from users + progress"""
+        rows = await db.execute(
+            select(User.id, User.username, User.section, func.coalesce(Progress.xp, 0))
+            .outerjoin(Progress, Progress.user_id == User.id)
+            .where(User.role == "student")
+        )
+        xp: Dict[str, Dict[str, int]] = {SCHOOL: {}}
+        students = {}
+        for student_id, username, section, student_xp in rows:
+            students[student_id] = (username, section)
+            xp[SCHOOL][student_id] = student_xp
+            xp.setdefault(section, {})[student_id] = student_xp
+        self._boards = {name: Board.build(board_xp) for name, board_xp in xp.items()}
+        self._students = students
+        self.loaded_at = time.time()
+
+    async def _fresh(self, db: AsyncSession):
+        if time.time() - self.loaded_at <= self.refresh_seconds:
+            return
+        async with self._rebuilding:
+            # Requests that waited on the lock find the boards already rebuilt
+            if time.time() - self.loaded_at > self.refresh_seconds:
+                await self.rebuild(db)
+
+    async def update(self, db: AsyncSession, changes: Dict[str, int]):
+        """Move students (id -> new XP) on the school and section boards"""
+        unknown = [student_id for student_id in changes if student_id not in self._students]
+        if unknown:
+            rows = await db.execute(
+                select(User.id, User.username, User.section).where(User.id.in_(unknown), User.role == "student")
+            )
+            for student_id, username, section in rows:
+                self._students[student_id] = (username, section)
+        for student_id, xp in changes.items():
+            if student_id not in self._students:
+                continue
+            section = self._students[student_id][1]
+            self._boards[SCHOOL].set(student_id, xp)
+            self._boards.setdefault(section, Board()).set(student_id, xp)
+
+    def _entry(self, rank: int, student_id: str, xp: int) -> dict:
+        username, section = self._students[student_id]
+        return {"rank": rank, "id": student_id, "username": username, "section": section, "xp": xp}
+
+    async def top(self, db: AsyncSession, section: Optional[str] = None, limit: int = 10) -> List[dict]:
+        await self._fresh(db)
+        board = self._boards.get(section or SCHOOL)
+        return [self._entry(*entry) for entry in board.top(limit)] if board else []
+
+    async def rank(self, db: AsyncSession, student_id: str) -> Optional[dict]:
+        """A student's school-wide and section rank"""
+        await self._fresh(db)
+        if student_id not in self._students:
+            return None
+        section = self._students[student_id][1]
+        school, section_board = self._boards[SCHOOL], self._boards[section]
+        return {
+            "id": student_id,
+            "xp": school.xp(student_id),
+            "schoolRank": school.rank(student_id),
+            "schoolSize": len(school),
+            "section": section,
+            "sectionRank": section_board.rank(student_id),
+            "sectionSize": len(section_board),
+        }
+
+
+leaderboard = Leaderboard(refresh_seconds=float(os.getenv("LEADERBOARD_REFRESH_SECONDS", "60")))
+
+
+@on_xp
+async def update_leaderboard(db: AsyncSession, changes: List[XPChange]):
+    await leaderboard.update(db, {student_id: new_xp for student_id, _, new_xp in changes})
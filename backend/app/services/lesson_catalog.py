@@ -0,0 +1,244 @@
+# Lesson Catalog - Versioned, compressed lesson bundles per (language, level)
+#
+# Devices on poor connections download a whole level in one request instead
+# of fetching lessons one by one. Each bundle is canonical JSON of the
+# level's lessons; its version is a prefix of the SHA-256 of that JSON, so
+# unchanged content keeps its version across rebuilds and workers, and a
+# versioned URL can be cached forever. Bundles are compressed once, when a
+# version is first seen (gzip, plus brotli when installed), in a worker
+# thread, and served as stored bytes; rebuilds only hash unchanged levels.
+#
+# The last history_size versions of each bundle are kept so a device can ask
+# for a delta from the version it has: lessons added or changed since, plus
+# ids of lessons removed. Catalogs are rebuilt at startup and every
+# refresh_seconds, which picks up lessons written by other processes. Each
+# version's lessons are also published to shared state, so a worker that
+# never built a version (it started later, or has not refreshed yet) can
+# still serve its versioned URL and diff against it.
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Lesson
+from app.services.http_encoding import brotli
+from app.services.shared_state import shared_state
+
+BundleKey = Tuple[str, int]
+
+# "{language}/{level}/{version}" -> {"lessons": [...], "published": timestamp}
+bundle_store = shared_state.namespace("lesson_bundles")
+
+
+def _store_key(language: str, level: int, version: str) -> str:
+    return f"{language}/{level}/{version}"
+
+
+def _canonical(value) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def _lesson_dict(lesson: Lesson) -> dict:
+    return {
+        "id": lesson.id,
+        "subject": lesson.subject,
+        "title": lesson.title,
+        "content": lesson.content,
+        "example": lesson.example,
+        "xpReward": lesson.xp_reward or 0,
+    }
+
+
+class EncodedBody:
+    """A JSON body with its precomputed compressed forms"""
+
+    def __init__(self, raw: bytes):
+        self.encodings = {"identity": raw, "gzip": gzip.compress(raw, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.encodings["br"] = brotli.compress(raw, quality=11)  # Built once, so use the best ratio
+
+    def get(self, encoding: Optional[str]) -> Tuple[bytes, str]:
+        encoding = encoding if encoding in self.encodings else "identity"
+        return self.encodings[encoding], encoding
+
+
+class Bundle:
+    def __init__(self, language: str, level: int, lessons: List[dict]):
+        self.language = language
+        self.level = level
+        self.lessons = {lesson["id"]: lesson for lesson in lessons}
+        self.lesson_hashes = {
+            lesson["id"]: hashlib.sha256(_canonical(lesson)).hexdigest() for lesson in lessons
+        }
+        payload = {"language": language, "level": level, "lessons": sorted(lessons, key=lambda l: l["id"])}
+        raw = _canonical(payload)
+        self.hash = hashlib.sha256(raw).hexdigest()
+        self.version = self.hash[:16]
+        payload["version"] = self.version
+        self._payload = _canonical(payload)
+        self.size = len(self._payload)
+        self.body: Optional[EncodedBody] = None
+
+    def encode(self) -> "Bundle":
+        """Compress the body (blocking; done once per version)"""
+        if self.body is None:
+            self.body = EncodedBody(self._payload)
+        return self
+
+    def manifest(self) -> dict:
+        return {
+            "language": self.language,
+            "level": self.level,
+            "version": self.version,
+            "sha256": self.hash,
+            "lessons": len(self.lessons),
+            "size": self.size,
+            "url": f"/api/lessons/bundles/{self.language}/{self.level}/{self.version}",
+        }
+
+
+def _build_bundles(grouped: Dict[BundleKey, List[dict]], known: Dict[BundleKey, Iterable[str]]) -> List[Bundle]:
+    """Hash every level and compress only versions not built before (runs in a worker thread)"""
+    bundles = []
+    for key, lessons in grouped.items():
+        bundle = Bundle(key[0], key[1], lessons)
+        if bundle.version not in known.get(key, ()):
+            bundle.encode()
+        bundles.append(bundle)
+    return bundles
+
+
+class LessonCatalog:
+    def __init__(self, refresh_seconds: float = 300, history_size: int = 5, delta_cache_size: int = 64):
+        self.refresh_seconds = refresh_seconds
+        self.history_size = history_size
+        self.loaded_at = 0.0
+        self._history: Dict[BundleKey, "OrderedDict[str, Bundle]"] = {}  # Oldest version first
+        self._deltas: "OrderedDict[Tuple[BundleKey, str, str], EncodedBody]" = OrderedDict()
+        self._remote: "OrderedDict[Tuple[BundleKey, str], Bundle]" = OrderedDict()  # Loaded from shared state
+        self.delta_cache_size = delta_cache_size
+        self._rebuilding = asyncio.Lock()
+
+    async def rebuild(self, db: AsyncSession):
+        async with self._rebuilding:
+            await self._rebuild(db)
+
+    async def _rebuild(self, db: AsyncSession):
+        grouped: Dict[BundleKey, List[dict]] = {}
+        for lesson in (await db.execute(select(Lesson))).scalars():
+            grouped.setdefault((lesson.language or "english", lesson.level or 1), []).append(_lesson_dict(lesson))
+
+        for key in set(self._history) - set(grouped):
+            grouped[key] = []  # Level emptied: publish an empty version so deltas remove its lessons
+        known = {key: set(history) for key, history in self._history.items()}
+        for bundle in await run_in_threadpool(_build_bundles, grouped, known):
+            key = (bundle.language, bundle.level)
+            history = self._history.setdefault(key, OrderedDict())
+            if bundle.version in history:
+                history.move_to_end(bundle.version)
+                continue
+            history[bundle.version] = bundle
+            while len(history) > self.history_size:
+                history.popitem(last=False)
+            await self._publish(bundle, grouped[key])
+        self.loaded_at = time.time()
+
+    async def _publish(self, bundle: Bundle, lessons: List[dict]):
+        """Share a new version with other workers and drop shared versions beyond history_size"""
+        published = await bundle_store.items()
+        if _store_key(bundle.language, bundle.level, bundle.version) not in published:
+            await bundle_store.set(
+                _store_key(bundle.language, bundle.level, bundle.version),
+                {"lessons": lessons, "published": time.time()},
+            )
+            published = await bundle_store.items()
+        prefix = _store_key(bundle.language, bundle.level, "")
+        versions = sorted(
+            (value["published"], key) for key, value in published.items() if key.startswith(prefix)
+        )
+        for _, key in versions[:-self.history_size]:
+            await bundle_store.delete(key)
+
+    async def _fresh(self, db: AsyncSession):
+        if time.time() - self.loaded_at <= self.refresh_seconds:
+            return
+        async with self._rebuilding:
+            # Requests that waited on the lock find the catalog already rebuilt
+            if time.time() - self.loaded_at > self.refresh_seconds:
+                await self._rebuild(db)
+
+    async def catalog(self, db: AsyncSession, language: Optional[str] = None) -> List[dict]:
+        await self._fresh(db)
+        return [
+            next(reversed(history.values())).manifest()
+            for (bundle_language, _), history in sorted(self._history.items())
+            if not language or bundle_language == language
+        ]
+
+    async def latest(self, db: AsyncSession, language: str, level: int) -> Optional[Bundle]:
+        await self._fresh(db)
+        history = self._history.get((language, level))
+        return next(reversed(history.values())) if history else None
+
+    async def version(self, db: AsyncSession, language: str, level: int, version: str) -> Optional[Bundle]:
+        await self._fresh(db)
+        key = (language, level)
+        bundle = self._history.get(key, {}).get(version) or self._remote.get((key, version))
+        if bundle is not None:
+            return bundle
+
+        # Built by another worker: it may be newer than our last rebuild, so
+        # refresh first; otherwise serve it from the shared copy
+        shared = await bundle_store.get(_store_key(language, level, version))
+        if shared is None:
+            return None
+        await self.rebuild(db)
+        bundle = self._history.get(key, {}).get(version)
+        if bundle is None:
+            bundle = await run_in_threadpool(lambda: Bundle(language, level, shared["lessons"]).encode())
+            if bundle.version != version:
+                return None
+            self._remote[(key, version)] = bundle
+            while len(self._remote) > self.delta_cache_size:
+                self._remote.popitem(last=False)
+        return bundle
+
+    async def delta(self, base: Bundle, target: Bundle) -> EncodedBody:
+        """Lessons added or changed between two versions of a bundle, plus removed ids"""
+        cache_key = ((target.language, target.level), base.version, target.version)
+        cached = self._deltas.get(cache_key)
+        if cached is not None:
+            self._deltas.move_to_end(cache_key)
+            return cached
+        changed = [
+            target.lessons[lesson_id]
+            for lesson_id, digest in sorted(target.lesson_hashes.items())
+            if base.lesson_hashes.get(lesson_id) != digest
+        ]
+        removed = sorted(set(base.lessons) - set(target.lessons))
+        body = await run_in_threadpool(EncodedBody, _canonical({
+            "language": target.language,
+            "level": target.level,
+            "from": base.version,
+            "version": target.version,
+            "changed": changed,
+            "removed": removed,
+        }))
+        self._deltas[cache_key] = body
+        while len(self._deltas) > self.delta_cache_size:
+            self._deltas.popitem(last=False)
+        return body
+
+
+lesson_catalog = LessonCatalog(
+    refresh_seconds=float(os.getenv("LESSON_CATALOG_REFRESH_SECONDS", "300")),
+    history_size=int(os.getenv("LESSON_CATALOG_HISTORY", "5")),
+)
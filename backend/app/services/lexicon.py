@@ -0,0 +1,279 @@
+# Lexicon - Compact memory-mapped multilingual word lexicon
+#
+# The editable source is app/data/lexicon.json: per language, headwords with
+# a definition, synonyms, antonyms and word family (inflections and
+# derivations). It is compiled into one flat binary file that every worker
+# memory-maps, so the OS shares a single copy of the pages and opening it
+# costs nothing however large the lexicon grows:
+#
+#   header   magic, format version, word count, link count, meta length
+#   meta     JSON: languages and the SHA-256 of the source it was built from
+#   keys     uint64 per word, sorted: 64-bit hash of "language:word"
+#   records  fixed-size per word (same order as keys): name and definition
+#            offsets into the string table, language id, head word index and
+#            counts of its synonym/antonym/family links
+#   links    uint32 word indices, each record's lists stored contiguously
+#   strings  UTF-8 text
+#
+# A lookup is one hash plus a binary search over the keys. Every word that
+# appears anywhere (synonyms, family members) gets a record, so links are
+# plain indices; family members point at their headword. Synonym and
+# antonym links are made symmetric at compile time.
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+SOURCE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "lexicon.json")
+
+MAGIC = b"GLEX"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sIIII")
+_RECORD = np.dtype([
+    ("name", "<u4"), ("name_len", "<u2"), ("lang", "u1"), ("has_entry", "u1"),
+    ("definition", "<u4"), ("definition_len", "<u2"),
+    ("head", "<u4"), ("links", "<u4"),
+    ("synonyms", "<u2"), ("antonyms", "<u2"), ("family", "<u2"),
+])
+_RECORD_STRUCT = struct.Struct("<IHBBIHIIHHH")  # Same layout, for reading one record without NumPy overhead
+_KINDS = ("synonyms", "antonyms", "family")
+
+_ENGLISH_SUFFIXES = ("iest", "ies", "ness", "ing", "ied", "ier", "est", "ly", "ed", "er", "es", "s")
+_DOUBLED = re.compile(r"([bdgmnprt])\1$")
+
+
+def word_key(language: str, word: str) -> int:
+    digest = hashlib.blake2b(f"{language}:{word}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class LexiconEntry(NamedTuple):
+    word: str
+    language: str
+    headword: str
+    definition: str
+    synonyms: Tuple[str, ...]
+    antonyms: Tuple[str, ...]
+    family: Tuple[str, ...]
+
+
+def _pad(size: int) -> int:
+    return -size % 8
+
+
+def compile_lexicon(source_path: str, target_path: str) -> dict:
+    """Build the binary lexicon from the JSON source; returns counts"""
+    with open(source_path, "rb") as f:
+        raw = f.read()
+    source = json.loads(raw)
+    languages = sorted(source)
+
+    words: Dict[Tuple[str, str], dict] = {}
+
+    def node(language: str, word: str) -> dict:
+        word = word.strip().lower()
+        return words.setdefault((language, word), {
+            "language": language, "word": word, "definition": "", "head": None,
+            "entry": False, "synonyms": [], "antonyms": [], "family": [],
+        })
+
+    def link(a: dict, b: dict, kind: str):
+        if b["word"] != a["word"] and (b["language"], b["word"]) not in a[kind]:
+            a[kind].append((b["language"], b["word"]))
+
+    for language in languages:
+        for headword, data in source[language].items():
+            head = node(language, headword)
+            head["entry"] = True
+            head["definition"] = data.get("definition", "")
+            for kind in ("synonyms", "antonyms"):
+                for other in data.get(kind, []):
+                    partner = node(language, other)
+                    link(head, partner, kind)
+                    link(partner, head, kind)
+            for member in data.get("family", []):
+                derived = node(language, member)
+                if derived["head"] is None and not derived["entry"]:
+                    derived["head"] = (language, head["word"])
+                link(head, derived, "family")
+
+    ordered = sorted(words.values(), key=lambda w: word_key(w["language"], w["word"]))
+    index = {(w["language"], w["word"]): i for i, w in enumerate(ordered)}
+    keys = np.array([word_key(w["language"], w["word"]) for w in ordered], dtype="<u8")
+    if len(np.unique(keys)) != len(keys):
+        raise ValueError("Lexicon hash collision; rename or remove a word")
+
+    records = np.zeros(len(ordered), dtype=_RECORD)
+    links: List[int] = []
+    strings = bytearray()
+    for i, w in enumerate(ordered):
+        record = records[i]
+        name, definition = w["word"].encode(), w["definition"].encode()
+        record["name"], record["name_len"] = len(strings), len(name)
+        strings += name
+        record["definition"], record["definition_len"] = len(strings), len(definition)
+        strings += definition
+        record["lang"] = languages.index(w["language"])
+        record["has_entry"] = w["entry"]
+        record["head"] = index[w["head"]] if w["head"] else i
+        record["links"] = len(links)
+        for kind in _KINDS:
+            record[kind] = len(w[kind])
+            links.extend(index[target] for target in w[kind])
+
+    meta = json.dumps({"languages": languages, "source": hashlib.sha256(raw).hexdigest()}).encode()
+    meta += b" " * _pad(_HEADER.size + len(meta))
+    os.makedirs(os.path.dirname(target_path) or ".", exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target_path) or ".")
+    with os.fdopen(fd, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(ordered), len(links), len(meta)))
+        f.write(meta)
+        f.write(keys.tobytes())
+        records_bytes = records.tobytes()
+        f.write(records_bytes + b"\0" * _pad(len(records_bytes)))
+        f.write(np.array(links, dtype="<u4").tobytes() + b"\0" * _pad(4 * len(links)))
+        f.write(bytes(strings))
+    os.replace(temp_path, target_path)  # Readers never map a half-written file
+    return {"words": len(ordered), "links": len(links), "bytes": os.path.getsize(target_path)}
+
+
+class Lexicon:
+    """Read-only view over a compiled lexicon file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, link_count, meta_len = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} lexicon")
+        offset = _HEADER.size
+        self.meta = json.loads(bytes(self._map[offset:offset + meta_len]))
+        self.languages = self.meta["languages"]
+        offset += meta_len
+        self._keys = np.frombuffer(self._map, dtype="<u8", count=count, offset=offset)
+        offset += 8 * count
+        self._records_offset = offset
+        offset += _RECORD.itemsize * count
+        offset += _pad(_RECORD.itemsize * count)
+        self._links_offset = offset
+        offset += 4 * link_count + _pad(4 * link_count)
+        self._strings_offset = offset
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _string(self, start: int, length: int) -> str:
+        start += self._strings_offset
+        return self._map[start:start + length].decode()
+
+    def _record(self, i: int) -> tuple:
+        # name, name_len, lang, has_entry, definition, definition_len, head, links, synonyms, antonyms, family
+        return _RECORD_STRUCT.unpack_from(self._map, self._records_offset + i * _RECORD_STRUCT.size)
+
+    def _name(self, i: int) -> str:
+        record = self._record(i)
+        return self._string(record[0], record[1])
+
+    def _find(self, language: str, word: str) -> Optional[int]:
+        key = word_key(language, word)
+        i = int(self._keys.searchsorted(np.uint64(key)))  # A Python int key would force a slow cast
+        if i < len(self._keys) and int(self._keys[i]) == key and self._name(i) == word:
+            return i
+        return None
+
+    def _candidates(self, language: str, word: str):
+        yield word
+        if language == "english":
+            for suffix in _ENGLISH_SUFFIXES:
+                if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                    stem = word[: -len(suffix)]
+                    yield stem
+                    yield stem + "e"  # giggled -> giggl -> giggle
+                    if suffix.startswith("i"):
+                        yield stem + "y"  # happiest -> happ -> happy
+                    if _DOUBLED.search(stem):
+                        yield stem[:-1]  # bigger -> bigg -> big
+
+    def index_of(self, word: str, language: str = "english") -> Optional[int]:
+        """Record index for a word, trying simple English inflections"""
+        word = word.strip().lower()
+        for candidate in self._candidates(language, word):
+            i = self._find(language, candidate)
+            if i is not None:
+                return i
+        return None
+
+    def head_of(self, i: int) -> int:
+        return self._record(i)[6]
+
+    def definition(self, i: int) -> str:
+        """Definition of a word's headword"""
+        record = self._record(self.head_of(i))
+        return self._string(record[4], record[5])
+
+    def _linked(self, i: int, kind: str) -> Tuple[int, ...]:
+        record = self._record(i)
+        position = _KINDS.index(kind)
+        start = record[7] + sum(record[8:8 + position])
+        count = record[8 + position]
+        return struct.unpack_from(f"<{count}I", self._map, self._links_offset + 4 * start)
+
+    def related(self, i: int) -> Dict[str, frozenset]:
+        """Index sets of a word's head: synonyms, antonyms and family (including the head)"""
+        head = self.head_of(i)
+        return {
+            "synonyms": frozenset(self._linked(head, "synonyms")),
+            "antonyms": frozenset(self._linked(head, "antonyms")),
+            "family": frozenset(self._linked(head, "family") + (head,)),
+        }
+
+    def lookup(self, word: str, language: str = "english") -> Optional[LexiconEntry]:
+        i = self.index_of(word, language)
+        if i is None:
+            return None
+        head = self.head_of(i)
+        names = lambda kind: tuple(self._name(j) for j in self._linked(head, kind))  # noqa: E731
+        return LexiconEntry(
+            word=self._name(i),
+            language=language,
+            headword=self._name(head),
+            definition=self.definition(head),
+            synonyms=names("synonyms"),
+            antonyms=names("antonyms"),
+            family=names("family"),
+        )
+
+
+def _source_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+_lexicon: Optional[Lexicon] = None
+
+
+def get_lexicon() -> Lexicon:
+    """Deployment-wide lexicon, compiled on first use when missing or out of date"""
+    global _lexicon
+    if _lexicon is None:
+        path = os.getenv("LEXICON_PATH", os.path.join(tempfile.gettempdir(), "gyaan_lexicon.bin"))
+        lexicon = None
+        if os.path.exists(path):
+            try:
+                lexicon = Lexicon(path)
+                if lexicon.meta.get("source") != _source_hash(SOURCE_PATH):
+                    lexicon = None
+            except ValueError:
+                lexicon = None
+        if lexicon is None:
+            compile_lexicon(SOURCE_PATH, path)
+            lexicon = Lexicon(path)
+        _lexicon = lexicon
+    return _lexicon
@@ -0,0 +1,110 @@
+# Live Reading - Incremental transcription and alignment for a read-aloud session
+#
+# Audio arrives as PCM16 chunks while the student reads. Once a segment's
+# worth is buffered it is cut at the quietest 20 ms frame near the end (so
+# words are rarely split), transcribed in the background and aligned
+# against the passage; the caller pushes the changed words to the client.
+# When the student stops only the last short segment is left to
+# transcribe, so the diagnosis follows almost immediately.
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+
+from app.services.llm_scheduler import llm_scheduler
+from app.services.reading_alignment import ReadingAlignment
+from app.services.speech import SAMPLE_RATE, get_transcriber, pcm16_to_float
+
+SEGMENT_SECONDS = 3.0   # Audio per transcription request
+CUT_WINDOW = 0.6        # Search the last part of a segment for a quiet cut point
+FRAME_SECONDS = 0.02
+MAX_SESSION_SECONDS = 600
+
+WHISPER_LANGUAGES = {"english": "en", "hindi": "hi", "malayalam": "ml"}
+
+FeedbackCallback = Callable[[dict], Awaitable[None]]
+
+
+def quiet_cut(samples: np.ndarray, window: int, frame: int) -> int:
+    """Index of the lowest-energy frame start within the last `window` samples"""
+    start = max(0, len(samples) - window)
+    tail = samples[start: start + (len(samples) - start) // frame * frame]
+    if len(tail) < frame:
+        return len(samples)
+    energy = (tail.reshape(-1, frame) ** 2).mean(axis=1)
+    return start + int(np.argmin(energy)) * frame + frame // 2
+
+
+class LiveReadingSession:
+    """One student's live read-aloud: buffer -> segments -> transcript -> alignment"""
+
+    def __init__(self, expected_text: str, on_feedback: FeedbackCallback, language: str = "english", transcriber=None):
+        self.alignment = ReadingAlignment(expected_text)
+        self.on_feedback = on_feedback
+        self.language = WHISPER_LANGUAGES.get(language, "en")
+        self.transcriber = transcriber or get_transcriber()
+        self.transcript: list = []
+        self.received_samples = 0
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._segments: asyncio.Queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._transcribe_segments())
+
+    @property
+    def duration(self) -> float:
+        return self.received_samples / SAMPLE_RATE
+
+    def add_audio(self, chunk: bytes):
+        samples = pcm16_to_float(chunk)
+        if self.duration + len(samples) / SAMPLE_RATE > MAX_SESSION_SECONDS:
+            raise ValueError("Session is too long")
+        self.received_samples += len(samples)
+        self._buffer = np.concatenate([self._buffer, samples])
+
+        segment = int(SEGMENT_SECONDS * SAMPLE_RATE)
+        while len(self._buffer) >= segment:
+            cut = quiet_cut(self._buffer[:segment], int(CUT_WINDOW * SAMPLE_RATE), int(FRAME_SECONDS * SAMPLE_RATE))
+            self._segments.put_nowait(self._buffer[:cut])
+            self._buffer = self._buffer[cut:]
+
+    async def _transcribe_segments(self):
+        while True:
+            samples = await self._segments.get()
+            if samples is None:
+                return
+            try:
+                text = await llm_scheduler.run(
+                    self.transcriber.transcribe, samples, self.language, self.alignment.remaining_text()
+                )
+            except Exception as e:
+                print(f"Live transcription error: {e}")
+                await self.on_feedback({"type": "warning", "message": "A part of the recording could not be transcribed"})
+                continue
+            if not text:
+                continue
+            self.transcript.append(text)
+            changed = self.alignment.extend(text)
+            await self.on_feedback({
+                "type": "partial",
+                "text": text,
+                "words": self.alignment.word_feedback(changed),
+                "progress": round(self.alignment.progress(), 3),
+            })
+
+    async def finish(self) -> dict:
+        """Flush the tail segment, wait for transcription and diagnose"""
+        if len(self._buffer):
+            self._segments.put_nowait(self._buffer)
+            self._buffer = np.zeros(0, dtype=np.float32)
+        self._segments.put_nowait(None)
+        await self._worker
+
+        changed = self.alignment.finish()
+        diagnosis = self.alignment.diagnosis(self.duration)
+        return {
+            "transcript": " ".join(self.transcript),
+            "words": self.alignment.word_feedback(changed),
+            "diagnosis": diagnosis,
+        }
+
+    def cancel(self):
+        self._worker.cancel()
@@ -0,0 +1,323 @@
+# LLM Scheduler - Rate-limit-aware queue in front of every provider call
+import asyncio
+import functools
+import heapq
+import itertools
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+# Priority classes (lower number runs first)
+PRIORITY_CHAT = 0        # Live chat with a student waiting on the reply
+PRIORITY_DIAGNOSIS = 1   # Single reading/math/comprehension diagnosis
+PRIORITY_BATCH = 2       # Content ingestion and other background work
+
+DEFAULT_TENANT = "default"
+CANCEL_POLL_SECONDS = 0.25  # How often a queued call re-checks whether it is still wanted
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Parse a reset header ("1s", "6m0s", "20ms", "2.5") into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    seconds = 0.0
+    matched = False
+    for amount, unit in _DURATION_PART.findall(value):
+        matched = True
+        amount = float(amount)
+        if unit == "ms":
+            seconds += amount / 1000
+        elif unit == "s":
+            seconds += amount
+        elif unit == "m":
+            seconds += amount * 60
+        elif unit == "h":
+            seconds += amount * 3600
+    return seconds if matched else None
+
+
+def _int_header(headers, name: str) -> Optional[int]:
+    value = headers.get(name)
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """True for 429 errors from the OpenAI, Groq or Gemini SDKs"""
+    return getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429
+
+
+class ProviderLimits:
+    """Rate-limit state for one provider, learned from its response headers"""
+
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        self.remaining_requests: Optional[int] = None
+        self.remaining_tokens: Optional[int] = None
+        self.requests_reset_at = 0.0
+        self.tokens_reset_at = 0.0
+        self.blocked_until = 0.0
+
+    def update(self, headers, now: float):
+        """Record the limits reported in a provider response"""
+        if headers is None:
+            return
+
+        remaining_requests = _int_header(headers, "x-ratelimit-remaining-requests")
+        if remaining_requests is not None:
+            self.remaining_requests = remaining_requests
+            self.requests_reset_at = now + (parse_reset(headers.get("x-ratelimit-reset-requests")) or 1.0)
+
+        remaining_tokens = _int_header(headers, "x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None:
+            self.remaining_tokens = remaining_tokens
+            self.tokens_reset_at = now + (parse_reset(headers.get("x-ratelimit-reset-tokens")) or 1.0)
+
+        retry_after = parse_reset(headers.get("retry-after"))
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def wait_time(self, now: float, est_tokens: int) -> float:
+        """Seconds until a new request may be sent (0 means go now)"""
+        waits = [self.blocked_until - now]
+        if self.remaining_requests is not None and self.remaining_requests <= 0:
+            waits.append(self.requests_reset_at - now)
+        if self.remaining_tokens is not None and self.remaining_tokens < max(est_tokens, 1):
+            waits.append(self.tokens_reset_at - now)
+        return max(0.0, *waits)
+
+    def reserve(self, est_tokens: int):
+        """Optimistically spend budget until the next response refreshes it"""
+        self.in_flight += 1
+        if self.remaining_requests is not None:
+            self.remaining_requests -= 1
+        if self.remaining_tokens is not None:
+            self.remaining_tokens -= est_tokens
+
+
+class CallCancelled(Exception):
+    """A queued call was withdrawn because nobody is waiting for its result"""
+
+
+class _Ticket:
+    __slots__ = ("key", "provider", "tenant", "est_tokens")
+
+    def __init__(self, key, provider: str, tenant: str, est_tokens: int):
+        self.key = key
+        self.provider = provider
+        self.tenant = tenant
+        self.est_tokens = est_tokens
+
+    def __lt__(self, other: "_Ticket") -> bool:
+        return self.key < other.key
+
+
+class LLMScheduler:
+    """
+    Central gate for provider calls.
+
+    Callers block until it is their turn: work is ordered by priority class,
+    then by start-time fair queueing across tenants (a section or teacher),
+    so one busy class cannot starve everyone else. Provider budgets are read
+    from the x-ratelimit-* headers and 429s are retried with jittered
+    exponential backoff instead of dropping straight to canned responses
+    (the SDK clients are built with max_retries=0 so this is the only retry).
+
+    Async code hands provider work to run(), which uses the scheduler's own
+    threads: calls waiting here never hold anyio's shared threadpool that
+    file I/O and CPU work are offloaded to.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 8,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        worker_threads: int = 64,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._queues: Dict[str, List[_Ticket]] = defaultdict(list)
+        self._limits: Dict[str, ProviderLimits] = {}
+        # Per-priority virtual clock and each tenant's last virtual finish time
+        self._virtual_time: Dict[int, float] = defaultdict(float)
+        self._tenant_finish: Dict[tuple, float] = defaultdict(float)
+        self._stats = defaultdict(int)
+        self._executor = ThreadPoolExecutor(max_workers=worker_threads, thread_name_prefix="llm")
+
+    def _provider_limits(self, provider: str) -> ProviderLimits:
+        if provider not in self._limits:
+            self._limits[provider] = ProviderLimits(self.max_concurrent)
+        return self._limits[provider]
+
+    def _acquire(
+        self, provider: str, priority: int, tenant: str, est_tokens: int, cancelled: Optional[Callable[[], bool]] = None
+    ) -> _Ticket:
+        with self._cond:
+            start = max(self._virtual_time[priority], self._tenant_finish[(priority, tenant)])
+            self._tenant_finish[(priority, tenant)] = start + 1
+            ticket = _Ticket((priority, start, next(self._seq)), provider, tenant, est_tokens)
+
+            queue = self._queues[provider]
+            heapq.heappush(queue, ticket)
+            limits = self._provider_limits(provider)
+
+            poll = CANCEL_POLL_SECONDS if cancelled else None
+            while True:
+                if cancelled and cancelled():
+                    queue.remove(ticket)
+                    heapq.heapify(queue)
+                    self._stats["cancelled"] += 1
+                    self._cond.notify_all()
+                    raise CallCancelled()
+                if queue[0] is ticket and limits.in_flight < limits.max_concurrent:
+                    delay = limits.wait_time(time.monotonic(), est_tokens)
+                    if delay <= 0:
+                        break
+                    self._stats["throttled_waits"] += 1
+                    self._cond.wait(timeout=min(delay, poll) if poll else delay)
+                else:
+                    self._cond.wait(timeout=poll)
+
+            heapq.heappop(queue)
+            limits.reserve(est_tokens)
+            self._virtual_time[priority] = max(self._virtual_time[priority], start)
+            self._stats[f"dispatched_p{priority}"] += 1
+            self._cond.notify_all()
+            return ticket
+
+    def _release(self, ticket: _Ticket, headers=None, backoff: float = 0.0):
+        with self._cond:
+            limits = self._provider_limits(ticket.provider)
+            limits.in_flight -= 1
+            now = time.monotonic()
+            limits.update(headers, now)
+            if backoff:
+                limits.blocked_until = max(limits.blocked_until, now + backoff)
+            self._cond.notify_all()
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(
+        self,
+        provider: str,
+        fn: Callable[[], Any],
+        priority: int = PRIORITY_DIAGNOSIS,
+        tenant: Optional[str] = None,
+        est_tokens: int = 0,
+        cancelled: Optional[Callable[[], bool]] = None,
+    ) -> Any:
+        """
+        Run fn() once the provider has budget and it is this caller's turn.
+
+        fn may return an SDK raw response (with .headers and .parse()); its
+        rate-limit headers are recorded and the parsed result is returned.
+        While queued, cancelled() is polled; when it returns True the call is
+        dropped from the queue and CallCancelled is raised.
+        """
+        tenant = tenant or DEFAULT_TENANT
+        attempt = 0
+        while True:
+            ticket = self._acquire(provider, priority, tenant, est_tokens, cancelled)
+            try:
+                response = fn()
+            except Exception as e:
+                if not is_rate_limited(e):
+                    self._release(ticket)
+                    raise
+                self._stats["rate_limited"] += 1
+                headers = getattr(getattr(e, "response", None), "headers", None)
+                if attempt >= self.max_retries:
+                    self._release(ticket, headers)
+                    self._stats["retries_exhausted"] += 1
+                    raise
+                delay = self._backoff(attempt)
+                self._release(ticket, headers, backoff=delay)
+                self._stats["retries"] += 1
+                attempt += 1
+                time.sleep(delay)
+                continue
+
+            headers = getattr(response, "headers", None)
+            self._release(ticket, headers)
+            if headers is not None and callable(getattr(response, "parse", None)):
+                return response.parse()
+            return response
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking function that talks to providers on the scheduler's threads"""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    def chat_completion(
+        self,
+        client,
+        priority: int = PRIORITY_DIAGNOSIS,
+        tenant: Optional[str] = None,
+        cancelled: Optional[Callable[[], bool]] = None,
+        **kwargs,
+    ):
+        """Scheduled chat.completions.create for OpenAI-compatible clients"""
+        est_tokens = kwargs.get("max_tokens", 0) + sum(
+            len(m.get("content", "")) // 4 for m in kwargs.get("messages", [])
+        )
+        return self.call(
+            provider_for(client),
+            lambda: client.chat.completions.with_raw_response.create(**kwargs),
+            priority=priority,
+            tenant=tenant,
+            est_tokens=est_tokens,
+            cancelled=cancelled,
+        )
+
+    def queued(self, provider: str) -> int:
+        """Calls waiting for a slot with a provider (how backed up it is right now)"""
+        with self._cond:
+            return len(self._queues.get(provider, ()))
+
+    def stats(self) -> dict:
+        """Snapshot of scheduler counters and queue depths"""
+        with self._cond:
+            return {
+                **self._stats,
+                "queued": {p: len(q) for p, q in self._queues.items()},
+                "in_flight": {p: l.in_flight for p, l in self._limits.items()},
+            }
+
+
+def provider_for(client) -> str:
+    """Name the provider behind an OpenAI-compatible client"""
+    return "groq" if "groq" in str(getattr(client, "base_url", "")) else "openai"
+
+
+# Shared scheduler instance
+llm_scheduler = LLMScheduler(
+    max_concurrent=int(os.getenv("LLM_MAX_CONCURRENT", "8")),
+    max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+    worker_threads=int(os.getenv("LLM_WORKER_THREADS", "64")),
+)
@@ -0,0 +1,143 @@
+# Local STT - CPU Whisper (faster-whisper) in a warm process pool
+#
+# Each pool process loads the model once (int8 CTranslate2 weights by
+# default) and keeps it for its lifetime. Requests wait in a bounded queue;
+# a dispatcher thread groups up to batch_size of them (or whatever arrived
+# within batch_wait seconds) into one pool task, so a busy server pays one
+# IPC round trip per batch and workers never idle between requests. When
+# the queue is full new requests fail fast with TranscriberBusy instead of
+# piling up latency.
+#
+# This module is imported by the spawned pool processes, so it must stay
+# free of app imports beyond the standard library and NumPy.
+import io
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+_model = None  # Per-process model, loaded by the pool initializer
+
+
+class TranscriberBusy(RuntimeError):
+    """The transcription queue is full; retry later"""
+
+
+def _load_model(model_size: str, compute_type: str, cpu_threads: int):
+    global _model
+    from faster_whisper import WhisperModel  # Optional dependency, only needed for STT_BACKEND=local
+    _model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _transcribe_batch(items: List[Tuple[Union[np.ndarray, bytes], Optional[str], Optional[str]]]) -> List[Tuple[bool, Union[Tuple[str, float], str]]]:
+    """Run in a pool process: (ok, (text, decoded seconds) or error) per item"""
+    results = []
+    for audio, language, prompt in items:
+        try:
+            source = io.BytesIO(audio) if isinstance(audio, bytes) else audio
+            segments, info = _model.transcribe(
+                source, language=language, initial_prompt=prompt or None, beam_size=1, vad_filter=True
+            )
+            text = " ".join(segment.text.strip() for segment in segments).strip()
+            results.append((True, (text, float(info.duration))))
+        except Exception as e:
+            results.append((False, f"{type(e).__name__}: {e}"))
+    return results
+
+
+class LocalWhisperTranscriber:
+    """faster-whisper on CPU behind a bounded, micro-batching request queue"""
+
+    name = "local"
+
+    def __init__(
+        self,
+        model_size: str = "base",
+        workers: int = 1,
+        cpu_threads: int = 0,
+        compute_type: str = "int8",
+        batch_size: int = 4,
+        batch_wait: float = 0.05,
+        queue_size: int = 32,
+        timeout: float = 120.0,
+    ):
+        self.model = model_size
+        self.workers = workers
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.timeout = timeout
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),  # Never fork a process running event loop threads
+            initializer=_load_model,
+            initargs=(model_size, compute_type, cpu_threads or max(1, (os.cpu_count() or 1) // workers)),
+        )
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._in_flight = threading.Semaphore(workers)
+        self._dispatcher = threading.Thread(target=self._dispatch, name="stt-dispatcher", daemon=True)
+        self._dispatcher.start()
+
+    def start(self):
+        """Spawn every worker and load its model now instead of on the first request"""
+        for future in [self._pool.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def _submit(self, audio, language: Optional[str], prompt: Optional[str]) -> Tuple[str, float]:
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((audio, language, prompt, future))
+        except queue.Full:
+            raise TranscriberBusy("Transcription queue is full")
+        return future.result(timeout=self.timeout)
+
+    def transcribe(self, samples: np.ndarray, language: str = "en", prompt: Optional[str] = None) -> str:
+        """16 kHz float32 samples -> text"""
+        return self._submit(np.ascontiguousarray(samples, dtype=np.float32), language, prompt)[0]
+
+    def transcribe_file(self, data: bytes, language: Optional[str] = None, prompt: Optional[str] = None) -> Tuple[str, float]:
+        """Encoded audio (webm, wav, mp3, ...) -> (text, duration in seconds); decoded in the worker"""
+        return self._submit(data, language, prompt)
+
+    def _dispatch(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get(timeout=self.batch_wait))
+            except queue.Empty:
+                pass
+
+            self._in_flight.acquire()
+            try:
+                task = self._pool.submit(_transcribe_batch, [item[:3] for item in batch])
+            except Exception as e:
+                self._in_flight.release()
+                for *_, future in batch:
+                    future.set_exception(e)
+                continue
+            task.add_done_callback(lambda task, batch=batch: self._deliver(task, batch))
+
+    def _deliver(self, task: Future, batch: list):
+        self._in_flight.release()
+        try:
+            results = task.result()
+        except Exception as e:
+            for *_, future in batch:
+                future.set_exception(e)
+            return
+        for (*_, future), (ok, value) in zip(batch, results):
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(value))
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "model": self.model, "workers": self.workers, "queued": self._queue.qsize()}
@@ -0,0 +1,188 @@
+# Progress Analytics - Columnar per-subject statistics over assessment history
+#
+# All statistics are computed with grouped NumPy reductions (bincount over a
+# group id), so one pass handles thousands of assessments for one student or
+# a whole section at once: group = student_index * len(SUBJECTS) + subject.
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+SUBJECTS = ("reading", "math", "comprehension", "vocabulary")
+SUBJECT_INDEX = {name: i for i, name in enumerate(SUBJECTS)}
+
+EWMA_ALPHA = 0.3            # Weight of the newest attempt in mastery
+READY_MASTERY = 80.0        # Mastery needed to move up a level
+MIN_ATTEMPTS = 3            # Attempts per subject before readiness counts
+MAX_DECLINE_PER_DAY = -1.0  # Accuracy points/day; steeper decline blocks readiness
+
+
+def _timestamp(value) -> Optional[float]:
+    """Seconds since epoch from a datetime, ISO string or number (None if unknown)"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return None
+
+
+class AssessmentColumns:
+    """Assessment history as parallel arrays (one row per assessment)"""
+
+    __slots__ = ("student", "subject", "accuracy", "days")
+
+    def __init__(self, student: np.ndarray, subject: np.ndarray, accuracy: np.ndarray, days: np.ndarray):
+        self.student = student
+        self.subject = subject
+        self.accuracy = accuracy
+        self.days = days
+
+    def __len__(self) -> int:
+        return len(self.accuracy)
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict], student_index: Optional[Dict[str, int]] = None) -> "AssessmentColumns":
+        """
+        Build columns from assessment dicts ("type"/"agent_type", "accuracy",
+        "created_at"). With student_index, rows are tagged by "user_id";
+        unknown subjects are skipped. If any row lacks a usable timestamp the
+        whole series falls back to list order, one attempt per day, so real
+        and positional times are never mixed in one trend.
+        """
+        student, subject, accuracy, seconds = [], [], [], []
+        for record in records:
+            subject_id = SUBJECT_INDEX.get(record.get("type") or record.get("agent_type"))
+            if subject_id is None:
+                continue
+            student.append(student_index[record["user_id"]] if student_index is not None else 0)
+            subject.append(subject_id)
+            accuracy.append(record.get("accuracy") or 0)
+            seconds.append(_timestamp(record.get("created_at")))
+
+        if seconds and None not in seconds:
+            seconds = np.asarray(seconds, dtype=np.float64)
+            days = (seconds - seconds.min()) / 86400.0
+        else:
+            days = np.arange(len(seconds), dtype=np.float64)
+        return cls(
+            np.asarray(student, dtype=np.int32),
+            np.asarray(subject, dtype=np.int8),
+            np.asarray(accuracy, dtype=np.float64),
+            days,
+        )
+
+
+def subject_stats(columns: AssessmentColumns, n_students: int = 1, alpha: float = EWMA_ALPHA) -> Dict[str, np.ndarray]:
+    """
+    Per (student, subject) count, mean, trend slope (points/day), EWMA
+    mastery and volatility. Every array has shape (n_students, n_subjects);
+    cells without data are NaN (count is 0).
+    """
+    n_groups = n_students * len(SUBJECTS)
+    shape = (n_students, len(SUBJECTS))
+    if len(columns) == 0:
+        empty = np.full(shape, np.nan)
+        return {"count": np.zeros(shape, dtype=np.int64), "mean": empty, "slope": empty.copy(),
+                "mastery": empty.copy(), "volatility": empty.copy()}
+
+    group = columns.student.astype(np.int64) * len(SUBJECTS) + columns.subject
+    order = np.lexsort((columns.days, group))
+    group, x, t = group[order], columns.accuracy[order], columns.days[order]
+
+    count = np.bincount(group, minlength=n_groups).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sum_x = np.bincount(group, weights=x, minlength=n_groups)
+        mean = sum_x / count
+        sum_xx = np.bincount(group, weights=x * x, minlength=n_groups)
+        volatility = np.sqrt(np.maximum(sum_xx / count - mean * mean, 0.0))
+
+        # Least-squares slope of accuracy over time within each group
+        sum_t = np.bincount(group, weights=t, minlength=n_groups)
+        sum_tt = np.bincount(group, weights=t * t, minlength=n_groups)
+        sum_tx = np.bincount(group, weights=t * x, minlength=n_groups)
+        denominator = count * sum_tt - sum_t * sum_t
+        slope = np.where(denominator > 1e-12, (count * sum_tx - sum_t * sum_x) / denominator, 0.0)
+        slope[count == 0] = np.nan
+
+        # Bias-corrected EWMA: newest attempt weighs alpha, older ones decay
+        starts = np.concatenate(([0], np.cumsum(count)[:-1])).astype(np.int64)
+        rank_from_newest = (count[group] - 1) - (np.arange(len(group)) - starts[group])
+        weights = (1.0 - alpha) ** rank_from_newest
+        mastery = np.bincount(group, weights=weights * x, minlength=n_groups) / np.bincount(
+            group, weights=weights, minlength=n_groups
+        )
+
+    return {
+        "count": count.astype(np.int64).reshape(shape),
+        "mean": mean.reshape(shape),
+        "slope": slope.reshape(shape),
+        "mastery": mastery.reshape(shape),
+        "volatility": volatility.reshape(shape),
+    }
+
+
+def readiness(stats: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Level progress (mean mastery over assessed subjects) and whether each
+    student is ready for the next level: every subject with enough attempts
+    is at READY_MASTERY and none is declining steeply.
+    """
+    count, mastery, slope = stats["count"], stats["mastery"], stats["slope"]
+    assessed = count > 0
+    settled = count >= MIN_ATTEMPTS
+    with np.errstate(invalid="ignore"):
+        level_progress = np.where(assessed, mastery, 0.0).sum(axis=1) / np.maximum(assessed.sum(axis=1), 1)
+        subject_ready = (mastery >= READY_MASTERY) & (slope >= MAX_DECLINE_PER_DAY)
+    ready = settled.any(axis=1) & np.all(~settled | subject_ready, axis=1) & (level_progress >= READY_MASTERY)
+    return {"level_progress": level_progress, "ready": ready}
+
+
+def _clean(value: float, digits: int = 1) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def summarize_student(stats: Dict[str, np.ndarray], ready: Dict[str, np.ndarray], row: int = 0) -> dict:
+    """Plain-dict view of one student's row"""
+    subjects = {}
+    for j, name in enumerate(SUBJECTS):
+        if stats["count"][row, j] == 0:
+            continue
+        subjects[name] = {
+            "attempts": int(stats["count"][row, j]),
+            "average": _clean(stats["mean"][row, j]),
+            "trend_per_day": _clean(stats["slope"][row, j], 2),
+            "mastery": _clean(stats["mastery"][row, j]),
+            "volatility": _clean(stats["volatility"][row, j]),
+        }
+    return {
+        "subjects": subjects,
+        "level_progress": int(round(float(ready["level_progress"][row]))),
+        "ready_for_next_level": bool(ready["ready"][row]),
+    }
+
+
+def analyze_history(assessments: Sequence[dict]) -> dict:
+    """Local analytics for a single student's assessment history"""
+    stats = subject_stats(AssessmentColumns.from_records(assessments))
+    return summarize_student(stats, readiness(stats))
+
+
+def analyze_section(assessments: Sequence[dict], student_ids: Optional[List[str]] = None) -> Dict[str, dict]:
+    """
+    Local analytics for every student in a section in one vectorized pass.
+    assessments carry a "user_id"; student_ids fixes the output order and
+    includes students with no assessments yet.
+    """
+    if student_ids is None:
+        student_ids = sorted({a["user_id"] for a in assessments})
+    index = {student_id: i for i, student_id in enumerate(student_ids)}
+    records = [a for a in assessments if a.get("user_id") in index]
+
+    stats = subject_stats(AssessmentColumns.from_records(records, index), n_students=len(student_ids))
+    ready = readiness(stats)
+    return {student_id: summarize_student(stats, ready, i) for student_id, i in index.items()}
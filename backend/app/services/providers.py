@@ -0,0 +1,102 @@
+# Providers - Lazily imported and cached LLM / speech SDK clients
+#
+# The provider SDKs (openai, groq, google.generativeai) are slow to import,
+# so nothing here touches them until a client is first requested or the
+# startup warmup task runs. Routes and agents call the getters at request
+# time instead of building clients at module import. SDK retries are off:
+# llm_scheduler owns the 429 policy.
+import os
+import threading
+import time
+
+GROQ_BASE_URL = "https://api.groq.com/openai/v1"
+
+_lock = threading.Lock()
+_clients = {}
+_warmup = {"ready": False, "seconds": None, "providers": []}
+
+
+def _cached(name, factory):
+    if name in _clients:
+        return _clients[name]
+    with _lock:
+        if name not in _clients:
+            _clients[name] = factory()
+        return _clients[name]
+
+
+def get_chat_client():
+    """OpenAI client, or the Groq OpenAI-compatible endpoint, or None"""
+    def build():
+        openai_key = os.getenv("OPENAI_API_KEY")
+        groq_key = os.getenv("GROQ_API_KEY")
+        if not openai_key and not groq_key:
+            return None
+        from openai import OpenAI
+        if openai_key:
+            return OpenAI(api_key=openai_key, max_retries=0)
+        return OpenAI(api_key=groq_key, base_url=GROQ_BASE_URL, max_retries=0)
+    return _cached("chat", build)
+
+
+def get_groq_chat_client():
+    """OpenAI-compatible client pointed at Groq, or None"""
+    def build():
+        groq_key = os.getenv("GROQ_API_KEY")
+        if not groq_key:
+            return None
+        from openai import OpenAI
+        return OpenAI(api_key=groq_key, base_url=GROQ_BASE_URL, max_retries=0)
+    return _cached("groq_chat", build)
+
+
+def get_groq_client():
+    """Native Groq SDK client (used for Whisper), or None"""
+    def build():
+        groq_key = os.getenv("GROQ_API_KEY")
+        if not groq_key:
+            return None
+        from groq import Groq
+        return Groq(api_key=groq_key, max_retries=0)
+    return _cached("groq", build)
+
+
+def get_genai():
+    """Configured google.generativeai module, or None"""
+    def build():
+        google_key = os.getenv("GOOGLE_API_KEY")
+        if not google_key:
+            return None
+        import google.generativeai as genai
+        genai.configure(api_key=google_key)
+        return genai
+    return _cached("genai", build)
+
+
+def chat_model() -> str:
+    """Default chat model for whichever provider get_chat_client picked"""
+    if os.getenv("OPENAI_API_KEY"):
+        return "gpt-3.5-turbo"
+    return "llama-3.1-70b-versatile"
+
+
+def warmup():
+    """Import SDKs and build every configured client (run off the event loop)"""
+    started = time.perf_counter()
+    providers = []
+    for name, getter in (
+        ("chat", get_chat_client),
+        ("groq_chat", get_groq_chat_client),
+        ("groq", get_groq_client),
+        ("genai", get_genai),
+    ):
+        try:
+            if getter() is not None:
+                providers.append(name)
+        except Exception as e:
+            print(f"Provider warmup error ({name}): {e}")
+    _warmup.update(ready=True, seconds=round(time.perf_counter() - started, 3), providers=providers)
+
+
+def warmup_status() -> dict:
+    return dict(_warmup)
@@ -0,0 +1,66 @@
+# Query Counter - Count SQL statements per request to catch N+1 patterns
+#
+# Every statement sent through the engine is recorded against the counter
+# active in the current context. query_budget() fails fast when a block
+# issues more statements than allowed (use it in benchmarks and tests),
+# and QueryBudgetMiddleware logs endpoints that exceed QUERY_BUDGET in
+# development so a view that grows one query per row is noticed early.
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+
+from app.database import engine
+
+_statements: ContextVar[Optional[List[str]]] = ContextVar("query_counter", default=None)
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _record(conn, cursor, statement, parameters, context, executemany):
+    statements = _statements.get()
+    if statements is not None:
+        statements.append(statement)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """More SQL statements than allowed (usually an N+1 query)"""
+
+
+@contextmanager
+def count_queries():
+    """Collect the statements executed inside the block"""
+    statements: List[str] = []
+    token = _statements.set(statements)
+    try:
+        yield statements
+    finally:
+        _statements.reset(token)
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    """Raise QueryBudgetExceeded if the block runs more than max_queries statements"""
+    with count_queries() as statements:
+        yield statements
+    if len(statements) > max_queries:
+        listing = "\n".join(f"  {i + 1}. {s.splitlines()[0][:120]}" for i, s in enumerate(statements))
+        raise QueryBudgetExceeded(f"{len(statements)} queries (budget {max_queries}):\n{listing}")
+
+
+class QueryBudgetMiddleware:
+    """ASGI middleware logging requests that run more than max_queries statements"""
+
+    def __init__(self, app, max_queries: int):
+        self.app = app
+        self.max_queries = max_queries
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with count_queries() as statements:
+            await self.app(scope, receive, send)
+        if len(statements) > self.max_queries:
+            print(f"Query budget exceeded: {scope['method']} {scope['path']} ran {len(statements)} queries "
+                  f"(budget {self.max_queries})")
@@ -0,0 +1,326 @@
+# Question Bank - Pre-generated quiz questions for uploaded content
+#
+# Uploading content queues it for a background worker that splits the text
+# into chunks, generates multiple-choice questions for the concepts each
+# chunk covers (LLM at batch priority, or cloze questions built from the
+# text when no provider is configured) and stores them in the questions
+# table. Near-identical questions are dropped using the same trigram cosine
+# similarity as the chatbot answer cache.
+#
+# Each worker keeps a per-content index of question lists keyed by
+# (concept, difficulty), with None standing for "any", so serving a quiz is
+# one dict lookup plus random.sample of the requested size no matter how
+# large the bank is. Indexes are loaded lazily from the database and
+# dropped whenever the content namespace changes on any worker.
+import asyncio
+import json
+import math
+import os
+import random
+import re
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, func, select
+
+from app.database import AsyncSessionLocal
+from app.models import Question
+from app.services.answer_cache import _NUMBER, normalize, trigrams
+from app.services.llm_scheduler import llm_scheduler, PRIORITY_BATCH
+from app.services.providers import chat_model, get_chat_client
+from app.services.shared_state import shared_state
+
+DIFFICULTIES = ("easy", "medium", "hard")
+GENERATION_LEASE_SECONDS = 300  # Renewed per chunk; lets another worker take over if this one dies
+
+_SENTENCE = re.compile(r"(?<=[.!?।])\s+")
+_WORD = re.compile(r"\b\w{4,}\b", re.UNICODE)
+
+# Shared across workers so content uploaded via one process is visible to all
+content_store = shared_state.namespace("content")
+
+
+def split_chunks(text: str, max_chars: int = 1500) -> List[str]:
+    """Paragraph-aligned chunks of at most about max_chars"""
+    chunks, current = [], ""
+    for paragraph in (p.strip() for p in text.split("\n")):
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_concepts(chunks: List[str], concepts: List[str]) -> List[List[str]]:
+    """Concepts mentioned in each chunk; unmentioned concepts go to the first chunk"""
+    normalized = [normalize(chunk) for chunk in chunks]
+    assigned = [[c for c in concepts if normalize(c) and normalize(c) in text] for text in normalized]
+    mentioned = {c for chunk in assigned for c in chunk}
+    if assigned:
+        assigned[0] += [c for c in concepts if c not in mentioned]
+    return assigned
+
+
+def generate_with_llm(chunk: str, concepts: List[str], subject: str, per_concept: int, tenant: str = None) -> List[dict]:
+    openai_client = get_chat_client()
+    if not openai_client:
+        return generate_cloze(chunk, concepts, subject, per_concept, tenant)
+    response = llm_scheduler.chat_completion(
+        openai_client,
+        priority=PRIORITY_BATCH,
+        tenant=tenant,
+        model=chat_model(),
+        messages=[
+            {
+                "role": "system",
+                "content": f"""Write {per_concept} multiple-choice questions per concept for this {subject} text,
+                spread across easy, medium and hard. Concepts: {", ".join(concepts)}.
+                Return a JSON array: [{{"concept": "...", "difficulty": "easy|medium|hard",
+                "question": "...", "options": ["a", "b", "c", "d"], "answer": 0}}]"""
+            },
+            {"role": "user", "content": chunk}
+        ],
+        temperature=0.7,
+        max_tokens=300 * len(concepts)
+    )
+    questions = json.loads(response.choices[0].message.content)
+    return questions if isinstance(questions, list) else []
+
+
+def generate_cloze(chunk: str, concepts: List[str], subject: str, per_concept: int, tenant: str = None) -> List[dict]:
+    """
+    Offline fallback: fill-in-the-blank questions from the chunk's sentences.
+    Rarer blanked words make harder questions; distractors are other words
+    of the chunk with similar length.
+    """
+    sentences = [s.strip() for s in _SENTENCE.split(chunk) if len(_WORD.findall(s)) >= 3]
+    frequency = Counter(word.lower() for word in _WORD.findall(chunk))
+    vocabulary = sorted(frequency)
+    rng = random.Random(chunk)
+    questions = []
+    for concept in concepts:
+        concept_words = set(normalize(concept).split())
+        related = [s for s in sentences if concept_words & set(normalize(s).split())] or sentences
+        for sentence in rng.sample(related, min(per_concept, len(related))):
+            word = max(_WORD.findall(sentence), key=lambda w: (len(w), w))
+            distractors = [w for w in vocabulary if w != word.lower() and abs(len(w) - len(word)) <= 2]
+            if len(distractors) < 3:
+                continue
+            options = rng.sample(distractors, 3) + [word.lower()]
+            rng.shuffle(options)
+            rank = frequency[word.lower()]
+            questions.append({
+                "concept": concept,
+                "difficulty": "easy" if rank >= 3 else "medium" if rank == 2 else "hard",
+                "question": "Fill in the blank: " + re.sub(rf"\b{re.escape(word)}\b", "_____", sentence, count=1),
+                "options": options,
+                "answer": options.index(word.lower()),
+            })
+    return questions
+
+
+def _valid(question: dict, concepts: List[str]) -> bool:
+    options = question.get("options")
+    return (
+        isinstance(question.get("question"), str) and question["question"].strip() != ""
+        and question.get("concept") in concepts
+        and question.get("difficulty") in DIFFICULTIES
+        and isinstance(options, list) and len(options) >= 2
+        and isinstance(question.get("answer"), int) and 0 <= question["answer"] < len(options)
+    )
+
+
+class _Fingerprint:
+    __slots__ = ("grams", "norm", "numbers")
+
+    def __init__(self, text: str):
+        key = normalize(text)
+        self.grams = trigrams(key)
+        self.norm = math.sqrt(sum(v * v for v in self.grams.values())) or 1.0
+        self.numbers = _NUMBER.findall(key)
+
+    def similarity(self, other: "_Fingerprint") -> float:
+        if self.numbers != other.numbers:
+            return 0.0  # "5 + 3" and "5 + 4" are different questions
+        small, large = sorted((self.grams, other.grams), key=len)
+        return sum(count * large.get(gram, 0) for gram, count in small.items()) / (self.norm * other.norm)
+
+
+class _ContentIndex:
+    def __init__(self, questions: List[dict]):
+        self.buckets: Dict[Tuple[Optional[str], Optional[str]], List[dict]] = {}
+        self.by_id: Dict[int, dict] = {question["id"]: question for question in questions}
+        for question in questions:
+            concept, difficulty = question["concept"], question["difficulty"]
+            for key in ((concept, difficulty), (concept, None), (None, difficulty), (None, None)):
+                self.buckets.setdefault(key, []).append(question)
+
+    def summary(self) -> dict:
+        return {
+            concept: {d: len(self.buckets.get((concept, d), ())) for d in DIFFICULTIES}
+            for concept, difficulty in self.buckets
+            if concept is not None and difficulty is None
+        }
+
+
+class QuestionBank:
+    def __init__(
+        self,
+        generator: Callable = generate_with_llm,
+        per_concept: int = 3,
+        chunk_chars: int = 1500,
+        duplicate_threshold: float = 0.9,
+    ):
+        self.generator = generator
+        self.per_concept = per_concept
+        self.chunk_chars = chunk_chars
+        self.duplicate_threshold = duplicate_threshold
+        self._queue: "asyncio.Queue[str]" = asyncio.Queue()
+        self._indexes: Dict[str, _ContentIndex] = {}
+
+    def enqueue(self, content_id: str):
+        self._queue.put_nowait(content_id)
+
+    async def invalidate(self):
+        self._indexes.clear()
+
+    async def _index(self, content_id: str) -> _ContentIndex:
+        index = self._indexes.get(content_id)
+        if index is None:
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(select(Question).where(Question.content_id == content_id))).scalars()
+                index = _ContentIndex([
+                    {
+                        "id": q.id, "concept": q.concept, "difficulty": q.difficulty,
+                        "question": q.question, "options": q.options, "answer": q.answer,
+                    }
+                    for q in rows
+                ])
+            self._indexes[content_id] = index
+        return index
+
+    async def quiz(
+        self, content_id: str, count: int = 10, concept: Optional[str] = None, difficulty: Optional[str] = None
+    ) -> List[dict]:
+        """Random questions without repeats, filtered by concept and/or difficulty (answers withheld)"""
+        bucket = (await self._index(content_id)).buckets.get((concept, difficulty), [])
+        return [
+            {key: value for key, value in question.items() if key != "answer"}
+            for question in random.sample(bucket, min(count, len(bucket)))
+        ]
+
+    async def grade(self, content_id: str, answers: Dict[int, int]) -> dict:
+        """Check submitted option indexes; the answer key only leaves with the results"""
+        index = await self._index(content_id)
+        results = []
+        for question_id, chosen in answers.items():
+            question = index.by_id.get(question_id)
+            if question is None:
+                continue
+            results.append({
+                "questionId": question_id,
+                "concept": question["concept"],
+                "chosen": chosen,
+                "answer": question["answer"],
+                "correct": chosen == question["answer"],
+            })
+        correct = sum(result["correct"] for result in results)
+        return {
+            "correct": correct,
+            "total": len(results),
+            "score": round(100 * correct / len(results)) if results else 0,
+            "results": results,
+        }
+
+    async def summary(self, content_id: str) -> dict:
+        return (await self._index(content_id)).summary()
+
+    def _deduplicate(self, questions: List[dict], seen: List[_Fingerprint]) -> List[dict]:
+        unique = []
+        for question in questions:
+            fingerprint = _Fingerprint(question["question"] + " " + " ".join(map(str, question["options"])))
+            if any(fingerprint.similarity(other) >= self.duplicate_threshold for other in seen):
+                continue
+            seen.append(fingerprint)
+            unique.append(question)
+        return unique
+
+    async def generate(self, content_id: str):
+        """Build the bank for one content item, unless another worker already is"""
+        lease = f"questions:{content_id}"
+        if not await shared_state.acquire(lease, GENERATION_LEASE_SECONDS):
+            return
+        try:
+            content = await content_store.get(content_id)
+            if content is not None and content.get("status") == "processing":
+                await self._generate(content_id, content, lease)
+        finally:
+            await shared_state.release(lease)
+
+    async def _generate(self, content_id: str, content: dict, lease: str):
+        chunks = split_chunks(content["content"], self.chunk_chars)
+        seen: List[_Fingerprint] = []
+        rows: List[Question] = []
+        for position, (chunk, concepts) in enumerate(zip(chunks, chunk_concepts(chunks, content["concepts"]))):
+            if not concepts:
+                continue
+            await shared_state.acquire(lease, GENERATION_LEASE_SECONDS)  # Renew while working
+            try:
+                generated = await llm_scheduler.run(
+                    self.generator, chunk, concepts, content["subject"], self.per_concept, content["teacherId"]
+                )
+            except Exception as e:
+                print(f"Question generation error ({content_id}, chunk {position}): {e}")
+                generated = await run_in_threadpool(
+                    generate_cloze, chunk, concepts, content["subject"], self.per_concept
+                )
+            for question in self._deduplicate([q for q in generated if _valid(q, concepts)], seen):
+                rows.append(Question(
+                    content_id=content_id, concept=question["concept"], difficulty=question["difficulty"],
+                    chunk=position, question=question["question"], options=question["options"],
+                    answer=question["answer"],
+                ))
+
+        # Replace the bank in one short transaction, not one held open while generating
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Question).where(Question.content_id == content_id))
+            db.add_all(rows)
+            await db.commit()
+        total = len(rows)
+
+        # Content may have been deleted while generating
+        if await content_store.get(content_id) is None:
+            await self.delete(content_id)
+            return
+        await content_store.set(content_id, {**content, "status": "ready", "questionsGenerated": total})
+
+    async def delete(self, content_id: str):
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Question).where(Question.content_id == content_id))
+            await db.commit()
+        self._indexes.pop(content_id, None)
+
+    async def run(self):
+        """
+        Background worker started with the app; resumes content left
+        processing. Every worker enqueues it, and a shared lease per item
+        decides which one generates it.
+        """
+        for content_id, content in (await content_store.items()).items():
+            if content.get("status") == "processing":
+                self.enqueue(content_id)
+        while True:
+            content_id = await self._queue.get()
+            try:
+                await self.generate(content_id)
+            except Exception as e:
+                print(f"Question bank error ({content_id}): {e}")
+
+
+question_bank = QuestionBank(per_concept=int(os.getenv("QUESTIONS_PER_CONCEPT", "3")))
+shared_state.subscribe("content", question_bank.invalidate)
@@ -0,0 +1,137 @@
+# Reading Alignment - Progressive word-level alignment of a read-aloud
+#
+# As transcript words arrive they are matched against the expected passage
+# from a moving cursor: a word found within LOOKAHEAD passage words marks
+# everything it jumped over as skipped; a word that only resembles the one
+# at the cursor is a miscue; anything else is an inserted word. Each new
+# word costs O(LOOKAHEAD), so feedback stays live for any passage length,
+# and the final reading diagnosis is computed locally the moment the
+# student stops.
+import re
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+
+LOOKAHEAD = 4          # Passage words a reader may skip in one jump
+CLOSE_MATCH = 0.8      # Similarity accepted as the right word (accents, endings)
+MISCUE_MATCH = 0.5     # Similarity treated as an attempt at the word
+SLOW_WPM = 60          # Below this pace fluency is flagged
+
+_WORD = re.compile(r"[\w']+", re.UNICODE)
+
+CORRECT, MISCUE, SKIPPED, PENDING = "correct", "miscue", "skipped", "pending"
+
+
+def words(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+def similarity(a: str, b: str) -> float:
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+class ReadingAlignment:
+    """Alignment state for one passage; feed transcript text as it arrives"""
+
+    def __init__(self, expected_text: str):
+        self.display = _WORD.findall(expected_text)
+        self.expected = [w.lower() for w in self.display]
+        self.status = [PENDING] * len(self.expected)
+        self.heard: List[Optional[str]] = [None] * len(self.expected)
+        self.cursor = 0
+        self.inserted = 0
+
+    def remaining_text(self, limit: int = 40) -> str:
+        """Upcoming passage words (prompt for the transcriber)"""
+        return " ".join(self.display[self.cursor:self.cursor + limit])
+
+    def extend(self, text: str) -> List[int]:
+        """Align newly transcribed text; returns passage indexes whose status changed"""
+        changed = []
+        for word in words(text):
+            if self.cursor >= len(self.expected):
+                self.inserted += 1
+                continue
+            window = self.expected[self.cursor:self.cursor + LOOKAHEAD + 1]
+            scores = [similarity(word, expected) for expected in window]
+            best = max(range(len(scores)), key=lambda k: (scores[k], -k))
+
+            if scores[best] >= CLOSE_MATCH:
+                target, status = self.cursor + best, CORRECT
+            elif scores[0] >= MISCUE_MATCH:
+                target, status = self.cursor, MISCUE
+            else:
+                self.inserted += 1
+                continue
+
+            for skipped in range(self.cursor, target):
+                self.status[skipped] = SKIPPED
+                changed.append(skipped)
+            self.status[target] = status
+            self.heard[target] = word
+            changed.append(target)
+            self.cursor = target + 1
+        return changed
+
+    def finish(self) -> List[int]:
+        """Student stopped: unread words count as skipped"""
+        changed = list(range(self.cursor, len(self.expected)))
+        for i in changed:
+            self.status[i] = SKIPPED
+        self.cursor = len(self.expected)
+        return changed
+
+    def word_feedback(self, indexes: List[int]) -> List[Dict]:
+        return [
+            {"index": i, "word": self.display[i], "status": self.status[i], "heard": self.heard[i]}
+            for i in indexes
+        ]
+
+    def counts(self) -> Dict[str, int]:
+        totals = {CORRECT: 0, MISCUE: 0, SKIPPED: 0, PENDING: 0}
+        for status in self.status:
+            totals[status] += 1
+        return totals
+
+    def progress(self) -> float:
+        return self.cursor / len(self.expected) if self.expected else 1.0
+
+    def diagnosis(self, duration_seconds: float) -> Dict:
+        """Reading diagnosis in the same shape as the LLM agents return"""
+        counts = self.counts()
+        total = max(len(self.expected), 1)
+        accuracy = round(100 * counts[CORRECT] / total)
+        read = counts[CORRECT] + counts[MISCUE]
+        wpm = round(read / (duration_seconds / 60)) if duration_seconds > 0 else 0
+
+        concepts, gaps, recommendations = [], [], []
+        if counts[CORRECT] / total >= 0.9:
+            concepts.append("Word Recognition")
+        else:
+            gaps.append("Word Recognition")
+            missed = [self.display[i] for i, s in enumerate(self.status) if s == MISCUE][:5]
+            if missed:
+                recommendations.append(f"Practice these words: {', '.join(missed)}")
+        if counts[SKIPPED] > max(1, total // 10):
+            gaps.append("Tracking Text")
+            recommendations.append("Follow the line with a finger to avoid skipping words")
+        if wpm and wpm < SLOW_WPM:
+            gaps.append("Reading Fluency")
+            recommendations.append("Re-read the passage aloud to build pace")
+        elif wpm:
+            concepts.append("Reading Fluency")
+        if not recommendations:
+            recommendations.append("Try a longer passage next")
+
+        return {
+            "analysis": (
+                f"Read {read} of {total} words ({counts[CORRECT]} correctly, {counts[MISCUE]} miscues, "
+                f"{counts[SKIPPED]} skipped) at about {wpm} words per minute."
+            ),
+            "concepts": concepts,
+            "gaps": gaps,
+            "recommendations": recommendations,
+            "accuracy": accuracy,
+            "wordsPerMinute": wpm,
+        }
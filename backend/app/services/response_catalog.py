@@ -0,0 +1,95 @@
+# Response Catalog - Localized canned chatbot responses, loaded once
+import hashlib
+import json
+import os
+import random
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping, Tuple
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "chat_responses.json")
+
+DEFAULT_LANGUAGE = "english"
+LANGUAGE_ALIASES = {
+    "en": "english",
+    "english": "english",
+    "hi": "hindi",
+    "hindi": "hindi",
+    "ml": "malayalam",
+    "malayalam": "malayalam",
+}
+
+# Context taxonomy: keywords that map a free-text chat context to a category
+CONTEXT_KEYWORDS = (
+    ("math", ("math", "addition", "subtraction", "multiplication", "division", "number", "count", "place value")),
+    ("reading", ("reading", "comprehension", "vocabulary", "story", "passage", "word", "phonics")),
+)
+DEFAULT_CATEGORY = "general"
+
+
+def normalize_language(language: str) -> str:
+    return LANGUAGE_ALIASES.get((language or "").strip().lower(), DEFAULT_LANGUAGE)
+
+
+@lru_cache(maxsize=1024)
+def classify_context(context: str) -> str:
+    """Map a chat context ("Math Challenge - Addition") to a category"""
+    text = (context or "").lower()
+    for category, keywords in CONTEXT_KEYWORDS:
+        if any(keyword in text for keyword in keywords):
+            return category
+    return DEFAULT_CATEGORY
+
+
+def _freeze(value):
+    """Recursively convert JSON data into read-only mappings and tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class ResponseCatalog:
+    """
+    Immutable per-language catalog of encouragement, suggestions and hints.
+
+    Each language's payload is serialized once with a content hash so the
+    catalog endpoint can answer with a precomputed body and ETag.
+    """
+
+    def __init__(self, data: dict):
+        self._data: Mapping[str, Mapping] = _freeze(data)
+        self._payloads = {}
+        for language, entries in data.items():
+            body = json.dumps(entries, ensure_ascii=False, sort_keys=True).encode("utf-8")
+            etag = '"' + hashlib.sha256(body).hexdigest()[:20] + '"'
+            self._payloads[language] = (body, etag)
+
+    @classmethod
+    def load(cls, path: str = CATALOG_PATH) -> "ResponseCatalog":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _language(self, language: str) -> Mapping:
+        return self._data.get(normalize_language(language)) or self._data[DEFAULT_LANGUAGE]
+
+    def encouragement(self, language: str = DEFAULT_LANGUAGE) -> str:
+        return random.choice(self._language(language)["encouragement"])
+
+    def suggestions(self, context: str, language: str = DEFAULT_LANGUAGE) -> Tuple[str, ...]:
+        return self._language(language)["suggestions"][classify_context(context)]
+
+    def hint(self, category: str, language: str = DEFAULT_LANGUAGE) -> str:
+        hints = self._language(language)["hints"]
+        return random.choice(hints.get(category) or hints[DEFAULT_CATEGORY])
+
+    def fallback(self, language: str = DEFAULT_LANGUAGE) -> str:
+        return self._language(language)["fallback"]
+
+    def payload(self, language: str = DEFAULT_LANGUAGE) -> Tuple[bytes, str]:
+        """Pre-serialized JSON body and ETag for one language"""
+        return self._payloads.get(normalize_language(language)) or self._payloads[DEFAULT_LANGUAGE]
+
+
+response_catalog = ResponseCatalog.load()
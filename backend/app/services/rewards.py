@@ -0,0 +1,202 @@
+# Rewards - Rage meter, reward eligibility and live "reward available" events
+#
+# XP awards fill progress.rage_progress in the same UPDATE that adds XP;
+# eligibility is decided right after, in one conditional UPDATE, and a
+# student who just became eligible is pushed to connected student/teacher
+# streams. When a teacher changes the threshold every student is
+# re-evaluated by a single set-based UPDATE ... RETURNING, in whichever
+# worker takes the re-evaluation lease. Events are broadcast through
+# shared_state so streams connected to any worker receive them.
+import asyncio
+import json
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from pydantic import BaseModel, Field
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models import Progress, User
+from app.services.shared_state import shared_state
+from app.services.xp_events import XPChange, on_xp
+
+HEARTBEAT_SECONDS = 15
+QUEUE_SIZE = 100
+REEVALUATE_LEASE = "rewards:reevaluate"
+REEVALUATE_LEASE_SECONDS = 60
+
+
+class RewardConfig(BaseModel):
+    rageThreshold: int = Field(ge=1)  # XP per reward; also the modulus of the rage meter
+    rewardType: str
+    rewardValue: str
+    rewardDescription: str
+
+DEFAULT_REWARD_CONFIG = RewardConfig(
+    rageThreshold=500,
+    rewardType="bonus_marks",
+    rewardValue="5",
+    rewardDescription="5 Bonus Marks"
+)
+
+# Shared across workers so every process sees the same thresholds
+reward_state = shared_state.namespace("rewards")
+
+
+async def get_current_reward_config() -> RewardConfig:
+    """Current reward config (cached in-process, shared across workers)"""
+    data = await reward_state.get("config")
+    return RewardConfig(**data) if data else DEFAULT_REWARD_CONFIG
+
+
+class RewardEvents:
+    """
+    Fan-out of reward events to streaming clients. Events are published to
+    every worker and each delivers them to its own clients. Each client has
+    a bounded queue; a client that stops reading loses its oldest events
+    instead of growing memory.
+    """
+
+    def __init__(self):
+        self._students: Dict[str, Set[asyncio.Queue]] = {}
+        self._sections: Dict[str, Set[asyncio.Queue]] = {}
+
+    async def publish(self, event: dict):
+        await shared_state.publish("reward_events", event)
+
+    async def deliver(self, event: dict):
+        """Hand an event to this worker's connected clients"""
+        queues = set(self._students.get(event["studentId"], ())) | set(self._sections.get(event.get("section"), ()))
+        for queue in queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def stream(self, student_id: Optional[str] = None, section: Optional[str] = None) -> AsyncIterator[str]:
+        """Server-sent events for one student or one section, with heartbeats"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        registry, key = (self._students, student_id) if student_id else (self._sections, section)
+        registry.setdefault(key, set()).add(queue)
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            registry[key].discard(queue)
+            if not registry[key]:
+                del registry[key]
+
+
+reward_events = RewardEvents()
+shared_state.on_event("reward_events", reward_events.deliver)
+
+
+def _event(student_id: str, section: Optional[str], rage_progress: int, threshold: int, available: bool) -> dict:
+    return {
+        "type": "reward_available" if available else "reward_unavailable",
+        "studentId": student_id,
+        "section": section,
+        "rageProgress": rage_progress,
+        "rageThreshold": threshold,
+    }
+
+
+@on_xp
+async def evaluate_reward(db: AsyncSession, changes: List[XPChange]):
+    """Mark students eligible the moment their meter crosses the threshold"""
+    threshold = (await get_current_reward_config()).rageThreshold
+    result = await db.execute(
+        update(Progress)
+        .where(Progress.user_id.in_({student_id for student_id, _, _ in changes}),
+               Progress.reward_available.isnot(True), Progress.rage_progress >= threshold)
+        .values(reward_available=True)
+        .returning(Progress.user_id, Progress.rage_progress)
+    )
+    eligible = dict(result.all())
+    await db.commit()
+    if eligible:
+        sections = dict((await db.execute(select(User.id, User.section).where(User.id.in_(eligible)))).all())
+        for student_id, rage_progress in eligible.items():
+            await reward_events.publish(_event(student_id, sections.get(student_id), rage_progress, threshold, True))
+
+
+async def _reevaluate(threshold: int):
+    eligible = func.coalesce(Progress.rage_progress, 0) >= threshold
+    async with AsyncSessionLocal() as db:
+        changed = (await db.execute(
+            update(Progress)
+            .where(func.coalesce(Progress.reward_available, False) != eligible)
+            .values(reward_available=eligible)
+            .returning(Progress.user_id, Progress.rage_progress, Progress.reward_available)
+        )).all()
+        await db.commit()
+        if not changed:
+            return
+        sections = dict((await db.execute(
+            select(User.id, User.section).where(User.id.in_([row.user_id for row in changed]))
+        )).all())
+    for row in changed:
+        await reward_events.publish(
+            _event(row.user_id, sections.get(row.user_id), row.rage_progress or 0, threshold, row.reward_available)
+        )
+
+
+async def reevaluate_rewards():
+    """Threshold changed: flip eligibility for every affected student in one UPDATE (one worker only)"""
+    if not await shared_state.acquire(REEVALUATE_LEASE, REEVALUATE_LEASE_SECONDS):
+        return  # Another worker is on it
+    try:
+        done = None
+        while (threshold := (await get_current_reward_config()).rageThreshold) != done:
+            await _reevaluate(threshold)  # Repeat if the threshold changed again meanwhile
+            done = threshold
+    finally:
+        await shared_state.release(REEVALUATE_LEASE)
+
+shared_state.subscribe("rewards", reevaluate_rewards)
+
+
+async def rage_meter(db: AsyncSession, student_id: str) -> dict:
+    threshold = (await get_current_reward_config()).rageThreshold
+    row = (await db.execute(
+        select(Progress.rage_progress, Progress.reward_available).where(Progress.user_id == student_id)
+    )).first()
+    rage_progress, available = (row.rage_progress or 0, bool(row.reward_available)) if row else (0, False)
+    return {
+        "rageProgress": rage_progress,
+        "rageThreshold": threshold,
+        "percentComplete": min(100, rage_progress * 100 // threshold) if threshold > 0 else 100,
+        "rewardAvailable": available,
+    }
+
+
+async def claim_reward(db: AsyncSession, student_id: str) -> Optional[dict]:
+    """Spend one threshold's worth of rage; None if no reward is available"""
+    config = await get_current_reward_config()
+    remaining = func.coalesce(Progress.rage_progress, 0) - config.rageThreshold
+    claimed = (await db.execute(
+        update(Progress)
+        .where(Progress.user_id == student_id, Progress.reward_available.is_(True))
+        .values(rage_progress=remaining, reward_available=remaining >= config.rageThreshold)
+        .returning(Progress.rage_progress, Progress.reward_available)
+    )).first()
+    await db.commit()
+    if claimed is None:
+        return None
+    return {
+        "reward": config.model_dump(),
+        "rageProgress": claimed.rage_progress,
+        "rewardAvailable": claimed.reward_available,
+    }
+
+
+async def count_reward_ready(db: AsyncSession, section: Optional[str] = None) -> int:
+    query = select(func.count()).select_from(Progress).where(Progress.reward_available.is_(True))
+    if section:
+        query = query.join(User, User.id == Progress.user_id).where(User.section == section)
+    return await db.scalar(query)
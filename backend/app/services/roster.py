@@ -0,0 +1,357 @@
+# Roster - Bulk student import from CSV/XLSX and streaming class reports
+#
+# Imports read the upload row by row (csv module, or openpyxl in read-only
+# mode for .xlsx) in a worker thread, validate each row and upsert users and
+# progress in batches of BATCH_SIZE, one transaction per batch, so a
+# 5,000-row roster never sits in memory as ORM objects. Rows without an id
+# are matched to existing students by (username, section), so importing the
+# same roster twice updates instead of duplicating; only student accounts
+# are ever touched. Exports stream rows straight from a server-side cursor
+# into CSV chunks.
+import codecs
+import csv
+import io
+import itertools
+import uuid
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError, field_validator
+from sqlalchemy import bindparam, case, func, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models import Assessment, Progress, User
+from app.services.xp_events import XP_PER_LEVEL, notify_xp
+
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+EXPORT_CHUNK_ROWS = 200
+
+# Accepted header spellings -> field name
+HEADER_ALIASES = {
+    "id": "id", "student_id": "id", "studentid": "id",
+    "username": "username", "name": "username", "student": "username",
+    "email": "email",
+    "section": "section", "class": "section",
+    "approved": "approved", "is_approved": "approved",
+    "xp": "xp",
+    "level": "level",
+    "reading_score": "reading_score", "reading": "reading_score",
+    "math_score": "math_score", "math": "math_score",
+    "comprehension_score": "comprehension_score", "comprehension": "comprehension_score",
+    "vocabulary_score": "vocabulary_score", "vocabulary": "vocabulary_score",
+}
+PROGRESS_COLUMNS = ("xp", "level", "reading_score", "math_score", "comprehension_score", "vocabulary_score")
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")  # Cells a spreadsheet would evaluate
+
+
+class RosterRow(BaseModel):
+    """One validated roster line"""
+    id: Optional[str] = None
+    username: str
+    email: Optional[str] = None
+    section: str
+    approved: bool = True
+    xp: Optional[int] = None
+    level: Optional[int] = None
+    reading_score: Optional[float] = None
+    math_score: Optional[float] = None
+    comprehension_score: Optional[float] = None
+    vocabulary_score: Optional[float] = None
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def blank_is_missing(cls, value):
+        if isinstance(value, str):
+            value = value.strip()
+            return value or None
+        return value
+
+    @field_validator("username")
+    @classmethod
+    def username_length(cls, value: str) -> str:
+        if len(value) > 100:
+            raise ValueError("username longer than 100 characters")
+        return value
+
+    @field_validator("section")
+    @classmethod
+    def section_length(cls, value: str) -> str:
+        if len(value) > 10:
+            raise ValueError("section longer than 10 characters")
+        return value
+
+    @field_validator("xp", "level")
+    @classmethod
+    def not_negative(cls, value: Optional[int]) -> Optional[int]:
+        if value is not None and value < 0:
+            raise ValueError("must not be negative")
+        return value
+
+    @field_validator("reading_score", "math_score", "comprehension_score", "vocabulary_score")
+    @classmethod
+    def percentage(cls, value: Optional[float]) -> Optional[float]:
+        if value is not None and not 0 <= value <= 100:
+            raise ValueError("score must be between 0 and 100")
+        return value
+
+
+def _csv_rows(stream) -> Iterator[List[str]]:
+    reader = csv.reader(codecs.getreader("utf-8-sig")(stream))
+    yield from reader
+
+
+def _xlsx_rows(stream) -> Iterator[List[str]]:
+    try:
+        import openpyxl  # Optional dependency, only needed for .xlsx rosters
+    except ImportError:
+        raise ValueError("XLSX import needs openpyxl; upload CSV or install openpyxl")
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    try:
+        for values in workbook.active.iter_rows(values_only=True):
+            yield ["" if v is None else str(v) for v in values]
+    finally:
+        workbook.close()
+
+
+def read_roster(stream, filename: str, default_section: Optional[str] = None) -> Iterator[Tuple[int, dict]]:
+    """Yield (line number, raw field dict) for each non-empty data row"""
+    rows = _xlsx_rows(stream) if filename.lower().endswith((".xlsx", ".xlsm")) else _csv_rows(stream)
+    header = next(rows, None)
+    if not header:
+        raise ValueError("Roster is empty")
+    fields = [HEADER_ALIASES.get(h.strip().lower().replace(" ", "_")) for h in header]
+    if "username" not in fields:
+        raise ValueError("Roster needs a username (or name) column")
+    if "section" not in fields and not default_section:
+        raise ValueError("Roster needs a section column or a default section")
+
+    for line, values in enumerate(rows, start=2):
+        if not any(v.strip() for v in values):
+            continue
+        raw = {field: value for field, value in zip(fields, values) if field}
+        if default_section and not (raw.get("section") or "").strip():
+            raw["section"] = default_section
+        yield line, raw
+
+
+def _parse_batch(rows: Iterator[Tuple[int, dict]], size: int) -> Tuple[List[Tuple[int, RosterRow]], List[dict], bool]:
+    """Read and validate up to `size` rows (runs in a worker thread); returns (rows, errors, more)"""
+    parsed, errors = [], []
+    raw_rows = list(itertools.islice(rows, size))
+    for line, raw in raw_rows:
+        try:
+            parsed.append((line, RosterRow(**raw)))
+        except ValidationError as e:
+            problems = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            errors.append({"row": line, "error": problems})
+    return parsed, errors, len(raw_rows) == size
+
+
+async def _resolve_ids(db: AsyncSession, batch: List[Tuple[int, RosterRow]]) -> List[dict]:
+    """Give every row the id of the student it refers to; returns errors for rows naming non-students"""
+    keys = {(row.username, row.section) for _, row in batch if row.id is None}
+    known: Dict[Tuple[str, str], str] = {}
+    if keys:
+        result = await db.execute(
+            select(User.username, User.section, User.id)
+            .where(User.role == "student", tuple_(User.username, User.section).in_(list(keys)))
+            .order_by(User.created_at, User.id)
+        )
+        for username, section, user_id in result:
+            known.setdefault((username, section), user_id)
+
+    ids = [row.id for _, row in batch if row.id is not None]
+    roles = dict((await db.execute(select(User.id, User.role).where(User.id.in_(ids)))).all()) if ids else {}
+    errors = []
+    for line, row in batch:
+        if row.id is None:
+            # Repeated new names within the roster share one id as well
+            row.id = known.setdefault((row.username, row.section), str(uuid.uuid4()))
+        elif roles.get(row.id, "student") != "student":
+            errors.append({"row": line, "error": "id: belongs to a non-student account"})
+    return errors
+
+
+# Imported XP moves the rage meter by the change, like award_xp (never below zero)
+_progress = Progress.__table__
+_rage = func.coalesce(_progress.c.rage_progress, 0) + bindparam("new_xp") - func.coalesce(_progress.c.xp, 0)
+_set_xp = (
+    update(_progress)
+    .where(_progress.c.id == bindparam("progress_id"))
+    .values(xp=bindparam("new_xp"), level=bindparam("new_level"), rage_progress=case((_rage > 0, _rage), else_=0))
+)
+
+
+async def _upsert_batch(db: AsyncSession, batch: List[RosterRow]) -> Tuple[int, int]:
+    """Insert or update one batch of students and progress rows; returns (created, updated)"""
+    # Later duplicates in the same batch win
+    by_id: Dict[str, RosterRow] = {}
+    for row in batch:
+        by_id[row.id] = row
+    ids = list(by_id)
+
+    existing = set((await db.execute(
+        select(User.id).where(User.id.in_(ids), User.role == "student")
+    )).scalars())
+    progress = {
+        user_id: (progress_id, xp or 0)
+        for user_id, progress_id, xp in (await db.execute(
+            select(Progress.user_id, Progress.id, Progress.xp).where(Progress.user_id.in_(ids))
+        )).all()
+    }
+
+    new_users = [
+        {"id": r.id, "username": r.username, "email": r.email, "role": "student",
+         "section": r.section, "is_approved": r.approved}
+        for r in by_id.values() if r.id not in existing
+    ]
+    changed_users = [
+        {"id": r.id, "username": r.username, "email": r.email, "section": r.section, "is_approved": r.approved}
+        for r in by_id.values() if r.id in existing
+    ]
+    if new_users:
+        await db.execute(insert(User), new_users)
+    if changed_users:
+        await db.execute(
+            update(User).where(User.role == "student").execution_options(synchronize_session=None),
+            changed_users,
+        )
+
+    new_progress, changed_progress, changed_xp, xp_changes = [], [], [], []
+    for r in by_id.values():
+        values = {c: getattr(r, c) for c in PROGRESS_COLUMNS if getattr(r, c) is not None}
+        previous_xp = progress[r.id][1] if r.id in progress else 0
+        if r.xp is not None:
+            values.setdefault("level", r.xp // XP_PER_LEVEL)
+            if r.xp != previous_xp:
+                xp_changes.append((r.id, previous_xp, r.xp))
+        if r.id not in progress:
+            new_progress.append({"user_id": r.id, "lessons_completed": [], "rage_progress": r.xp or 0, **values})
+        elif r.xp is not None:
+            xp = {"progress_id": progress[r.id][0], "new_xp": values.pop("xp"), "new_level": values.pop("level")}
+            changed_xp.append(xp)
+            if values:
+                changed_progress.append({"id": progress[r.id][0], **values})
+        elif values:
+            changed_progress.append({"id": progress[r.id][0], **values})
+    if new_progress:
+        await db.execute(insert(Progress), new_progress)
+    if changed_progress:
+        await db.execute(update(Progress), changed_progress)
+    if changed_xp:
+        await db.execute(_set_xp, changed_xp)
+
+    await db.commit()
+
+    # Same notifications as award_xp, so the leaderboard and rewards follow imported XP
+    await notify_xp(db, xp_changes)
+    return len(new_users), len(changed_users)
+
+
+async def import_roster(db: AsyncSession, stream, filename: str, default_section: Optional[str] = None) -> dict:
+    """
+    Validate and upsert a roster. Rows are matched on id when given,
+    otherwise on (username, section) among existing students, otherwise a
+    new student is created. Invalid rows and rows naming non-student
+    accounts are skipped and reported.
+    """
+    created = updated = skipped = 0
+    errors: List[dict] = []
+    rows = read_roster(stream, filename, default_section)
+
+    more = True
+    while more:
+        # File reading and validation are blocking; keep them off the event loop
+        parsed, invalid, more = await run_in_threadpool(_parse_batch, rows, BATCH_SIZE)
+        invalid += await _resolve_ids(db, parsed)
+        rejected = {entry["row"] for entry in invalid}
+        skipped += len(invalid)
+        errors += invalid[:max(0, MAX_REPORTED_ERRORS - len(errors))]
+        batch = [row for line, row in parsed if line not in rejected]
+        if batch:
+            c, u = await _upsert_batch(db, batch)
+            created, updated = created + c, updated + u
+    return {"created": created, "updated": updated, "skipped": skipped, "errors": errors}
+
+
+# Export reports: name -> (header, query builder)
+def _student_report(section: Optional[str]):
+    assessments = (
+        select(
+            Assessment.user_id,
+            func.count(Assessment.id).label("assessments"),
+            func.avg(Assessment.accuracy).label("average_accuracy"),
+        )
+        .group_by(Assessment.user_id)
+        .subquery()
+    )
+    query = (
+        select(User.id, User.username, User.section, Progress.level, Progress.xp,
+               Progress.reading_score, Progress.math_score, Progress.comprehension_score,
+               Progress.vocabulary_score, assessments.c.assessments, assessments.c.average_accuracy)
+        .outerjoin(Progress, Progress.user_id == User.id)
+        .outerjoin(assessments, assessments.c.user_id == User.id)
+        .where(User.role == "student")
+        .order_by(User.section, User.username, User.id)
+    )
+    return query.where(User.section == section) if section else query
+
+
+def _assessment_report(section: Optional[str]):
+    query = (
+        select(User.id, User.username, User.section, Assessment.agent_type, Assessment.lesson_id,
+               Assessment.accuracy, Assessment.xp_earned, Assessment.created_at)
+        .join(Assessment, Assessment.user_id == User.id)
+        .where(User.role == "student")
+        .order_by(User.section, User.username, Assessment.created_at)
+    )
+    return query.where(User.section == section) if section else query
+
+
+REPORTS = {
+    "students": (
+        ["student_id", "username", "section", "level", "xp", "reading_score", "math_score",
+         "comprehension_score", "vocabulary_score", "assessments", "average_accuracy"],
+        _student_report,
+    ),
+    "assessments": (
+        ["student_id", "username", "section", "type", "lesson_id", "accuracy", "xp_earned", "created_at"],
+        _assessment_report,
+    ),
+}
+
+
+def _format(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.1f}"
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value  # Names are user input; keep spreadsheets from running them as formulas
+    return str(value)
+
+
+async def stream_report(report: str, section: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    CSV text for a class report, produced as rows arrive from a server-side
+    cursor. Uses its own session because the response outlives the request.
+    """
+    header, build = REPORTS[report]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(build(section).execution_options(yield_per=EXPORT_CHUNK_ROWS))
+        async for rows in result.partitions():
+            writer.writerows([_format(v) for v in row] for row in rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,339 @@
+# Shared State - Cross-worker key/value state with read-through caching
+#
+# Module globals are per-process, so with several uvicorn/gunicorn workers
+# each one would see its own reward config and uploaded content. State that
+# must agree across workers lives here instead: values are stored in a
+# backend (the database by default, or any Redis-compatible server when
+# SHARED_STATE_URL=redis://...), cached per namespace in-process, and
+# invalidated when another worker bumps the namespace version.
+#
+# Leases make sure a job runs in one worker at a time: acquire() succeeds
+# for one owner until it releases the lease or lets it expire, and the
+# owner renews it by acquiring again. Events are broadcast to every worker
+# (Redis pub/sub, or an events table polled with the versions, re-reading a
+# short window so events that commit out of id order are not skipped).
+import asyncio
+import json
+import os
+import socket
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.database import AsyncSessionLocal
+from app.models import SharedEvent, SharedLease, SharedStateEntry, SharedStateVersion
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+EVENT_RETENTION_SECONDS = 60  # Database backend: how long broadcast rows are kept for slow pollers
+# Database backend: ids are assigned at insert but become visible at commit,
+# so a lower id can appear after a higher one. Pollers re-read events written
+# within this window and skip the ids they already delivered.
+EVENT_GRACE_SECONDS = 10
+
+EventCallback = Callable[[str, Any], Awaitable[None]]
+
+
+class DatabaseStateBackend:
+    """Shared state in the app database; changes are found by polling versions"""
+
+    async def load(self, namespace: str) -> Tuple[int, Dict[str, Any]]:
+        async with AsyncSessionLocal() as db:
+            version = await db.scalar(
+                select(SharedStateVersion.version).where(SharedStateVersion.namespace == namespace)
+            )
+            result = await db.execute(
+                select(SharedStateEntry.key, SharedStateEntry.value).where(SharedStateEntry.namespace == namespace)
+            )
+            return version or 0, {key: value for key, value in result}
+
+    async def versions(self) -> Dict[str, int]:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(SharedStateVersion.namespace, SharedStateVersion.version))
+            return {namespace: version for namespace, version in result}
+
+    async def _bump(self, db, namespace: str):
+        result = await db.execute(
+            update(SharedStateVersion)
+            .where(SharedStateVersion.namespace == namespace)
+            .values(version=SharedStateVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            db.add(SharedStateVersion(namespace=namespace, version=1))
+
+    async def put(self, namespace: str, key: str, value: Any):
+        for attempt in range(2):
+            async with AsyncSessionLocal() as db:
+                await db.merge(SharedStateEntry(namespace=namespace, key=key, value=value))
+                await self._bump(db, namespace)
+                try:
+                    await db.commit()
+                    return
+                except IntegrityError:
+                    # Another worker created the version row first; retry as an update
+                    await db.rollback()
+                    if attempt:
+                        raise
+
+    async def delete(self, namespace: str, key: str) -> bool:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(SharedStateEntry).where(SharedStateEntry.namespace == namespace, SharedStateEntry.key == key)
+            )
+            if result.rowcount:
+                await self._bump(db, namespace)
+            await db.commit()
+            return bool(result.rowcount)
+
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                update(SharedLease)
+                .where(SharedLease.name == name, or_(SharedLease.owner == owner, SharedLease.expires_at < now))
+                .values(owner=owner, expires_at=now + ttl)
+            )
+            if result.rowcount == 0:
+                db.add(SharedLease(name=name, owner=owner, expires_at=now + ttl))
+            try:
+                await db.commit()
+                return True
+            except IntegrityError:
+                await db.rollback()  # Held by another worker
+                return False
+
+    async def release(self, name: str, owner: str):
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(SharedLease).where(SharedLease.name == name, SharedLease.owner == owner))
+            await db.commit()
+
+    async def publish(self, channel: str, origin: str, payload: Any):
+        now = time.time()
+        async with AsyncSessionLocal() as db:
+            db.add(SharedEvent(channel=channel, origin=origin, payload=payload, created_at=now))
+            await db.execute(delete(SharedEvent).where(SharedEvent.created_at < now - EVENT_RETENTION_SECONDS))
+            await db.commit()
+
+    async def _events_since(self, last_id: int, since: float):
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(
+                select(SharedEvent.id, SharedEvent.channel, SharedEvent.origin, SharedEvent.payload,
+                       SharedEvent.created_at)
+                .where(or_(SharedEvent.id > last_id, SharedEvent.created_at >= since))
+                .order_by(SharedEvent.id)
+            )).all()
+
+    async def listen(
+        self, notify: Callable[[str], Awaitable[None]], known: Dict[str, int], interval: float, deliver: EventCallback
+    ):
+        """Poll the version and event tables; report changed namespaces and new events"""
+        started = time.time()
+        async with AsyncSessionLocal() as db:
+            last_event = await db.scalar(select(func.max(SharedEvent.id))) or 0
+        delivered: Dict[int, float] = {}  # Event id -> created_at, for ids inside the grace window
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                for namespace, version in (await self.versions()).items():
+                    if known.get(namespace) != version:
+                        await notify(namespace)
+                since = max(time.time() - EVENT_GRACE_SECONDS, started)
+                for event in await self._events_since(last_event, since):
+                    last_event = max(last_event, event.id)
+                    if event.id in delivered:
+                        continue
+                    delivered[event.id] = event.created_at
+                    if event.origin != WORKER_ID:
+                        await deliver(event.channel, event.payload)
+                # Ids older than the window are not read again
+                delivered = {event_id: at for event_id, at in delivered.items() if at >= since}
+            except Exception as e:
+                print(f"Shared state poll error: {e}")
+
+
+class RedisStateBackend:
+    """Shared state in Redis (or a compatible server); changes arrive via pub/sub"""
+
+    CHANNEL = "gyaan:state"
+    EVENTS = "gyaan:events"
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis  # Optional dependency, only needed for this backend
+        self.redis = redis.from_url(url, decode_responses=True)
+
+    async def load(self, namespace: str) -> Tuple[int, Dict[str, Any]]:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            version, values = await pipe.get(f"gyaan:{namespace}:version").hgetall(f"gyaan:{namespace}").execute()
+        return int(version or 0), {key: json.loads(value) for key, value in values.items()}
+
+    async def put(self, namespace: str, key: str, value: Any):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(f"gyaan:{namespace}", key, json.dumps(value))
+            pipe.incr(f"gyaan:{namespace}:version")
+            pipe.publish(self.CHANNEL, namespace)
+            await pipe.execute()
+
+    async def delete(self, namespace: str, key: str) -> bool:
+        removed = await self.redis.hdel(f"gyaan:{namespace}", key)
+        if removed:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.incr(f"gyaan:{namespace}:version")
+                pipe.publish(self.CHANNEL, namespace)
+                await pipe.execute()
+        return bool(removed)
+
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        key = f"gyaan:lease:{name}"
+        if await self.redis.set(key, owner, nx=True, px=int(ttl * 1000)):
+            return True
+        if await self.redis.get(key) == owner:
+            await self.redis.pexpire(key, int(ttl * 1000))
+            return True
+        return False
+
+    async def release(self, name: str, owner: str):
+        key = f"gyaan:lease:{name}"
+        if await self.redis.get(key) == owner:
+            await self.redis.delete(key)
+
+    async def publish(self, channel: str, origin: str, payload: Any):
+        await self.redis.publish(self.EVENTS, json.dumps({"channel": channel, "origin": origin, "payload": payload}))
+
+    async def listen(
+        self, notify: Callable[[str], Awaitable[None]], known: Dict[str, int], interval: float, deliver: EventCallback
+    ):
+        pubsub = self.redis.pubsub()
+        await pubsub.subscribe(self.CHANNEL, self.EVENTS)
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                if message["channel"] == self.CHANNEL:
+                    await notify(message["data"])
+                    continue
+                event = json.loads(message["data"])
+                if event["origin"] != WORKER_ID:
+                    await deliver(event["channel"], event["payload"])
+        finally:
+            await pubsub.close()
+
+
+class SharedNamespace:
+    """Dict-like async view of one namespace"""
+
+    def __init__(self, store: "SharedStateStore", name: str):
+        self.store = store
+        self.name = name
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        return (await self.store.snapshot(self.name)).get(key, default)
+
+    async def items(self) -> Dict[str, Any]:
+        return dict(await self.store.snapshot(self.name))
+
+    async def set(self, key: str, value: Any):
+        await self.store.put(self.name, key, value)
+
+    async def delete(self, key: str) -> bool:
+        return await self.store.delete(self.name, key)
+
+
+class SharedStateStore:
+    """
+    Read-through cache over a shared backend.
+
+    Reads are served from the in-process copy of a namespace; writes go to
+    the backend and then update the local copy. When another worker changes
+    a namespace the local copy is dropped and subscribers are notified.
+    """
+
+    def __init__(self, backend, poll_interval: float = 1.0):
+        self.backend = backend
+        self.poll_interval = poll_interval
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._versions: Dict[str, int] = {}
+        self._subscribers: Dict[str, List[Callable]] = defaultdict(list)
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._listeners: Dict[str, List[Callable[[Any], Awaitable[None]]]] = defaultdict(list)
+
+    def namespace(self, name: str) -> SharedNamespace:
+        return SharedNamespace(self, name)
+
+    def subscribe(self, namespace: str, callback: Callable[[], Awaitable[None]]):
+        """Register a coroutine to run whenever a namespace changes"""
+        self._subscribers[namespace].append(callback)
+
+    async def snapshot(self, namespace: str) -> Dict[str, Any]:
+        cached = self._cache.get(namespace)
+        if cached is not None:
+            return cached
+        async with self._locks[namespace]:
+            if namespace not in self._cache:
+                version, values = await self.backend.load(namespace)
+                self._cache[namespace] = values
+                self._versions[namespace] = version
+            return self._cache[namespace]
+
+    async def put(self, namespace: str, key: str, value: Any):
+        await self.backend.put(namespace, key, value)
+        await self._changed(namespace)
+
+    async def delete(self, namespace: str, key: str) -> bool:
+        removed = await self.backend.delete(namespace, key)
+        if removed:
+            await self._changed(namespace)
+        return removed
+
+    def on_event(self, channel: str, callback: Callable[[Any], Awaitable[None]]):
+        """Register a coroutine to receive every event published on a channel, by any worker"""
+        self._listeners[channel].append(callback)
+
+    async def publish(self, channel: str, payload: Any):
+        """Broadcast a JSON-serializable event to all workers (delivered here immediately)"""
+        await self._deliver(channel, payload)
+        await self.backend.publish(channel, WORKER_ID, payload)
+
+    async def _deliver(self, channel: str, payload: Any):
+        for callback in self._listeners.get(channel, ()):
+            try:
+                await callback(payload)
+            except Exception as e:
+                print(f"Shared event listener error ({channel}): {e}")
+
+    async def acquire(self, name: str, ttl: float = 60.0) -> bool:
+        """Claim a job for this worker (or renew the claim); False when another worker holds it"""
+        return await self.backend.acquire(name, WORKER_ID, ttl)
+
+    async def release(self, name: str):
+        await self.backend.release(name, WORKER_ID)
+
+    async def _changed(self, namespace: str):
+        """Drop the local copy, reload it and notify subscribers"""
+        self._cache.pop(namespace, None)
+        self._versions.pop(namespace, None)
+        await self.snapshot(namespace)
+        for callback in self._subscribers.get(namespace, ()):
+            try:
+                await callback()
+            except Exception as e:
+                print(f"Shared state subscriber error ({namespace}): {e}")
+
+    async def watch(self):
+        """Background task: follow changes made by other workers"""
+        await self.backend.listen(self._changed, self._versions, self.poll_interval, self._deliver)
+
+
+def _create_backend():
+    url = os.getenv("SHARED_STATE_URL", "")
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStateBackend(url)
+    return DatabaseStateBackend()
+
+
+shared_state = SharedStateStore(
+    _create_backend(),
+    poll_interval=float(os.getenv("SHARED_STATE_POLL_SECONDS", "1.0")),
+)
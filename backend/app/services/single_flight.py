@@ -0,0 +1,142 @@
+# Single Flight - Coalesce identical LLM requests that are in flight together
+#
+# When a class submits answers to the same projected passage at once, many
+# byte-identical prompts arrive within a second, before any result exists to
+# cache. The first caller for a request key (the leader) makes the provider
+# call. Callers arriving while it is in flight (followers) wait for it and
+# share its result or exception. Nothing is kept after the call finishes:
+# this only merges concurrent work, it is not a cache.
+#
+# Keys include the scheduler tenant (section), so calls are only merged
+# within one tenant and every section keeps its own fair share of the
+# provider; priority is not part of the key and followers wait at the
+# leader's priority.
+#
+# Cancellation: a waiter that goes away (an async caller whose request was
+# cancelled) only detaches itself, so the shared call keeps running for
+# everyone else. Once every waiter has gone, the call is abandoned if it is
+# still queued in the scheduler; a call already sent to the provider is left
+# to finish and its result dropped. Callers blocked in worker threads cannot
+# be interrupted and count as waiting until the result arrives.
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import re
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Tuple
+
+from app.services.llm_scheduler import CallCancelled, llm_scheduler
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def request_key(tenant: Any = None, **request: Any) -> str:
+    """Hash of a provider request and its tenant, ignoring whitespace differences in its text"""
+
+    def normalize(value):
+        if isinstance(value, str):
+            return _WHITESPACE.sub(" ", value).strip()
+        if isinstance(value, dict):
+            return {k: normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(v) for v in value]
+        return value
+
+    encoded = json.dumps(normalize({"tenant": tenant, "request": request}), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class _Flight:
+    __slots__ = ("future", "waiters")
+
+    def __init__(self):
+        self.future = concurrent.futures.Future()
+        self.future.set_running_or_notify_cancel()  # A waiter's cancellation must never cancel the shared call
+        self.waiters = 1
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._stats = defaultdict(int)
+        self._leaders = set()  # Running leader tasks (the loop keeps only weak references)
+
+    def _join(self, key: str) -> Tuple[_Flight, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self._stats["coalesced"] += 1
+                self._stats["peak_waiters"] = max(self._stats["peak_waiters"], flight.waiters)
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            self._stats["leaders"] += 1
+            return flight, True
+
+    def _abandon(self, key: str, flight: _Flight) -> bool:
+        """Polled by the scheduler while the call is queued: give up once nobody waits"""
+        with self._lock:
+            if flight.waiters > 0:
+                return False
+            if self._flights.get(key) is flight:
+                del self._flights[key]  # Later arrivals start a fresh call
+            self._stats["abandoned"] += 1
+            return True
+
+    def _run(self, key: str, flight: _Flight, fn: Callable[[Callable[[], bool]], Any]):
+        try:
+            result = fn(lambda: self._abandon(key, flight))
+        except Exception as e:
+            setter, value = flight.future.set_exception, e
+        else:
+            setter, value = flight.future.set_result, result
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]  # Callers arriving from now on make a new call
+            if setter == flight.future.set_exception and not isinstance(value, CallCancelled):
+                self._stats["errors"] += 1
+        setter(value)
+
+    def do(self, key: str, fn: Callable[[Callable[[], bool]], Any]) -> Any:
+        """
+        Blocking: run fn(abandoned) unless an identical call is already in
+        flight, and return (or raise) the shared outcome. fn should pass
+        abandoned to the scheduler as its cancelled check.
+        """
+        flight, leader = self._join(key)
+        if leader:
+            self._run(key, flight, fn)
+        return flight.future.result()
+
+    async def run(self, key: str, fn: Callable[[Callable[[], bool]], Any]) -> Any:
+        """Async form of do(): fn runs on the scheduler's threads; a cancelled caller only detaches"""
+        flight, leader = self._join(key)
+        if leader:
+            # Its own task, not this caller's, so followers still get the result if the caller is cancelled
+            task = asyncio.get_running_loop().create_task(llm_scheduler.run(self._run, key, flight, fn))
+            self._leaders.add(task)
+            task.add_done_callback(self._leaders.discard)
+        try:
+            return await asyncio.wrap_future(flight.future)
+        except asyncio.CancelledError:
+            with self._lock:
+                flight.waiters -= 1
+                self._stats["detached"] += 1
+            raise
+
+    def stats(self) -> dict:
+        """Leader calls, coalesced followers, detached waiters and abandoned calls"""
+        with self._lock:
+            leaders, coalesced = self._stats["leaders"], self._stats["coalesced"]
+            return {
+                **self._stats,
+                "in_flight": len(self._flights),
+                "coalesced_ratio": round(coalesced / (leaders + coalesced), 3) if leaders + coalesced else 0.0,
+            }
+
+
+# Shared instance for chat completions (agents and diagnosis routes)
+llm_flights = SingleFlight()
@@ -0,0 +1,130 @@
+# Speech - Pluggable speech-to-text backends for audio segments
+#
+# Live sessions send 16 kHz mono PCM16 and transcribe it in short
+# segments. Every backend takes float32 samples plus an optional prompt
+# (the passage text the student is expected to read next, which Whisper
+# uses as a vocabulary hint) and returns plain text.
+#
+# STT_BACKEND selects the backend: "groq" (Whisper via the Groq API),
+# "local" (faster-whisper on CPU in a warm process pool, see local_stt.py)
+# or "simulated" (a deterministic stand-in for demos and tests). By default
+# Groq is used when an API key is configured. The stand-in echoes the
+# passage, so it is only used when asked for by name and its results are
+# never recorded as assessments.
+import io
+import os
+import wave
+from typing import Optional
+
+import numpy as np
+
+from app.services.llm_scheduler import llm_scheduler, PRIORITY_DIAGNOSIS
+from app.services.providers import get_groq_client
+
+SAMPLE_RATE = 16000
+
+
+class SpeechNotConfigured(RuntimeError):
+    """No speech-to-text backend is configured for this deployment"""
+
+
+def pcm16_to_float(data: bytes) -> np.ndarray:
+    """Little-endian PCM16 bytes -> float32 samples in [-1, 1]"""
+    return np.frombuffer(data[: len(data) - len(data) % 2], dtype="<i2").astype(np.float32) / 32768.0
+
+
+def to_wav_bytes(samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes((np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes())
+    return buffer.getvalue()
+
+
+class GroqTranscriber:
+    """Whisper large-v3 through the Groq API (shares the provider scheduler)"""
+
+    name = "groq"
+    model = "whisper-large-v3"
+
+    def transcribe(self, samples: np.ndarray, language: str = "en", prompt: Optional[str] = None) -> str:
+        client = get_groq_client()
+        if client is None:
+            raise RuntimeError("GROQ_API_KEY is not configured")
+        audio = ("segment.wav", to_wav_bytes(samples))
+        result = llm_scheduler.call(
+            "groq",
+            lambda: client.audio.transcriptions.create(
+                model=self.model, file=audio, language=language, prompt=prompt or None, response_format="json"
+            ),
+            PRIORITY_DIAGNOSIS,
+        )
+        return result.text.strip()
+
+
+class SimulatedTranscriber:
+    """
+    Stand-in that "hears" the prompt read at a steady pace: returns as many
+    prompt words as fit in the segment at words_per_second. Silent segments
+    (RMS below the threshold) return nothing.
+    """
+
+    name = "simulated"
+    model = "simulated"
+
+    def __init__(self, words_per_second: float = 2.0, silence_rms: float = 0.01):
+        self.words_per_second = words_per_second
+        self.silence_rms = silence_rms
+
+    def transcribe(self, samples: np.ndarray, language: str = "en", prompt: Optional[str] = None) -> str:
+        if not prompt or not len(samples) or float(np.sqrt(np.mean(samples ** 2))) < self.silence_rms:
+            return ""
+        count = max(1, round(len(samples) / SAMPLE_RATE * self.words_per_second))
+        return " ".join(prompt.split()[:count])
+
+
+def _local_transcriber():
+    from app.services.local_stt import LocalWhisperTranscriber
+    return LocalWhisperTranscriber(
+        model_size=os.getenv("STT_MODEL", "base"),
+        workers=int(os.getenv("STT_WORKERS", "1")),
+        cpu_threads=int(os.getenv("STT_CPU_THREADS", "0")),
+        compute_type=os.getenv("STT_COMPUTE_TYPE", "int8"),
+        batch_size=int(os.getenv("STT_BATCH_SIZE", "4")),
+        queue_size=int(os.getenv("STT_QUEUE_SIZE", "32")),
+    )
+
+
+_BACKENDS = {
+    "groq": GroqTranscriber,
+    "local": _local_transcriber,
+    "simulated": SimulatedTranscriber,
+}
+_transcriber = None
+
+
+def get_transcriber():
+    """Deployment-wide transcriber chosen by STT_BACKEND (created once)"""
+    global _transcriber
+    if _transcriber is None:
+        name = os.getenv("STT_BACKEND", "").lower() or ("groq" if os.getenv("GROQ_API_KEY") else "")
+        if not name:
+            raise SpeechNotConfigured(
+                "No speech-to-text backend: set GROQ_API_KEY or STT_BACKEND=local (STT_BACKEND=simulated for demos)"
+            )
+        if name not in _BACKENDS:
+            raise ValueError(f"Unknown STT_BACKEND: {name} (choose from {', '.join(_BACKENDS)})")
+        _transcriber = _BACKENDS[name]()
+    return _transcriber
+
+
+def warm_transcriber():
+    """Load local models at startup (run off the event loop)"""
+    try:
+        transcriber = get_transcriber()
+        if hasattr(transcriber, "start"):
+            transcriber.start()
+    except Exception as e:
+        print(f"Transcriber warmup error: {e}")
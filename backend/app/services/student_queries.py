@@ -0,0 +1,287 @@
+# Student Queries - Paginated, filtered student listings for teacher views
+#
+# Listings use keyset (cursor) pagination: the cursor holds the sort value
+# and id of the last row, and the next page starts strictly after it. Each
+# page costs the same no matter how deep it is, unlike OFFSET which
+# rescans every skipped row. Only the requested fields are selected.
+# Sorts use plain columns so an index can serve them: xp and level are
+# read from progress (inner join, tie-broken on progress.user_id to match
+# its index). A NULL sort value ranks above every other value (last when
+# ascending, first when descending), the order a B-tree index returns it
+# in on PostgreSQL.
+#
+# The dashboard reads the class from the same tables in one statement.
+#
+# The teacher's student detail view is assembled from one statement (user,
+# progress and the newest assessments via a window function) and cached
+# briefly per student; a new assessment drops that student's entry.
+import base64
+import json
+import os
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Assessment, Progress, User
+from app.services.assessment_events import on_assessment
+
+# Public field name -> column
+FIELDS = {
+    "id": User.id,
+    "username": User.username,
+    "section": User.section,
+    "approved": User.is_approved,
+    "createdAt": User.created_at,
+    "xp": func.coalesce(Progress.xp, 0),
+    "level": func.coalesce(Progress.level, 0),
+    "readingScore": Progress.reading_score,
+    "mathScore": Progress.math_score,
+    "comprehensionScore": Progress.comprehension_score,
+    "vocabularyScore": Progress.vocabulary_score,
+}
+PROGRESS_FIELDS = {"xp", "level", "readingScore", "mathScore", "comprehensionScore", "vocabularyScore"}
+
+# Sort name -> (column, tiebreak); the tiebreak is the student id
+SORTS = {
+    "username": (User.username, User.id),
+    "createdAt": (User.created_at, User.id),
+    "xp": (Progress.xp, Progress.user_id),
+    "level": (Progress.level, Progress.user_id),
+}
+
+# Skill filter name -> column; values are inclusive (min, max) ranges
+SCORE_FILTERS = {
+    "reading": Progress.reading_score,
+    "math": Progress.math_score,
+    "comprehension": Progress.comprehension_score,
+    "vocabulary": Progress.vocabulary_score,
+}
+
+
+class InvalidQuery(ValueError):
+    """Bad field, sort or cursor in a listing request"""
+
+
+def encode_cursor(sort: str, value, student_id: str) -> str:
+    if hasattr(value, "isoformat"):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, student_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple[object, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, student_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidQuery("Malformed cursor")
+    if cursor_sort != sort:
+        raise InvalidQuery("Cursor was issued for a different sort")
+    if sort == "createdAt" and value is not None:
+        value = datetime.fromisoformat(value)
+    return value, student_id
+
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    if not fields:
+        return list(FIELDS)
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in FIELDS]
+    if unknown:
+        raise InvalidQuery(f"Unknown fields: {', '.join(unknown)}")
+    return selected if "id" in selected else ["id"] + selected
+
+
+async def list_students(
+    db: AsyncSession,
+    section: Optional[str] = None,
+    approved: Optional[bool] = None,
+    min_level: Optional[int] = None,
+    max_level: Optional[int] = None,
+    score_ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+    sort: str = "username",
+    descending: bool = False,
+    fields: Sequence[str] = tuple(FIELDS),
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> dict:
+    """
+    One page of students plus the cursor for the next page (None at the
+    end). Sorting by xp or level lists students that have a progress row.
+    """
+    if sort not in SORTS:
+        raise InvalidQuery(f"Unknown sort: {sort}")
+    sort_column, tiebreak = SORTS[sort]
+
+    query = select(*(FIELDS[f].label(f) for f in fields), sort_column.label("_sort"))
+    query = query.select_from(User).where(User.role == "student")
+    if sort in PROGRESS_FIELDS:
+        query = query.join(Progress, Progress.user_id == User.id)
+    elif PROGRESS_FIELDS.intersection(fields) or min_level is not None or max_level is not None or score_ranges:
+        query = query.outerjoin(Progress, Progress.user_id == User.id)
+
+    if section is not None:
+        query = query.where(User.section == section)
+    if approved is not None:
+        query = query.where(User.is_approved == approved)
+    if min_level is not None:
+        query = query.where(Progress.level >= min_level)
+    if max_level is not None:
+        query = query.where(Progress.level <= max_level)
+    for skill, (low, high) in (score_ranges or {}).items():
+        if low is not None:
+            query = query.where(SCORE_FILTERS[skill] >= low)
+        if high is not None:
+            query = query.where(SCORE_FILTERS[skill] <= high)
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        past_id = tiebreak < last_id if descending else tiebreak > last_id
+        if descending:
+            query = query.where(
+                or_(sort_column.isnot(None), and_(sort_column.is_(None), past_id)) if value is None
+                else or_(sort_column < value, and_(sort_column == value, past_id))
+            )
+        else:
+            query = query.where(
+                and_(sort_column.is_(None), past_id) if value is None
+                else or_(sort_column > value, and_(sort_column == value, past_id), sort_column.is_(None))
+            )
+
+    if descending:
+        order = (sort_column.desc().nulls_first(), tiebreak.desc())
+    else:
+        order = (sort_column.asc().nulls_last(), tiebreak.asc())
+    rows = (await db.execute(query.order_by(*order).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(sort, rows[-1]._sort, rows[-1].id)
+    return {
+        "students": [{f: getattr(row, f) for f in fields} for row in rows],
+        "nextCursor": next_cursor,
+    }
+
+
+async def class_overview(db: AsyncSession, section: Optional[str] = None, limit: int = 50) -> Tuple[List[dict], dict]:
+    """
+    Dashboard rows for the top `limit` students by XP, plus class totals
+    over every student in the section, from one statement
+    """
+    query = (
+        select(User.id, User.username, Progress.xp, Progress.level, Progress.rage_progress,
+               Progress.lessons_completed)
+        .outerjoin(Progress, Progress.user_id == User.id)
+        .where(User.role == "student")
+        .order_by(func.coalesce(Progress.xp, 0).desc(), User.id)
+    )
+    if section is not None:
+        query = query.where(User.section == section)
+    rows = (await db.execute(query)).all()
+
+    students = [
+        {
+            "id": row.id,
+            "username": row.username,
+            "level": row.level or 0,
+            "xp": row.xp or 0,
+            "rageProgress": row.rage_progress or 0,
+            "conceptsMastered": len(row.lessons_completed or []),
+        }
+        for row in rows
+    ]
+    stats = {
+        "totalStudents": len(students),
+        "averageXP": sum(s["xp"] for s in students) // len(students) if students else 0,
+        "totalMastered": sum(s["conceptsMastered"] for s in students),
+    }
+    return students[:limit], stats
+
+
+RECENT_DIAGNOSES = 5
+
+
+async def fetch_student_detail(db: AsyncSession, student_id: str, recent: int = RECENT_DIAGNOSES) -> Optional[dict]:
+    """
+    User, progress, newest assessments and recurring gaps in one round trip:
+    users LEFT JOIN progress LEFT JOIN (assessments ranked per student by
+    row_number() and cut at `recent`). Returns None for unknown students.
+    """
+    position = func.row_number().over(
+        partition_by=Assessment.user_id, order_by=(Assessment.created_at.desc(), Assessment.id.desc())
+    ).label("position")
+    ranked = (
+        select(Assessment.user_id, Assessment.agent_type, Assessment.created_at, Assessment.accuracy,
+               Assessment.gaps_found, position)
+        .where(Assessment.user_id == student_id)
+        .subquery()
+    )
+    rows = (await db.execute(
+        select(User.id, User.username, User.section, Progress.xp, Progress.level, Progress.lessons_completed,
+               ranked.c.agent_type, ranked.c.created_at, ranked.c.accuracy, ranked.c.gaps_found)
+        .outerjoin(Progress, Progress.user_id == User.id)
+        .outerjoin(ranked, and_(ranked.c.user_id == User.id, ranked.c.position <= recent))
+        .where(User.id == student_id)
+        .order_by(ranked.c.position)
+    )).all()
+    if not rows:
+        return None
+
+    first = rows[0]
+    diagnoses = [row for row in rows if row.agent_type is not None]
+    gaps = Counter(gap for row in diagnoses for gap in (row.gaps_found or []))
+    return {
+        "id": first.id,
+        "username": first.username,
+        "section": first.section,
+        "level": first.level or 0,
+        "xp": first.xp or 0,
+        "conceptsMastered": list(first.lessons_completed or []),
+        "recentDiagnoses": [
+            {
+                "type": row.agent_type,
+                "date": row.created_at.date().isoformat() if row.created_at else None,
+                "accuracy": row.accuracy,
+            }
+            for row in diagnoses
+        ],
+        "gapsIdentified": [gap for gap, _ in gaps.most_common()],
+    }
+
+
+class StudentDetailCache:
+    """Short-TTL LRU of assembled detail views, keyed by student id"""
+
+    def __init__(self, ttl: float = 30, capacity: int = 1000):
+        self.ttl = ttl
+        self.capacity = capacity
+        self._entries: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+    def get(self, student_id: str) -> Optional[dict]:
+        entry = self._entries.get(student_id)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        self._entries.move_to_end(student_id)
+        return entry[1]
+
+    def put(self, student_id: str, detail: dict):
+        self._entries[student_id] = (time.monotonic(), detail)
+        self._entries.move_to_end(student_id)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, student_id: str):
+        self._entries.pop(student_id, None)
+
+
+student_detail_cache = StudentDetailCache(ttl=float(os.getenv("STUDENT_DETAIL_TTL_SECONDS", "30")))
+
+
+@on_assessment
+async def invalidate_student_detail(db: AsyncSession, assessment: Assessment):
+    student_detail_cache.invalidate(assessment.user_id)
@@ -0,0 +1,65 @@
+# Transcription Cache - Reuse transcripts of byte-identical recordings
+#
+# Keys combine the SHA-256 of the audio with the engine, model and language
+# that produced the text, so switching models never serves stale results.
+# A bounded LRU in memory sits in front of a table that survives restarts
+# and is shared by all workers.
+import os
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import TranscriptionCacheEntry
+
+
+class TranscriptionCache:
+    def __init__(self, capacity: int = 2000):
+        self.capacity = capacity
+        self._hot: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def key(sha256: str, engine: str, model: str, language: Optional[str] = None) -> str:
+        return f"{sha256}:{engine}:{model}:{language or 'auto'}"
+
+    def _remember(self, key: str, value: dict):
+        self._hot[key] = value
+        self._hot.move_to_end(key)
+        while len(self._hot) > self.capacity:
+            self._hot.popitem(last=False)
+
+    async def get(self, db: AsyncSession, key: str) -> Optional[dict]:
+        value = self._hot.get(key)
+        if value is None:
+            entry = await db.get(TranscriptionCacheEntry, key)
+            if entry is not None:
+                value = {"text": entry.text, "confidence": entry.confidence, "duration": entry.duration}
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._remember(key, value)
+        return value
+
+    async def put(self, db: AsyncSession, key: str, text: str, confidence: float, duration: float):
+        value = {"text": text, "confidence": confidence, "duration": duration}
+        self._remember(key, value)
+        db.add(TranscriptionCacheEntry(key=key, **value))
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()  # Another request stored the same recording first
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / total, 3) if total else 0.0,
+            "hotEntries": len(self._hot),
+        }
+
+
+transcription_cache = TranscriptionCache(capacity=int(os.getenv("TRANSCRIPTION_CACHE_CAPACITY", "2000")))
@@ -0,0 +1,148 @@
+# Vocabulary Scoring - Deterministic word-knowledge checks against the lexicon
+#
+# For every target word the student's explanation is tokenized and looked
+# up in the lexicon, then judged:
+#   correct    uses a synonym, enough of the definition's content words, or
+#              a negated antonym ("big means not small")
+#   incorrect  explains the word with an antonym ("big means small") or
+#              gives no explanation at all
+#   ambiguous  only uses the word itself, explains it in words the lexicon
+#              cannot connect, or the word is not in the lexicon
+# Only ambiguous checks need an LLM; the rest are scored locally.
+import re
+from typing import Dict, Iterable, List, Optional, Union
+
+from app.services.lexicon import Lexicon, get_lexicon
+
+_TOKEN = re.compile(r"[\w\u0900-\u097F\u0D00-\u0D7F']+")  # Keep Devanagari/Malayalam vowel signs in words
+
+NEGATIONS = {
+    "english": {"not", "no", "never", "opposite", "isn't", "isnt", "don't", "doesn't", "without", "unlike"},
+    "hindi": {"नहीं", "न", "उल्टा", "विपरीत"},
+    "malayalam": {"അല്ല", "ഇല്ല", "വിപരീതം"},
+}
+STOPWORDS = {
+    "english": {
+        "the", "and", "for", "with", "that", "this", "are", "was", "you", "your", "something", "someone",
+        "very", "its", "it's", "has", "have", "means", "mean", "like", "when", "from", "can", "about", "lot",
+    },
+}
+NEGATION_WINDOW = 3
+NEGATION_FOLLOWS = {"hindi", "malayalam"}  # Verb-final: "छोटा नहीं" ("not small")
+
+RECOMMENDATIONS = {
+    "meaning": "Practice each new word with a picture and a simple meaning",
+    "antonym": "Sort word cards into 'same meaning' and 'opposite meaning' piles",
+    "usage": "Say one new sentence using each new word",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall((text or "").lower())
+
+
+def _targets(words: Union[str, Iterable[str]]) -> List[str]:
+    if isinstance(words, str):
+        words = re.split(r"[,;\n]+|\s+", words)
+    seen = []
+    for word in words:
+        word = word.strip().lower()
+        if word and word not in seen:
+            seen.append(word)
+    return seen
+
+
+def score_vocabulary(
+    target_words: Union[str, Iterable[str]],
+    transcript: str,
+    language: str = "english",
+    lexicon: Optional[Lexicon] = None,
+) -> dict:
+    """Per-word verdicts plus accuracy, concepts, gaps and recommendations"""
+    lexicon = lexicon or get_lexicon()
+    language = (language or "english").lower()
+    tokens = tokenize(transcript)
+    indices = [lexicon.index_of(token, language) for token in tokens]
+    negations = NEGATIONS.get(language, set())
+    stopwords = STOPWORDS.get(language, set())
+    content = {t for t in tokens if len(t) > 2 and t not in stopwords}
+
+    verdicts: Dict[str, str] = {}
+    evidence = {"synonym": False, "definition": False, "antonym": False, "confused": False, "usage": False, "family": False}
+    for target in _targets(target_words):
+        i = lexicon.index_of(target, language)
+        if i is None:
+            verdicts[target] = "ambiguous"
+            continue
+        related = lexicon.related(i)
+
+        own = related["family"] | {i}
+        used = [p for p, j in enumerate(indices) if j is not None and j in own]
+        synonym = any(j in related["synonyms"] for j in indices if j is not None)
+        definition_words = {w for w in tokenize(lexicon.definition(i)) if len(w) > 2 and w not in stopwords}
+        overlap = len(definition_words & content)
+        defined = bool(definition_words) and overlap >= min(2, len(definition_words))
+        antonyms = [p for p, j in enumerate(indices) if j is not None and j in related["antonyms"]]
+        after = NEGATION_WINDOW + 1 if language in NEGATION_FOLLOWS else 0
+        negated = [p for p in antonyms if negations & set(tokens[max(0, p - NEGATION_WINDOW):p + after])]
+
+        if used:
+            evidence["usage"] = True
+            evidence["family"] |= any(tokens[p] != target for p in used)
+        if synonym or defined or negated:
+            verdicts[target] = "correct"
+            evidence["synonym"] |= synonym
+            evidence["definition"] |= defined
+            evidence["antonym"] |= bool(negated)
+        elif antonyms:
+            verdicts[target] = "incorrect"
+            evidence["confused"] = True
+        elif len(content - {target}) < 2 and not used:
+            verdicts[target] = "incorrect"
+        else:
+            verdicts[target] = "ambiguous"
+
+    counts = {status: list(verdicts.values()).count(status) for status in ("correct", "incorrect", "ambiguous")}
+    accuracy = round(100 * (counts["correct"] + 0.5 * counts["ambiguous"]) / len(verdicts)) if verdicts else 0
+
+    concepts = []
+    if evidence["synonym"] or evidence["definition"]:
+        concepts.append("Word Meaning")
+    if evidence["synonym"]:
+        concepts.append("Synonyms")
+    if evidence["antonym"]:
+        concepts.append("Antonyms")
+    if evidence["usage"]:
+        concepts.append("Word Usage")
+    if evidence["family"]:
+        concepts.append("Word Families")
+
+    gaps, recommendations = [], []
+    missed = [word for word, status in verdicts.items() if status == "incorrect"]
+    if missed:
+        gaps += [f"Meaning of '{word}'" for word in missed]
+        recommendations.append(RECOMMENDATIONS["meaning"])
+    if evidence["confused"]:
+        gaps.append("Telling synonyms from antonyms")
+        recommendations.append(RECOMMENDATIONS["antonym"])
+    if verdicts and not evidence["usage"]:
+        gaps.append("Using new words in sentences")
+        recommendations.append(RECOMMENDATIONS["usage"])
+
+    if not verdicts:
+        analysis = "No target words to check."
+    elif counts["correct"] == len(verdicts):
+        analysis = "Student explained every word correctly."
+    else:
+        analysis = f"Student explained {counts['correct']} of {len(verdicts)} words correctly."
+        if missed:
+            analysis += f" Needs help with: {', '.join(missed)}."
+    return {
+        "analysis": analysis,
+        "concepts": concepts or ["Vocabulary Practice"],
+        "gaps": gaps,
+        "recommendations": recommendations or ["Keep learning new words every day"],
+        "accuracy": accuracy,
+        "words": verdicts,
+        "ambiguous": [word for word, status in verdicts.items() if status == "ambiguous"],
+    }
@@ -0,0 +1,69 @@
+# XP Events - Award XP atomically and fan the change out to incremental indexes
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Progress
+
+XP_PER_LEVEL = 200  # Same rule as ProgressAgent.calculate_level
+
+# (student_id, previous_xp, new_xp)
+XPChange = Tuple[str, int, int]
+# listener(db, changes): one call per award, or per batch of a bulk write
+XPListener = Callable[[AsyncSession, List[XPChange]], Awaitable[None]]
+
+_listeners: List[XPListener] = []
+
+
+def on_xp(listener: XPListener) -> XPListener:
+    """Register a coroutine called with every XP change or batch of changes (usable as a decorator)"""
+    _listeners.append(listener)
+    return listener
+
+
+async def notify_xp(db: AsyncSession, changes: List[XPChange]):
+    """Tell listeners about XP changes; bulk writers (roster import) pass a whole batch at once"""
+    if not changes:
+        return
+    for listener in _listeners:
+        try:
+            await listener(db, changes)
+        except Exception as e:
+            print(f"XP listener error ({getattr(listener, '__name__', listener)}): {e}")
+
+
+async def award_xp(db: AsyncSession, student_id: str, amount: int) -> Optional[Progress]:
+    """
+    Add XP with a single UPDATE (safe under concurrent awards), keep the
+    level and rage meter in step and notify listeners (leaderboard, rewards).
+    """
+    new_xp = func.coalesce(Progress.xp, 0) + amount
+    # RETURNING gives the value this UPDATE wrote, so previous_xp is exact
+    # even when other awards for the same student commit in between
+    awarded = await db.scalar(
+        update(Progress)
+        .where(Progress.user_id == student_id)
+        .values(
+            xp=new_xp,
+            level=new_xp // XP_PER_LEVEL,
+            rage_progress=func.coalesce(Progress.rage_progress, 0) + amount,
+        )
+        .returning(Progress.xp)
+        .execution_options(synchronize_session=False)
+    )
+    if awarded is None:
+        awarded = amount
+        db.add(Progress(
+            user_id=student_id, xp=amount, level=amount // XP_PER_LEVEL, rage_progress=amount, lessons_completed=[]
+        ))
+    await db.commit()
+
+    progress = await db.scalar(
+        select(Progress).where(Progress.user_id == student_id).execution_options(populate_existing=True)
+    )
+    if progress is None:
+        return None
+
+    await notify_xp(db, [(student_id, awarded - amount, awarded)])
+    return progress
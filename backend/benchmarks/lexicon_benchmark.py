@@ -0,0 +1,81 @@
+# Lexicon Benchmark - Lookup throughput of the memory-mapped lexicon
+#
+# Usage (from backend/):
+#   python benchmarks/lexicon_benchmark.py [--synthetic 200000] [--lookups 200000]
+#
+# Compiles the bundled lexicon (plus, optionally, that many synthetic
+# headwords to show how lookups scale) into a temp file, then reports
+# compile time, file size, open time, lookups per second for exact hits,
+# inflected forms and misses, and full vocabulary checks per second.
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.lexicon import SOURCE_PATH, Lexicon, compile_lexicon  # noqa: E402
+from app.services.vocabulary_scoring import score_vocabulary  # noqa: E402
+
+
+def rate(fn, items) -> float:
+    started = time.perf_counter()
+    for item in items:
+        fn(item)
+    return len(items) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--synthetic", type=int, default=0, help="Extra generated headwords")
+    parser.add_argument("--lookups", type=int, default=100000)
+    args = parser.parse_args()
+
+    with open(SOURCE_PATH, encoding="utf-8") as f:
+        source = json.load(f)
+    rng = random.Random(0)
+    for n in range(args.synthetic):
+        source["english"][f"word{n}"] = {
+            "definition": f"synthetic entry number {n}",
+            "synonyms": [f"word{rng.randrange(args.synthetic)}"],
+            "antonyms": [f"word{rng.randrange(args.synthetic)}"],
+            "family": [f"word{n}ed", f"word{n}ing"],
+        }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        source_path = os.path.join(workdir, "lexicon.json")
+        with open(source_path, "w", encoding="utf-8") as f:
+            json.dump(source, f, ensure_ascii=False)
+        target = os.path.join(workdir, "lexicon.bin")
+
+        started = time.perf_counter()
+        counts = compile_lexicon(source_path, target)
+        print(f"Compiled {counts['words']:,} words / {counts['links']:,} links into "
+              f"{counts['bytes'] / 1024:,.1f} KB in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        lexicon = Lexicon(target)
+        print(f"Opened (mmap) in {(time.perf_counter() - started) * 1000:.2f} ms")
+
+        english = list(source["english"])
+        hits = [rng.choice(english) for _ in range(args.lookups)]
+        inflected = [rng.choice(["happiest", "bigger", "giggled", "slowly", "cleaning"]) for _ in range(args.lookups)]
+        misses = [f"zz{rng.randrange(10 ** 6)}" for _ in range(args.lookups)]
+        print(f"Exact lookups:     {rate(lambda w: lexicon.lookup(w), hits):12,.0f}/s")
+        print(f"Index-only hits:   {rate(lambda w: lexicon.index_of(w), hits):12,.0f}/s")
+        print(f"Inflected lookups: {rate(lambda w: lexicon.index_of(w), inflected):12,.0f}/s")
+        print(f"Misses:            {rate(lambda w: lexicon.index_of(w), misses):12,.0f}/s")
+
+        responses = [
+            ("happy, enormous", "Happy means glad and joyful. Enormous is not tiny, it is huge."),
+            ("brave", "Brave means scared"),
+            ("curious", "A curious child wants to learn about new things"),
+        ] * max(1, args.lookups // 300)
+        print(f"Vocabulary checks: {rate(lambda r: score_vocabulary(r[0], r[1], lexicon=lexicon), responses):12,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
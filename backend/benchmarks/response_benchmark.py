@@ -0,0 +1,87 @@
+# Response Benchmark - JSON serialization time and bytes on the wire
+#
+# Usage (from backend/):
+#   python benchmarks/response_benchmark.py [--students 30 200 1000] [--repeat 200]
+#
+# Builds teacher dashboard payloads (student summaries plus at-risk entries)
+# and renders them the way FastAPI does after response_model validation,
+# once with the stdlib-json JSONResponse and once with ORJSONResponse (the
+# app default). Then reports the body size uncompressed, gzipped and
+# brotli-compressed (when the optional brotli package is installed) with
+# the CompressionMiddleware settings, and the time compression adds.
+import argparse
+import os
+import random
+import sys
+import time
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.routes.teacher import AtRiskStudent, DashboardResponse, StudentSummary  # noqa: E402
+from app.services.http_encoding import CompressionMiddleware, brotli  # noqa: E402
+
+NAMES = ["Rahul", "Priya", "Amit", "Sneha", "Arjun", "Kavya", "Rohan", "Ananya", "Vikram", "Isha"]
+GAPS = ["phonics", "fractions", "inference", "sight_words", "place_value", "main_idea"]
+
+
+def dashboard(students: int) -> dict:
+    rng = random.Random(students)
+    summaries = [
+        StudentSummary(
+            id=f"student-{i:05d}", username=f"{rng.choice(NAMES)} {i}", level=rng.randint(1, 12),
+            xp=rng.randint(0, 2400), rageProgress=rng.randint(0, 499), conceptsMastered=rng.randint(0, 40),
+        )
+        for i in range(students)
+    ]
+    at_risk = [
+        AtRiskStudent(
+            id=s.id, username=s.username, riskScore=round(rng.random(), 3),
+            accuracyDecline=round(rng.uniform(0, 40), 1), recentAccuracy=round(rng.uniform(20, 90), 1),
+            recentXP=rng.randint(0, 300), repeatedGaps=rng.sample(GAPS, 2),
+        )
+        for s in summaries[: max(5, students // 10)]
+    ]
+    model = DashboardResponse(
+        students=summaries,
+        classStats={"totalStudents": students, "averageXP": 1200, "totalMastered": 20 * students, "rageReady": 3},
+        atRisk=at_risk,
+    )
+    return model.model_dump(mode="json")  # What FastAPI hands to the response class
+
+
+def per_call(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, nargs="+", default=[30, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    compressor = CompressionMiddleware(None)
+    encodings = ["gzip"] + (["br"] if brotli is not None else [])
+    if brotli is None:
+        print("brotli not installed; reporting gzip only")
+
+    for students in args.students:
+        content = dashboard(students)
+        body = ORJSONResponse(content).body
+        print(f"\nDashboard with {students} students")
+        for name, cls in (("json", JSONResponse), ("orjson", ORJSONResponse)):
+            print(f"  {name:<7} render {per_call(lambda: cls(content).body, args.repeat):8.1f} us")
+        print(f"  identity {len(body):9,d} bytes")
+        for encoding in encodings:
+            compressed = compressor.compress(body, encoding)
+            micros = per_call(lambda: compressor.compress(body, encoding), max(1, args.repeat // 4))
+            print(f"  {encoding:<8} {len(compressed):9,d} bytes ({len(compressed) / len(body):5.1%}), "
+                  f"+{micros:8.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Startup Profile - How long a worker takes to import the app
+#
+# Usage (from backend/):
+#   python benchmarks/startup_profile.py [--top 15] [--runs 3]
+#
+# Runs `python -X importtime -c "import app.main"` in a fresh interpreter,
+# reports the slowest modules by cumulative import time, and checks that no
+# provider SDK (openai, groq, google.generativeai) is imported eagerly.
+# Finally times the provider warmup that the lifespan task runs off-thread.
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROVIDER_SDKS = ("openai", "groq", "google.generativeai")
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def profile_imports():
+    """Return [(module, self_us, cumulative_us, depth)] for import app.main"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def wall_clock(runs: int) -> float:
+    """Median wall-clock seconds for a cold `import app.main`"""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import app.main"], cwd=BACKEND_DIR, capture_output=True)
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2]
+
+
+def warmup_time() -> str:
+    code = (
+        "from app.services.providers import warmup, warmup_status;"
+        "warmup(); print(warmup_status())"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True)
+    return result.stdout.strip() or result.stderr.strip().splitlines()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    rows = profile_imports()
+    top_level = [r for r in rows if r[3] == 0]
+    total_us = sum(r[2] for r in top_level)
+
+    print(f"Total import time (importtime): {total_us / 1e6:.3f}s across {len(rows)} modules")
+    print(f"Median wall clock ({args.runs} runs): {wall_clock(args.runs):.3f}s\n")
+
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for module, self_us, cumulative_us, depth in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {'  ' * depth}{module}")
+
+    eager = sorted({m for m, *_ in rows if m.startswith(PROVIDER_SDKS)})
+    print("\nProvider SDKs imported at startup:", ", ".join(eager[:5]) if eager else "none")
+    print("Provider warmup (lifespan task):", warmup_time())
+
+
+if __name__ == "__main__":
+    main()
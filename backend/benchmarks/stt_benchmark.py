@@ -0,0 +1,83 @@
+# STT Benchmark - Real-time factor of the configured speech-to-text backend
+#
+# Usage (from backend/):
+#   STT_BACKEND=local STT_MODEL=base python benchmarks/stt_benchmark.py \
+#       [--audio reading.wav] [--seconds 10] [--requests 8] [--concurrency 4]
+#
+# Sends the same clip (a 16 kHz mono WAV, or synthetic audio when no file is
+# given) through get_transcriber() from several threads and reports model
+# load time, per-request latency and real-time factor (processing seconds
+# per second of audio; below 1.0 is faster than real time), plus how many
+# requests were turned away by queue backpressure.
+import argparse
+import os
+import sys
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.local_stt import TranscriberBusy  # noqa: E402
+from app.services.speech import SAMPLE_RATE, get_transcriber  # noqa: E402
+
+
+def load_audio(path: str, seconds: float) -> np.ndarray:
+    if path:
+        with wave.open(path, "rb") as wav:
+            if wav.getframerate() != SAMPLE_RATE or wav.getnchannels() != 1 or wav.getsampwidth() != 2:
+                sys.exit("Expected a 16 kHz mono 16-bit WAV file")
+            return np.frombuffer(wav.readframes(wav.getnframes()), dtype="<i2").astype(np.float32) / 32768.0
+    # Speech-like synthetic signal: voiced bursts separated by pauses
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    envelope = (np.sin(2 * np.pi * 1.5 * t) > -0.3).astype(np.float32)
+    return (0.2 * envelope * np.sin(2 * np.pi * 180 * t) * (1 + 0.5 * np.sin(2 * np.pi * 5 * t))).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--audio", default="", help="16 kHz mono WAV file")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Synthetic clip length")
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--language", default="en")
+    args = parser.parse_args()
+
+    samples = load_audio(args.audio, args.seconds)
+    audio_seconds = len(samples) / SAMPLE_RATE
+
+    started = time.perf_counter()
+    transcriber = get_transcriber()
+    if hasattr(transcriber, "start"):
+        transcriber.start()
+    print(f"Backend: {transcriber.name} ({getattr(transcriber, 'model', '')}), "
+          f"ready in {time.perf_counter() - started:.2f}s")
+
+    def one(_):
+        t0 = time.perf_counter()
+        try:
+            text = transcriber.transcribe(samples, args.language)
+        except TranscriberBusy:
+            return None, ""
+        return time.perf_counter() - t0, text
+
+    wall = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(one, range(args.requests)))
+    wall = time.perf_counter() - wall
+
+    latencies = sorted(r[0] for r in results if r[0] is not None)
+    rejected = sum(1 for r in results if r[0] is None)
+    if not latencies:
+        sys.exit(f"All {rejected} requests were rejected")
+    print(f"Audio: {audio_seconds:.1f}s x {args.requests} requests, concurrency {args.concurrency}")
+    print(f"Latency: p50 {latencies[len(latencies) // 2]:.2f}s, max {latencies[-1]:.2f}s, rejected {rejected}")
+    print(f"Real-time factor per request: {latencies[len(latencies) // 2] / audio_seconds:.3f}")
+    print(f"Throughput: {len(latencies) * audio_seconds / wall:.1f} audio seconds per wall second")
+    print(f"Sample text: {results[0][1][:80]!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+# Shared test setup: a throwaway SQLite database per test session
+import os
+import sys
+import tempfile
+
+# Must be set before app.database creates the engine
+_db_dir = tempfile.mkdtemp(prefix="gyaan-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.setdefault("AUDIO_STORE_DIR", os.path.join(_db_dir, "audio"))
+os.environ.setdefault("LEXICON_PATH", os.path.join(_db_dir, "lexicon.bin"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
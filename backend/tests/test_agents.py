@@ -0,0 +1,96 @@
+# Agent fallbacks: a failed LLM call keeps the locally computed result
+import json
+from types import SimpleNamespace
+
+from app.agents.comprehension_agent import ComprehensionAgent
+from app.agents.progress_agent import ProgressAgent
+from app.agents.vocabulary_agent import VocabularyAgent
+
+LLM_RESULT = {
+    "analysis": "Judged by the model.", "concepts": ["Word Meaning"], "gaps": [],
+    "recommendations": ["Keep going"], "accuracy": 90,
+}
+
+
+class FakeCompletions:
+    """OpenAI-style chat.completions that fails or answers with LLM_RESULT"""
+
+    def __init__(self, fail: bool):
+        self.fail = fail
+        self.calls = 0
+        self.with_raw_response = self
+
+    def create(self, **request):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("provider down")
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(LLM_RESULT)))])
+
+
+def _agent(agent_class, fail: bool):
+    agent = agent_class()
+    agent.client = SimpleNamespace(chat=SimpleNamespace(completions=FakeCompletions(fail)), base_url="https://test")
+    return agent
+
+
+def _calls(agent) -> int:
+    return agent.client.chat.completions.calls
+
+
+def test_vocabulary_keeps_the_lexicon_result_when_the_llm_fails():
+    agent = _agent(VocabularyAgent, fail=True)
+    result = agent.analyze({"transcript": "big means large, zorbulate is a thing", "target_words": "big, zorbulate"})
+    assert _calls(agent) == 1
+    assert result["scored_by"] == "lexicon"
+    assert result["words"] == {"big": "correct", "zorbulate": "ambiguous"}
+    assert result["accuracy"] == 75
+    assert result["xp_earned"] == int(35 + 75 / 2)
+
+
+def test_vocabulary_asks_the_llm_only_about_ambiguous_words():
+    agent = _agent(VocabularyAgent, fail=False)
+    local = agent.analyze({"transcript": "big means large", "target_words": "big"})
+    assert _calls(agent) == 0
+    assert local["scored_by"] == "lexicon"
+
+    escalated = agent.analyze({"transcript": "zorbulate means spinning around", "target_words": "zorbulate"})
+    assert _calls(agent) == 1
+    assert escalated["scored_by"] == "llm"
+    assert escalated["accuracy"] == 90
+
+
+def test_vocabulary_without_targets_is_unscored_when_the_llm_fails():
+    result = _agent(VocabularyAgent, fail=True).analyze({"transcript": "I saw a huge elephant", "target_words": ""})
+    assert result["scored_by"] == "none"
+    assert result["accuracy"] is None
+    assert result["xp_earned"] == 0
+
+
+def test_comprehension_keeps_the_local_result_when_the_llm_fails():
+    agent = _agent(ComprehensionAgent, fail=True)
+    result = agent.analyze({
+        "transcript": "The fox jumped over the dog",
+        "passage": "The quick brown fox jumped over the lazy dog.",
+        "narrative": "sync",
+    })
+    assert _calls(agent) == 1
+    assert result["scored_by"] == "local"
+    assert result["accuracy"] > 0
+    assert "Basic Understanding" not in result["concepts"]
+
+
+def test_progress_does_not_cache_the_fallback():
+    agent = _agent(ProgressAgent, fail=True)
+    request = {"student_id": "fallback-student", "assessments": [], "current_level": 1, "xp": 10}
+    agent.analyze(request)
+    agent.analyze(request)
+    assert _calls(agent) == 2
+    assert "fallback-student" not in agent._summaries
+
+
+def test_progress_reuses_a_successful_summary():
+    agent = _agent(ProgressAgent, fail=False)
+    request = {"student_id": "cached-student", "assessments": [], "current_level": 1, "xp": 10}
+    first, second = agent.analyze(request), agent.analyze(request)
+    assert _calls(agent) == 1
+    assert first["analysis"] == second["analysis"] == LLM_RESULT["analysis"]
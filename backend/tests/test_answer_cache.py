@@ -0,0 +1,56 @@
+# Semantic answer cache: rewordings hit, near-miss questions do not
+import pytest
+
+from app.services.answer_cache import SemanticAnswerCache
+
+
+@pytest.fixture
+def cache():
+    return SemanticAnswerCache(threshold=0.85)
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("What is a noun?", "what is noun"),
+    ("What is the capital of India?", "what is capital of india"),
+    ("Explain photosynthesis to me", "explain photosynthesis"),
+])
+def test_rewordings_hit(cache, stored, asked):
+    cache.put(stored, "Reading", "answer")
+    assert cache.get(asked, "Reading").answer == "answer"
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("what is the plural of mouse", "what is the plural of house"),
+    ("does a spider have eight legs", "does a spider has eight legs"),
+    ("what is 5 + 3", "what is 5 + 4"),
+    ("how many legs does an ant have", "how many legs does an ant has"),
+])
+def test_near_misses_do_not_hit(cache, stored, asked):
+    cache.put(stored, "Science", "answer")
+    assert cache.get(asked, "Science") is None
+
+
+def test_contexts_are_separate(cache):
+    cache.put("what is a noun", "Reading", "answer")
+    assert cache.get("what is a noun", "Math Challenge") is None
+
+
+def test_expired_entries_miss():
+    cache = SemanticAnswerCache(ttl=-1)
+    cache.put("what is a noun", "Reading", "answer")
+    assert cache.get("what is noun", "Reading") is None
+
+
+def test_lru_eviction_per_namespace():
+    cache = SemanticAnswerCache(capacity=2)
+    for word in ("noun", "verb", "adjective"):
+        cache.put(f"what is a {word}", "Reading", word)
+    assert cache.get("what is a noun", "Reading") is None
+    assert cache.get("what is a adjective", "Reading").answer == "adjective"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cacheable_skips_short_and_long_messages(cache):
+    assert not cache.cacheable("hi")
+    assert not cache.cacheable("why " * 100)
+    assert cache.cacheable("what is a noun")
@@ -0,0 +1,98 @@
+# Stored recordings: byte ranges on playback, size limits on uploads
+import asyncio
+import os
+
+import httpx
+import pytest
+
+from app.database import engine, init_db
+from app.main import app
+from app.routes import audio as audio_routes
+from app.services.audio_store import audio_store
+
+AUDIO = os.urandom(16) + b"0123456789"  # Unique content, so every run stores a new file
+
+
+def _requests(*calls):
+    """Run (method, url, kwargs) calls against the app and return the responses"""
+
+    async def main():
+        await init_db()
+        try:
+            async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+                return [await client.request(method, url, **kwargs) for method, url, kwargs in calls]
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+@pytest.fixture(scope="module")
+def audio_id():
+    files = {"audio": ("clip.webm", AUDIO, "audio/webm")}
+    (response,) = _requests(("POST", "/api/audio/upload", {"files": files}))
+    assert response.status_code == 200, response.text
+    assert response.json()["size"] == len(AUDIO)
+    return response.json()["id"]
+
+
+@pytest.mark.parametrize("header, status, content_range, body", [
+    (None, 200, None, AUDIO),
+    ("bytes=0-3", 206, f"bytes 0-3/{len(AUDIO)}", AUDIO[:4]),
+    ("bytes=-4", 206, f"bytes {len(AUDIO) - 4}-{len(AUDIO) - 1}/{len(AUDIO)}", AUDIO[-4:]),
+    ("bytes=20-", 206, f"bytes 20-{len(AUDIO) - 1}/{len(AUDIO)}", AUDIO[20:]),
+    ("bytes=20-1000", 206, f"bytes 20-{len(AUDIO) - 1}/{len(AUDIO)}", AUDIO[20:]),
+    (f"bytes={len(AUDIO)}-", 416, f"bytes */{len(AUDIO)}", b""),
+    ("bytes=5-2", 416, f"bytes */{len(AUDIO)}", b""),
+    ("pages=1-2", 200, None, AUDIO),
+])
+def test_range_requests(audio_id, header, status, content_range, body):
+    headers = {"Range": header} if header else {}
+    (response,) = _requests(("GET", f"/api/audio/files/{audio_id}", {"headers": headers}))
+    assert response.status_code == status
+    assert response.headers.get("content-range") == content_range
+    assert response.content == body
+    assert response.headers["content-length"] == str(len(body))
+
+
+def test_unknown_recording(audio_id):
+    (response,) = _requests(("GET", "/api/audio/files/" + "0" * 64, {}))
+    assert response.status_code == 404
+
+
+@pytest.fixture
+def small_limit(monkeypatch):
+    monkeypatch.setattr(audio_store, "max_upload_bytes", 8)
+    # An engine must exist for /transcribe to read the body; the limit is hit before it is used
+    monkeypatch.setattr(audio_routes, "_transcription_engine", lambda: (None, None, ("test", "test")))
+
+
+def test_transcribe_rejects_large_raw_bodies(small_limit):
+    (response,) = _requests(("POST", "/api/audio/transcribe", {
+        "content": AUDIO, "headers": {"Content-Type": "audio/webm"},
+    }))
+    assert response.status_code == 413
+
+
+def test_transcribe_rejects_large_streamed_bodies(small_limit):
+    async def body():
+        yield AUDIO  # No Content-Length: the limit is enforced while streaming
+
+    (response,) = _requests(("POST", "/api/audio/transcribe", {
+        "content": body(), "headers": {"Content-Type": "audio/webm"},
+    }))
+    assert response.status_code == 413
+
+
+def test_transcribe_rejects_large_multipart_files(small_limit):
+    (response,) = _requests(("POST", "/api/audio/transcribe", {
+        "files": {"audio": ("clip.webm", AUDIO, "audio/webm")},
+    }))
+    assert response.status_code == 413
+
+
+def test_upload_rejects_large_files(small_limit):
+    (response,) = _requests(("POST", "/api/audio/upload", {
+        "files": {"audio": ("clip.webm", AUDIO, "audio/webm")},
+    }))
+    assert response.status_code == 413
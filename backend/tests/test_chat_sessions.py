@@ -0,0 +1,84 @@
+# Chat sessions: hot-tier freshness across workers and bounded summaries
+import asyncio
+
+from app.database import AsyncSessionLocal, engine, init_db
+from app.services.chat_sessions import (
+    COMPACT_AFTER, MAX_SUMMARY_CHARS, RECENT_TURNS, ChatSessionStore, extractive_summary, shorten
+)
+
+
+def _run(scenario):
+    async def main():
+        await init_db()
+        try:
+            async with AsyncSessionLocal() as db:
+                return await scenario(db)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+def test_shorten_keeps_the_start_and_the_end():
+    summary = "A" * 600 + "B" * 600
+    short = shorten(summary)
+    assert len(short) <= MAX_SUMMARY_CHARS
+    assert short.startswith("A") and short.endswith("B") and " ... " in short
+    assert shorten("brief") == "brief"
+
+
+def test_extractive_summary_lists_questions():
+    turns = [{"role": "user", "content": "what is a noun"}, {"role": "assistant", "content": "a naming word"}]
+    assert extractive_summary("Earlier chat.", turns) == "Earlier chat. Student asked: what is a noun"
+
+
+def test_other_workers_see_new_turns_and_compaction():
+    async def scenario(db):
+        first, second = ChatSessionStore(), ChatSessionStore()
+        session_id = await first.create(db)
+        await first.append(db, session_id, "user", "question 0")
+        assert len((await second.load(db, session_id)).turns) == 1
+
+        # Turns appended by the first worker invalidate the second's copy
+        for i in range(1, COMPACT_AFTER + 2):
+            await first.append(db, session_id, "user", f"question {i}")
+        stale = second._hot[session_id]
+        assert len((await second.load(db, session_id)).turns) == COMPACT_AFTER + 2
+        assert second._hot[session_id] is not stale
+
+        # So does a compaction, even though it adds no turns
+        before = second._hot[session_id]
+        assert first.needs_compaction(session_id)
+        await first.compact(db, session_id)
+        state = await second.load(db, session_id)
+        assert state is not before
+        assert len(state.turns) == RECENT_TURNS
+        assert state.summary == first._hot[session_id].summary
+        assert "question 0" in state.summary
+
+        # And an unchanged session stays hot
+        assert await first.load(db, session_id) is first._hot[session_id]
+        assert await second.load(db, session_id) is state
+
+    _run(scenario)
+
+
+def test_overlong_summaries_are_condensed_not_truncated():
+    calls = []
+
+    def summarizer(previous, turns):
+        calls.append((previous, turns))
+        if turns:
+            return "start of the chat. " + "x" * 2000 + " latest question"
+        return "condensed: start of the chat, latest question"
+
+    async def scenario(db):
+        store = ChatSessionStore(summarizer=summarizer)
+        session_id = await store.create(db)
+        for i in range(COMPACT_AFTER + 1):
+            await store.append(db, session_id, "user", f"question {i}")
+        await store.compact(db, session_id)
+        return store._hot[session_id].summary
+
+    assert _run(scenario) == "condensed: start of the chat, latest question"
+    assert len(calls) == 2 and calls[1][1] == []
@@ -0,0 +1,97 @@
+# Concept graph: periodic reloads and concurrent mastery writes
+import asyncio
+import uuid
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal, engine, init_db
+from app.models import Lesson, Progress, User
+from app.services.concept_graph import ConceptIndex
+
+
+def _run(scenario):
+    async def main():
+        await init_db()
+        try:
+            return await scenario()
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def _seed(prefix: str, lessons: int, progress: bool = True):
+    async with AsyncSessionLocal() as db:
+        db.add(User(id=f"{prefix}-s", username="student", role="student", section=prefix[:8]))
+        if progress:
+            db.add(Progress(user_id=f"{prefix}-s", lessons_completed=[]))
+        for i in range(lessons):
+            db.add(Lesson(id=f"{prefix}-L{i}", title=f"Lesson {i}", subject=prefix, level=1, content="Count."))
+        await db.commit()
+
+
+async def _completed(student_id: str):
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(Progress.lessons_completed).where(Progress.user_id == student_id))
+
+
+def test_concurrent_masteries_are_all_recorded():
+    prefix = uuid.uuid4().hex
+
+    async def scenario():
+        await _seed(prefix, lessons=4)
+        workers = [ConceptIndex() for _ in range(4)]  # One per worker process
+
+        async def master(worker, lesson_id):
+            async with AsyncSessionLocal() as db:
+                return await worker.master(db, f"{prefix}-s", lesson_id)
+
+        results = await asyncio.gather(*(master(w, f"{prefix}-L{i}") for i, w in enumerate(workers)))
+        assert results == [True] * 4
+        return await _completed(f"{prefix}-s")
+
+    assert sorted(_run(scenario)) == [f"{prefix}-L{i}" for i in range(4)]
+
+
+def test_mastery_creates_a_missing_progress_row():
+    prefix = uuid.uuid4().hex
+
+    async def scenario():
+        await _seed(prefix, lessons=1, progress=False)
+        async with AsyncSessionLocal() as db:
+            assert await ConceptIndex().master(db, f"{prefix}-s", f"{prefix}-L0")
+        return await _completed(f"{prefix}-s")
+
+    assert _run(scenario) == [f"{prefix}-L0"]
+
+
+def test_new_lessons_appear_after_the_refresh_interval():
+    prefix = uuid.uuid4().hex
+
+    async def scenario():
+        await _seed(prefix, lessons=1)
+        index = ConceptIndex(refresh_seconds=0.05)
+        async with AsyncSessionLocal() as db:
+            await index.student(db, f"{prefix}-s")
+            graph = index.graph
+            assert f"{prefix}-L0" in graph.nodes
+
+            # Nothing changed: the graph is kept
+            await asyncio.sleep(0.1)
+            await index.fresh(db)
+            assert index.graph is graph
+
+            db.add(Lesson(id=f"{prefix}-new", title="New", subject=prefix, level=2, content="Add."))
+            await db.commit()
+            await index.fresh(db)
+            assert f"{prefix}-new" not in index.graph.nodes  # Reloaded moments ago
+
+            await asyncio.sleep(0.1)
+            state = await index.student(db, f"{prefix}-s")
+            assert f"{prefix}-new" in index.graph.nodes
+            # Frontiers are rebuilt on the new graph: the next level unlocks once level 1 is mastered
+            assert state.status(f"{prefix}-new") == "locked"
+            assert await index.master(db, f"{prefix}-s", f"{prefix}-L0")
+            assert state.status(f"{prefix}-new") == "learning"
+
+    _run(scenario)
@@ -0,0 +1,98 @@
+# Hint pools: per-language pools, one generation per lesson across workers,
+# pools of deleted lessons dropped
+import asyncio
+import time
+import uuid
+
+import httpx
+from sqlalchemy import delete
+
+from app.database import AsyncSessionLocal, engine, init_db
+from app.main import app
+from app.models import Lesson
+from app.services.hint_pool import HintPool, hint_store
+from app.services.shared_state import shared_state
+
+
+def _run(scenario):
+    async def main():
+        await init_db()
+        try:
+            return await scenario()
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def _add_lessons(prefix: str, count: int, language: str = "hindi"):
+    async with AsyncSessionLocal() as db:
+        for i in range(count):
+            db.add(Lesson(id=f"{prefix}-{i}", title=f"Lesson {i}", subject="math", level=1, content="Count.",
+                          language=language))
+        await db.commit()
+
+
+def _generator(calls: list):
+    def generate(lesson):
+        calls.append(lesson.id)
+        return [f"hint for {lesson.id}"]
+    return generate
+
+
+def test_each_pool_is_generated_once_and_served_in_its_language():
+    prefix = uuid.uuid4().hex
+
+    async def scenario():
+        await _add_lessons(prefix, 2)
+        calls = []
+        for _ in range(3):  # Three workers' refresh passes
+            await HintPool(generator=_generator(calls)).refresh()
+
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            pooled = (await client.get(f"/api/chat/hint/{prefix}-0", params={"language": "hindi"})).json()
+            other = (await client.get(f"/api/chat/hint/{prefix}-0", params={"language": "english"})).json()
+        return [c for c in calls if c.startswith(prefix)], pooled, other
+
+    calls, pooled, other = _run(scenario)
+    assert sorted(calls) == [f"{prefix}-0", f"{prefix}-1"]
+    assert pooled == {"hint": f"hint for {prefix}-0", "language": "hindi", "source": "pool"}
+    assert other["source"] == "catalog"
+
+
+def test_lessons_leased_by_another_worker_are_skipped():
+    prefix = uuid.uuid4().hex
+
+    async def scenario():
+        await _add_lessons(prefix, 2)
+        await shared_state.backend.acquire(f"hints:{prefix}-1:hindi", "other-worker", 60)
+        calls = []
+        await HintPool(generator=_generator(calls)).refresh()
+        return [c for c in calls if c.startswith(prefix)], await hint_store.get(f"{prefix}-1:hindi")
+
+    calls, leased_pool = _run(scenario)
+    assert calls == [f"{prefix}-0"]
+    assert leased_pool is None
+
+
+def test_stale_pools_are_regenerated_and_deleted_lessons_dropped():
+    prefix = uuid.uuid4().hex
+
+    async def scenario():
+        await _add_lessons(prefix, 2)
+        calls = []
+        pool = HintPool(generator=_generator(calls), max_age=3600)
+        await pool.refresh()
+        stale = await hint_store.get(f"{prefix}-0:hindi")
+        await hint_store.set(f"{prefix}-0:hindi", {**stale, "generated_at": time.time() - 7200})
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Lesson).where(Lesson.id == f"{prefix}-1"))
+            await db.commit()
+
+        await pool.refresh()
+        return [c for c in calls if c.startswith(prefix)], await hint_store.items()
+
+    calls, pools = _run(scenario)
+    assert calls == [f"{prefix}-0", f"{prefix}-1", f"{prefix}-0"]
+    assert f"{prefix}-0:hindi" in pools
+    assert f"{prefix}-1:hindi" not in pools
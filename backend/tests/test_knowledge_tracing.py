@@ -0,0 +1,104 @@
+# Bayesian Knowledge Tracing: single updates, batched replay, struggles
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.models import Assessment
+from app.services.knowledge_tracing import (
+    MASTERED, P_INIT, KnowledgeTracer, StudentKnowledge, bkt_update, lesson_key, observations, skill_key
+)
+
+_START = datetime(2026, 1, 1)
+
+
+def _assessment(id, user, minutes, lesson=None, accuracy=None, concepts=(), gaps=()):
+    return Assessment(
+        id=id, user_id=user, lesson_id=lesson, accuracy=accuracy, concepts_identified=list(concepts),
+        gaps_found=list(gaps), created_at=_START + timedelta(minutes=minutes),
+    )
+
+
+def test_bkt_update_from_the_prior():
+    assert bkt_update(P_INIT, True) == pytest.approx(0.6)
+    assert bkt_update(P_INIT, False) == pytest.approx(0.17576, abs=1e-5)
+
+
+def test_bkt_update_moves_with_evidence_and_stays_a_probability():
+    for p in (0.0, 0.01, 0.5, 0.99, 1.0):
+        right, wrong = bkt_update(p, True), bkt_update(p, False)
+        assert 0.0 <= wrong <= right <= 1.0
+
+
+def test_bkt_update_on_arrays_matches_scalars():
+    p = np.array([0.1, 0.5, 0.9])
+    correct = np.array([True, False, True])
+    expected = [bkt_update(float(x), bool(c)) for x, c in zip(p, correct)]
+    assert bkt_update(p, correct) == pytest.approx(expected)
+
+
+def test_observe_tracks_probability_and_attempts():
+    state = StudentKnowledge()
+    assert state.get(3) == P_INIT
+    for _ in range(10):
+        state.observe(3, True)
+    assert state.get(3) >= MASTERED
+    assert state.attempts[3] == 10
+    assert np.isnan(state.p_known[0])
+
+
+def test_observations_from_an_assessment():
+    found = observations(_assessment(1, "s", 0, lesson="L1", accuracy=70, concepts=["Nouns"], gaps=["Past tense"]))
+    assert found == [(lesson_key("L1"), True), ("skill:nouns", True), (skill_key("past tense"), False)]
+    assert observations(_assessment(2, "s", 0, lesson="L1", accuracy=69))[0] == (lesson_key("L1"), False)
+
+
+def test_replay_matches_one_update_at_a_time():
+    history = [
+        _assessment(1, "a", 0, lesson="L1", accuracy=90, concepts=["nouns"]),
+        _assessment(2, "b", 1, lesson="L1", accuracy=20, gaps=["nouns"]),
+        _assessment(3, "a", 2, lesson="L1", accuracy=30, gaps=["verbs"]),
+        _assessment(4, "a", 3, lesson="L2", accuracy=80),
+        _assessment(5, "c", 4, lesson="L1", accuracy=100),  # Not in the class
+    ]
+    tracer = KnowledgeTracer()
+    # Shuffled input: replay orders by time itself
+    states = tracer.replay(list(reversed(history)), ["a", "b"])
+    assert set(states) == {"a", "b"}
+
+    for student in ("a", "b"):
+        expected = StudentKnowledge()
+        for assessment in history:
+            if assessment.user_id == student:
+                for key, correct in observations(assessment):
+                    expected.observe(tracer.registry.id(key), correct)
+        for key in tracer.registry.keys:
+            replayed, stepped = tracer.mastery(states[student], key), tracer.mastery(expected, key)
+            if stepped is None:
+                assert replayed is None
+            else:
+                assert replayed == pytest.approx(stepped, abs=1e-6)
+                assert states[student].attempts[tracer.registry.index[key]] == expected.attempts[tracer.registry.index[key]]
+
+
+def test_struggles_need_repeated_failure():
+    tracer = KnowledgeTracer()
+    history = [_assessment(1, "a", 0, gaps=["fractions"]), _assessment(2, "a", 1, concepts=["decimals"])]
+    state = tracer.replay(history, ["a"])["a"]
+    assert tracer.struggles(state) == []
+
+    history.append(_assessment(3, "a", 2, gaps=["fractions"]))
+    state = tracer.replay(history, ["a"])["a"]
+    assert [key for key, _ in tracer.struggles(state)] == ["skill:fractions"]
+
+    summary = tracer.summary(state)
+    assert summary["conceptsTracked"] == 2
+    assert summary["struggling"][0]["concept"] == "fractions"
+
+
+def test_replay_without_history():
+    tracer = KnowledgeTracer()
+    state = tracer.replay([], ["a"])["a"]
+    assert tracer.summary(state) == {
+        "conceptsTracked": 0, "conceptsMastered": 0, "averageMastery": None, "struggling": [],
+    }
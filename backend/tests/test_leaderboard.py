@@ -0,0 +1,40 @@
+# Leaderboard ranks: ties share a rank, moves keep the board sorted
+import random
+
+from app.services.leaderboard import Board
+
+
+def _ranks_by_scan(xp):
+    return {student_id: 1 + sum(other > value for other in xp.values()) for student_id, value in xp.items()}
+
+
+def test_ties_share_a_rank_and_list_by_id():
+    board = Board.build({"c": 100, "a": 100, "b": 300, "d": 50})
+    assert board.top(10) == [(1, "b", 300), (2, "a", 100), (2, "c", 100), (4, "d", 50)]
+    assert [board.rank(s) for s in "abcd"] == [2, 1, 2, 4]
+    assert board.top(2) == [(1, "b", 300), (2, "a", 100)]
+
+
+def test_set_moves_and_adds_students():
+    board = Board.build({"a": 10, "b": 20})
+    board.set("a", 30)
+    board.set("c", 20)
+    board.set("b", 20)  # Unchanged
+    assert len(board) == 3
+    assert board.top(3) == [(1, "a", 30), (2, "b", 20), (2, "c", 20)]
+    assert board.xp("a") == 30
+    assert board.rank("missing") is None
+
+
+def test_incremental_updates_match_a_rebuild():
+    rng = random.Random(7)
+    xp = {f"s{i}": rng.randrange(0, 500, 10) for i in range(50)}
+    board = Board.build(dict(xp))
+    for _ in range(300):
+        student_id = rng.choice(list(xp) + ["new"])
+        xp[student_id] = rng.randrange(0, 500, 10)
+        board.set(student_id, xp[student_id])
+
+    rebuilt = Board.build(dict(xp))
+    assert board.top(len(xp)) == rebuilt.top(len(xp))
+    assert {s: board.rank(s) for s in xp} == _ranks_by_scan(xp)
@@ -0,0 +1,59 @@
+# Lesson bundles: content-addressed versions and deltas between them
+import asyncio
+import gzip
+import json
+
+from app.services.lesson_catalog import Bundle, EncodedBody, LessonCatalog
+
+
+def _lesson(lesson_id, title, content="Read the story."):
+    return {"id": lesson_id, "subject": "english", "title": title, "content": content, "example": None, "xpReward": 10}
+
+
+def _delta(base, target, catalog=None):
+    body = asyncio.run((catalog or LessonCatalog()).delta(base, target))
+    raw, encoding = body.get("identity")
+    assert encoding == "identity"
+    return json.loads(raw)
+
+
+def test_version_depends_on_content_not_order():
+    lessons = [_lesson("a", "Animals"), _lesson("b", "Birds")]
+    assert Bundle("english", 1, lessons).version == Bundle("english", 1, list(reversed(lessons))).version
+    assert Bundle("english", 1, lessons).version != Bundle("english", 2, lessons).version
+    changed = [_lesson("a", "Animals"), _lesson("b", "Birds", content="Birds can fly.")]
+    assert Bundle("english", 1, lessons).version != Bundle("english", 1, changed).version
+
+
+def test_delta_lists_changed_added_and_removed_lessons():
+    base = Bundle("english", 1, [_lesson("a", "Animals"), _lesson("b", "Birds"), _lesson("c", "Cats")])
+    target = Bundle("english", 1, [_lesson("a", "Animals"), _lesson("b", "Birds of India"), _lesson("d", "Dogs")])
+    delta = _delta(base, target)
+    assert delta["from"] == base.version
+    assert delta["version"] == target.version
+    assert [lesson["id"] for lesson in delta["changed"]] == ["b", "d"]
+    assert delta["changed"][0]["title"] == "Birds of India"
+    assert delta["removed"] == ["c"]
+
+
+def test_delta_between_equal_versions_is_empty():
+    bundle = Bundle("hindi", 2, [_lesson("a", "Animals")])
+    delta = _delta(bundle, bundle)
+    assert delta["changed"] == [] and delta["removed"] == []
+
+
+def test_deltas_are_cached_per_version_pair():
+    catalog = LessonCatalog(delta_cache_size=1)
+    one = Bundle("english", 1, [_lesson("a", "Animals")])
+    two = Bundle("english", 1, [_lesson("a", "Ants")])
+    first = asyncio.run(catalog.delta(one, two))
+    assert asyncio.run(catalog.delta(one, two)) is first
+    asyncio.run(catalog.delta(two, one))
+    assert asyncio.run(catalog.delta(one, two)) is not first  # Evicted by the newer pair
+
+
+def test_encoded_body_falls_back_to_identity():
+    body = EncodedBody(b'{"a": 1}')
+    assert gzip.decompress(body.get("gzip")[0]) == b'{"a": 1}'
+    assert body.get("zstd") == (b'{"a": 1}', "identity")
+    assert body.get(None)[1] == "identity"
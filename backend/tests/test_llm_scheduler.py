@@ -0,0 +1,139 @@
+# LLM scheduler: priority and fair-queue ordering, 429 retries, cancellation
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.llm_scheduler import (
+    CallCancelled, LLMScheduler, PRIORITY_BATCH, PRIORITY_CHAT, ProviderLimits, parse_reset
+)
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def _run_queued(scheduler, calls):
+    """
+    Hold the only slot with a blocking call, queue `calls` as
+    (name, priority, tenant) in order, then release it; returns the order
+    the queued calls ran in
+    """
+    started, release, order = threading.Event(), threading.Event(), []
+
+    def blocker():
+        started.set()
+        release.wait(5)
+
+    threads = [threading.Thread(target=scheduler.call, args=("p", blocker))]
+    threads[0].start()
+    started.wait(5)
+    for name, priority, tenant in calls:
+        thread = threading.Thread(
+            target=scheduler.call, args=("p", lambda name=name: order.append(name)),
+            kwargs={"priority": priority, "tenant": tenant},
+        )
+        thread.start()
+        threads.append(thread)
+        while scheduler.queued("p") < len(threads) - 1:
+            time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return order
+
+
+@pytest.mark.parametrize("header, seconds", [
+    ("1s", 1.0), ("6m0s", 360.0), ("20ms", 0.02), ("2.5", 2.5), ("1h2m", 3720.0), ("soon", None), (None, None),
+])
+def test_parse_reset(header, seconds):
+    assert parse_reset(header) == seconds
+
+
+def test_provider_limits_wait_for_reset():
+    limits = ProviderLimits(max_concurrent=4)
+    limits.update({"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "2s"}, now=100.0)
+    assert limits.wait_time(100.0, 0) == pytest.approx(2.0)
+    assert limits.wait_time(103.0, 0) == 0.0
+
+    limits.update({"x-ratelimit-remaining-tokens": "10", "x-ratelimit-reset-tokens": "1s"}, now=200.0)
+    assert limits.wait_time(200.0, 50) == pytest.approx(1.0)
+    assert limits.wait_time(200.0, 5) == 0.0
+
+
+def test_higher_priority_runs_first():
+    scheduler = LLMScheduler(max_concurrent=1)
+    order = _run_queued(scheduler, [("batch", PRIORITY_BATCH, "a"), ("chat", PRIORITY_CHAT, "a")])
+    assert order == ["chat", "batch"]
+
+
+def test_busy_tenant_does_not_starve_others():
+    scheduler = LLMScheduler(max_concurrent=1)
+    calls = [(f"a{i}", PRIORITY_BATCH, "busy") for i in range(4)] + [("b0", PRIORITY_BATCH, "quiet")]
+    order = _run_queued(scheduler, calls)
+    assert order.index("b0") <= 1
+    assert [name for name in order if name.startswith("a")] == ["a0", "a1", "a2", "a3"]
+
+
+def test_rate_limited_calls_are_retried():
+    scheduler = LLMScheduler(max_retries=3, base_delay=0.001)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimited()
+        return "ok"
+
+    assert scheduler.call("p", flaky) == "ok"
+    assert len(attempts) == 3
+    assert scheduler.stats()["retries"] == 2
+
+
+def test_retries_are_bounded():
+    scheduler = LLMScheduler(max_retries=2, base_delay=0.001)
+
+    def always_limited():
+        raise RateLimited()
+
+    with pytest.raises(RateLimited):
+        scheduler.call("p", always_limited)
+    assert scheduler.stats()["retries_exhausted"] == 1
+
+
+def test_other_errors_are_not_retried():
+    scheduler = LLMScheduler(base_delay=0.001)
+    attempts = []
+
+    def broken():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        scheduler.call("p", broken)
+    assert len(attempts) == 1
+    assert scheduler.stats()["in_flight"]["p"] == 0
+
+
+def test_cancelled_call_leaves_the_queue():
+    scheduler = LLMScheduler(max_concurrent=1)
+    started, release = threading.Event(), threading.Event()
+    holder = threading.Thread(target=scheduler.call, args=("p", lambda: (started.set(), release.wait(5))))
+    holder.start()
+    started.wait(5)
+
+    ran = []
+    with pytest.raises(CallCancelled):
+        scheduler.call("p", lambda: ran.append(1), cancelled=lambda: True)
+    release.set()
+    holder.join(5)
+    assert not ran
+    assert scheduler.queued("p") == 0
+    assert scheduler.stats()["cancelled"] == 1
+
+
+def test_run_uses_the_scheduler_threads():
+    scheduler = LLMScheduler(worker_threads=2)
+    name = asyncio.run(scheduler.run(lambda: threading.current_thread().name))
+    assert name.startswith("llm")
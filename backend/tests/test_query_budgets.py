@@ -0,0 +1,84 @@
+# Query budgets for the teacher endpoints: the number of SQL statements per
+# request must stay fixed as a class grows (no N+1 queries)
+import asyncio
+import io
+import itertools
+
+import httpx
+import pytest
+
+from app.database import AsyncSessionLocal, engine, init_db
+from app.main import app
+from app.models import Assessment, Progress, User
+from app.services.query_counter import query_budget
+from app.services.student_queries import student_detail_cache
+
+_sections = itertools.count(1)
+
+
+async def _seed(section: str, students: int):
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        for i in range(students):
+            student_id = f"{section}-{i:03d}"
+            db.add(User(id=student_id, username=f"student {i}", role="student", section=section))
+            db.add(Progress(user_id=student_id, xp=10 * i, level=i // 20, lessons_completed=[]))
+            for n in range(3):
+                db.add(Assessment(
+                    user_id=student_id, agent_type="reading", accuracy=60 + n * 10,
+                    concepts_identified=["Fluency"], gaps_found=["Phonics"], recommendations=[],
+                ))
+        await db.commit()
+
+
+def _statements(students: int, request, budget: int):
+    """Seed a new section of `students` students and return the statements of one warm request(client, section)"""
+    section = f"T{next(_sections)}"
+
+    async def main():
+        await _seed(section, students)
+        try:
+            async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+                await request(client, section)  # Load per-process indexes for the section
+                student_detail_cache.invalidate(f"{section}-001")
+                with query_budget(budget) as statements:
+                    response = await request(client, section)
+                assert response.status_code == 200, response.text
+                return list(statements)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+ENDPOINTS = {
+    "dashboard": (lambda c, s: c.get("/api/teacher/dashboard", params={"section": s}), 4),
+    "students": (lambda c, s: c.get("/api/teacher/students", params={"section": s, "limit": 200}), 4),
+    "student detail": (lambda c, s: c.get(f"/api/teacher/student/{s}-001"), 4),
+    "at-risk": (lambda c, s: c.get("/api/teacher/at-risk", params={"section": s}), 4),
+}
+
+
+@pytest.mark.parametrize("name", sorted(ENDPOINTS))
+def test_teacher_endpoint_query_budget(name):
+    request, budget = ENDPOINTS[name]
+    small, large = _statements(5, request, budget), _statements(60, request, budget)
+    assert len(large) == len(small), f"{name}: {len(small)} queries for 5 students, {len(large)} for 60"
+
+
+def test_roster_import_query_budget():
+    """A roster import runs a fixed number of statements per batch, not per row"""
+
+    def upload(rows: int):
+        calls = itertools.count()
+
+        async def request(client, section):
+            # New names on every call, so the measured import creates students and notifies XP listeners
+            call = next(calls)
+            lines = ["username,section,xp"] + [f"new {call}-{i},{section},{i + 1}" for i in range(rows)]
+            files = {"file": ("roster.csv", io.BytesIO(("\n".join(lines) + "\n").encode()), "text/csv")}
+            return await client.post("/api/teacher/roster/import", files=files)
+        return request
+
+    small, large = _statements(5, upload(5), 1_000), _statements(60, upload(60), 1_000)
+    assert len(large) == len(small), f"roster import: {len(small)} queries for 5 rows, {len(large)} for 60"
@@ -0,0 +1,70 @@
+# Read-aloud alignment: correct words, skips, miscues, insertions, diagnosis
+from app.services.reading_alignment import CORRECT, MISCUE, PENDING, SKIPPED, ReadingAlignment
+
+PASSAGE = "The little cat sat on the warm mat near the door."
+
+
+def test_exact_reading_arriving_in_pieces():
+    alignment = ReadingAlignment(PASSAGE)
+    assert alignment.extend("the little") == [0, 1]
+    assert alignment.extend("Cat sat on") == [2, 3, 4]
+    assert alignment.remaining_text(3) == "the warm mat"
+    alignment.extend("the warm mat near the door")
+    assert alignment.counts() == {CORRECT: 11, MISCUE: 0, SKIPPED: 0, PENDING: 0}
+    assert alignment.progress() == 1.0
+
+
+def test_skipped_words_are_marked_when_the_reader_jumps_ahead():
+    alignment = ReadingAlignment(PASSAGE)
+    assert alignment.extend("the little sat") == [0, 1, 2, 3]
+    assert alignment.status[:4] == [CORRECT, CORRECT, SKIPPED, CORRECT]
+
+
+def test_miscues_and_insertions():
+    alignment = ReadingAlignment(PASSAGE)
+    alignment.extend("the liddle um cat")
+    assert alignment.status[:3] == [CORRECT, MISCUE, CORRECT]
+    assert alignment.heard[1] == "liddle"
+    assert alignment.inserted == 1
+    assert alignment.word_feedback([1]) == [{"index": 1, "word": "little", "status": MISCUE, "heard": "liddle"}]
+
+
+def test_words_past_the_end_are_insertions():
+    alignment = ReadingAlignment("one two")
+    alignment.extend("one two three")
+    assert alignment.inserted == 1
+    assert alignment.counts()[CORRECT] == 2
+
+
+def test_finish_skips_the_unread_rest():
+    alignment = ReadingAlignment(PASSAGE)
+    alignment.extend("the little cat")
+    assert alignment.finish() == list(range(3, 11))
+    assert alignment.counts() == {CORRECT: 3, MISCUE: 0, SKIPPED: 8, PENDING: 0}
+
+
+def test_diagnosis_of_a_fluent_reading():
+    alignment = ReadingAlignment(PASSAGE)
+    alignment.extend(PASSAGE)
+    diagnosis = alignment.diagnosis(duration_seconds=5.5)
+    assert diagnosis["accuracy"] == 100
+    assert diagnosis["wordsPerMinute"] == 120
+    assert diagnosis["concepts"] == ["Word Recognition", "Reading Fluency"]
+    assert diagnosis["gaps"] == []
+
+
+def test_diagnosis_of_a_struggling_reading():
+    alignment = ReadingAlignment(PASSAGE)
+    alignment.extend("the liddle cat")
+    alignment.finish()
+    diagnosis = alignment.diagnosis(duration_seconds=30)
+    assert diagnosis["accuracy"] == round(100 * 2 / 11)
+    assert diagnosis["gaps"] == ["Word Recognition", "Tracking Text", "Reading Fluency"]
+    assert "Practice these words: little" in diagnosis["recommendations"]
+
+
+def test_empty_passage():
+    alignment = ReadingAlignment("")
+    assert alignment.extend("hello") == []
+    assert alignment.progress() == 1.0
+    assert alignment.diagnosis(0)["wordsPerMinute"] == 0
@@ -0,0 +1,133 @@
+# Student and teacher endpoints: missing students, rage meters, roster
+# imports and CSV exports
+import asyncio
+import csv
+import io
+import uuid
+
+import httpx
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal, engine, init_db
+from app.main import app
+from app.models import Progress, User
+
+
+def _section() -> str:
+    return uuid.uuid4().hex[:8]
+
+
+def _run(scenario):
+    """Run scenario(client) against the app with a fresh database connection pool"""
+
+    async def main():
+        await init_db()
+        try:
+            async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+                return await scenario(client)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def _add_students(section: str, progress: list):
+    """One student per progress dict, ids "{section}-{i}"; None adds a student without progress"""
+    async with AsyncSessionLocal() as db:
+        for i, values in enumerate(progress):
+            db.add(User(id=f"{section}-{i}", username=f"student {i}", role="student", section=section))
+            if values is not None:
+                db.add(Progress(user_id=f"{section}-{i}", **{"lessons_completed": [], **values}))
+        await db.commit()
+
+
+async def _progress(student_id: str) -> Progress:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(Progress).where(Progress.user_id == student_id))
+
+
+def test_add_xp_to_a_missing_student_is_404():
+    async def scenario(client):
+        response = await client.post("/api/student/nobody-here/xp", params={"amount": 5})
+        assert response.status_code == 404
+        assert await _progress("nobody-here") is None
+
+    _run(scenario)
+
+
+def test_add_xp_moves_xp_and_rage():
+    section = _section()
+
+    async def scenario(client):
+        await _add_students(section, [{"xp": 190, "rage_progress": 10}])
+        response = await client.post(f"/api/student/{section}-0/xp", params={"amount": 20})
+        assert response.status_code == 200
+        assert response.json()["newTotal"] == 210
+        assert response.json()["level"] == 1
+        assert (await _progress(f"{section}-0")).rage_progress == 30
+
+    _run(scenario)
+
+
+def test_dashboard_shows_stored_rage_and_class_totals():
+    section = _section()
+
+    async def scenario(client):
+        await _add_students(section, [{"xp": 0, "rage_progress": 0}, {"xp": 100, "rage_progress": 7},
+                                      {"xp": 300, "rage_progress": 14, "lessons_completed": ["a", "b"]}, None])
+        response = await client.get("/api/teacher/dashboard", params={"section": section, "limit": 2})
+        assert response.status_code == 200
+        body = response.json()
+        assert [(s["id"], s["xp"], s["rageProgress"]) for s in body["students"]] == [
+            (f"{section}-2", 300, 14), (f"{section}-1", 100, 7),
+        ]
+        assert body["classStats"]["totalStudents"] == 4
+        assert body["classStats"]["averageXP"] == 100
+        assert body["classStats"]["totalMastered"] == 2
+
+        detail = await client.get(f"/api/teacher/student/{section}-1")
+        assert detail.json()["rageProgress"] == 7
+
+    _run(scenario)
+
+
+def test_roster_import_moves_rage_and_level_with_xp():
+    section = _section()
+
+    def upload(rows):
+        lines = ["id,username,section,xp"] + [f"{student_id},{name},{section},{xp}" for student_id, name, xp in rows]
+        return {"file": ("roster.csv", io.BytesIO(("\n".join(lines) + "\n").encode()), "text/csv")}
+
+    async def scenario(client):
+        await _add_students(section, [{"xp": 100, "level": 0, "rage_progress": 30}])
+        existing, new = f"{section}-0", f"{section}-new"
+
+        response = await client.post("/api/teacher/roster/import", files=upload([(existing, "a", 250), (new, "b", 450)]))
+        assert response.json() == {"created": 1, "updated": 1, "skipped": 0, "errors": []}
+        progress = await _progress(existing)
+        assert (progress.xp, progress.level, progress.rage_progress) == (250, 1, 180)
+        progress = await _progress(new)
+        assert (progress.xp, progress.level, progress.rage_progress) == (450, 2, 450)
+
+        # Lowering XP never drives the meter below zero
+        await client.post("/api/teacher/roster/import", files=upload([(existing, "a", 50)]))
+        progress = await _progress(existing)
+        assert (progress.xp, progress.level, progress.rage_progress) == (50, 0, 0)
+
+    _run(scenario)
+
+
+def test_csv_export_escapes_formulas():
+    section = _section()
+
+    async def scenario(client):
+        async with AsyncSessionLocal() as db:
+            for i, name in enumerate(["=HYPERLINK(\"http://x\")", "+1", "-1", "@SUM(A1)", "plain - name"]):
+                db.add(User(id=f"{section}-{i}", username=name, role="student", section=section))
+            await db.commit()
+        response = await client.get("/api/teacher/reports/export", params={"section": section})
+        assert response.status_code == 200
+        names = sorted(row["username"] for row in csv.DictReader(io.StringIO(response.text)))
+        assert names == sorted(["'=HYPERLINK(\"http://x\")", "'+1", "'-1", "'@SUM(A1)", "plain - name"])
+
+    _run(scenario)
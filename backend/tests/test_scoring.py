@@ -0,0 +1,69 @@
+# Local scoring of vocabulary explanations and story retellings
+import pytest
+
+from app.services.comprehension_scoring import ComprehensionScorer
+from app.services.vocabulary_scoring import score_vocabulary
+
+STORY = (
+    "Ravi found a small puppy near the river. The puppy was hungry and cold. "
+    "Ravi carried the puppy home and his mother gave it warm milk. "
+    "The next morning the puppy followed Ravi to school."
+)
+
+
+@pytest.mark.parametrize("transcript, verdict", [
+    ("big means large", "correct"),
+    ("big means something of great size", "correct"),
+    ("big means not small", "correct"),
+    ("big means small", "incorrect"),
+    ("big big", "ambiguous"),
+    ("umm", "incorrect"),
+    ("my uncle drives a truck every morning", "ambiguous"),
+])
+def test_vocabulary_verdicts(transcript, verdict):
+    assert score_vocabulary(["big"], transcript)["words"] == {"big": verdict}
+
+
+def test_vocabulary_accuracy_and_gaps():
+    result = score_vocabulary("big, happy", "big means small and happy means glad")
+    assert result["words"] == {"big": "incorrect", "happy": "correct"}
+    assert result["accuracy"] == 50
+    assert "Meaning of 'big'" in result["gaps"]
+    assert "Telling synonyms from antonyms" in result["gaps"]
+    assert "Synonyms" in result["concepts"]
+
+
+def test_unknown_words_are_left_to_the_llm():
+    result = score_vocabulary(["zorbulate"], "zorbulate means to spin around quickly")
+    assert result["ambiguous"] == ["zorbulate"]
+    assert result["accuracy"] == 50
+
+
+def test_no_target_words():
+    result = score_vocabulary([], "anything")
+    assert result["analysis"] == "No target words to check."
+    assert result["accuracy"] == 0
+
+
+def test_retelling_scores_above_an_unrelated_answer():
+    scorer = ComprehensionScorer()
+    good = scorer.score(STORY, "Ravi found a hungry puppy by the river, carried it home and his mother gave it milk.")
+    unrelated = scorer.score(STORY, "I like playing cricket with my friends on Sunday.")
+    assert good["accuracy"] > unrelated["accuracy"]
+    assert good["recall"] > unrelated["recall"]
+    assert good["precision"] > unrelated["precision"]
+    assert "Sticking to the text" in unrelated["gaps"]
+
+
+def test_empty_retelling():
+    result = ComprehensionScorer().score(STORY, "")
+    assert result["accuracy"] == 0
+    assert result["recall"] == 0
+    assert "Ravi" in result["missed"] or "ravi" in result["missed"]
+
+
+def test_key_points_are_cached_per_passage():
+    scorer = ComprehensionScorer(cache_size=1)
+    assert scorer.key_points(STORY) is scorer.key_points(STORY)
+    scorer.key_points("Another short story about a cat.")
+    assert len(scorer._cache) == 1
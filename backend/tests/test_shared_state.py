@@ -0,0 +1,87 @@
+# Shared state across workers: late-committing events and leases
+import asyncio
+import time
+import uuid
+
+from sqlalchemy import func, select
+
+from app.database import AsyncSessionLocal, engine, init_db
+from app.models import SharedEvent
+from app.services.shared_state import DatabaseStateBackend
+
+
+def _run(coroutine):
+    async def main():
+        await init_db()
+        try:
+            return await coroutine
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+async def _add_event(event_id: int, channel: str, created_at: float):
+    async with AsyncSessionLocal() as db:
+        db.add(SharedEvent(id=event_id, channel=channel, origin="other-worker", payload={"n": event_id},
+                           created_at=created_at))
+        await db.commit()
+
+
+def test_events_committed_out_of_id_order_are_delivered_once():
+    channel = uuid.uuid4().hex
+
+    async def scenario():
+        backend, received, arrived = DatabaseStateBackend(), [], asyncio.Event()
+        async with AsyncSessionLocal() as db:
+            base = (await db.scalar(select(func.max(SharedEvent.id))) or 0) + 100
+
+        async def deliver(event_channel, payload):
+            if event_channel != channel:
+                return
+            received.append(payload["n"])
+            arrived.set()
+            if payload["n"] == base + 20:
+                # Stop between polls rather than cancelling the listener in the middle of a query
+                raise asyncio.CancelledError()
+
+        async def notify(namespace):
+            pass
+
+        async def delivery():
+            await asyncio.wait_for(arrived.wait(), 5)
+            arrived.clear()
+
+        listener = asyncio.ensure_future(backend.listen(notify, {}, 0.02, deliver))
+        await asyncio.sleep(0.05)
+        await _add_event(base + 10, channel, time.time())
+        await delivery()
+        # A transaction that took its id earlier commits after the listener moved past it
+        await _add_event(base + 7, channel, time.time() - 0.01)
+        await delivery()
+        # Later polls re-read the grace window; neither event may be delivered again
+        await asyncio.sleep(0.1)
+        await _add_event(base + 20, channel, time.time())
+        await asyncio.gather(listener, return_exceptions=True)
+        return received, base
+
+    received, base = _run(scenario())
+    assert received == [base + 10, base + 7, base + 20]
+
+
+def test_leases_exclude_other_owners_until_released_or_expired():
+    name = f"lease-{uuid.uuid4().hex}"
+
+    async def scenario():
+        backend = DatabaseStateBackend()
+        assert await backend.acquire(name, "worker-a", 60)
+        assert not await backend.acquire(name, "worker-b", 60)
+        assert await backend.acquire(name, "worker-a", 60)  # Renewal
+        await backend.release(name, "worker-b")  # Not the owner: no effect
+        assert not await backend.acquire(name, "worker-b", 60)
+        await backend.release(name, "worker-a")
+        assert await backend.acquire(name, "worker-b", 0.01)
+        await asyncio.sleep(0.05)
+        assert await backend.acquire(name, "worker-a", 60)  # worker-b's lease expired
+
+    _run(scenario())
@@ -0,0 +1,104 @@
+# Single-flight coalescing: shared results, detached callers, abandoned calls
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.llm_scheduler import LLMScheduler
+from app.services.single_flight import SingleFlight, request_key
+
+
+def test_request_key_ignores_whitespace_and_separates_tenants():
+    assert request_key("t1", prompt="Explain  photosynthesis\n") == request_key("t1", prompt="Explain photosynthesis")
+    assert request_key("t1", prompt="x") != request_key("t2", prompt="x")
+    assert request_key("t1", prompt="x") != request_key("t1", prompt="y")
+
+
+def test_concurrent_identical_calls_share_one_result():
+    flights, calls, release = SingleFlight(), [], threading.Event()
+
+    def slow(abandoned):
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.do("k", slow))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while flights.stats()["coalesced"] < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["answer"] * 5
+    assert len(calls) == 1
+    assert flights.stats()["leaders"] == 1
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_errors_are_shared_and_the_next_call_starts_fresh():
+    flights = SingleFlight()
+
+    def broken(abandoned):
+        raise ValueError("provider down")
+
+    with pytest.raises(ValueError):
+        flights.do("k", broken)
+    assert flights.do("k", lambda abandoned: "ok") == "ok"
+    assert flights.stats()["errors"] == 1
+
+
+def test_cancelled_leader_still_serves_followers():
+    flights, release = SingleFlight(), threading.Event()
+
+    def slow(abandoned):
+        release.wait(5)
+        return "answer"
+
+    async def scenario():
+        leader = asyncio.ensure_future(flights.run("k", slow))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(flights.run("k", slow))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        await asyncio.sleep(0.01)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.wait_for(follower, 5)
+
+    assert asyncio.run(scenario()) == "answer"
+    assert flights.stats()["detached"] == 1
+
+
+def test_queued_call_is_abandoned_when_every_caller_leaves():
+    flights, scheduler = SingleFlight(), LLMScheduler(max_concurrent=1)
+    started, release, ran = threading.Event(), threading.Event(), []
+    holder = threading.Thread(target=scheduler.call, args=("p", lambda: (started.set(), release.wait(5))))
+    holder.start()
+    started.wait(5)
+
+    def queued(abandoned):
+        return scheduler.call("p", lambda: ran.append(1), cancelled=abandoned)
+
+    async def scenario():
+        caller = asyncio.ensure_future(flights.run("k", queued))
+        while scheduler.queued("p") == 0:
+            await asyncio.sleep(0.001)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        while not flights.stats().get("abandoned"):
+            await asyncio.sleep(0.01)
+
+    try:
+        asyncio.run(asyncio.wait_for(scenario(), 5))
+    finally:
+        release.set()
+        holder.join(5)
+    assert not ran
+    assert scheduler.stats()["cancelled"] == 1
+    assert flights.stats()["in_flight"] == 0
@@ -0,0 +1,105 @@
+# Keyset pagination of the teacher's student listing: every sort, both
+# directions, ties and NULLs, without duplicates or gaps between pages
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+
+from app.database import AsyncSessionLocal, engine, init_db
+from app.models import Progress, User
+from app.services.student_queries import InvalidQuery, encode_cursor, list_students
+
+# username, created day, xp, level; None xp/level is a progress row with NULLs, no xp key means no progress row
+STUDENTS = [
+    ("asha", 1, {"xp": 50, "level": 0}),
+    ("bala", 1, {"xp": 50, "level": 0}),
+    ("asha", 2, {"xp": 400, "level": 2}),
+    ("chetan", 3, {"xp": None, "level": None}),
+    ("divya", 2, {"xp": 0, "level": 0}),
+    ("esha", 4, {}),
+    ("farah", 5, {"xp": 210, "level": 1}),
+    ("bala", 6, {"xp": None, "level": None}),
+    ("gopal", 6, {}),
+]
+
+
+async def _seed(section: str):
+    await init_db()
+    async with AsyncSessionLocal() as db:
+        for i, (username, day, progress) in enumerate(STUDENTS):
+            student_id = f"{section}-{i}"
+            db.add(User(id=student_id, username=username, role="student", section=section,
+                        created_at=datetime(2026, 1, day)))
+            if progress:
+                db.add(Progress(user_id=student_id, **progress))
+        await db.flush()
+        # The ORM fills in column defaults for None, so store the NULLs explicitly
+        nulls = [f"{section}-{i}" for i, (_, _, progress) in enumerate(STUDENTS) if progress and progress["xp"] is None]
+        await db.execute(update(Progress).where(Progress.user_id.in_(nulls)).values(xp=None, level=None))
+        await db.commit()
+
+
+def _expected(section: str, sort: str, descending: bool):
+    """Order the listing promises: NULLs last ascending (first descending), ties by id"""
+    key = {"username": lambda s: s[0], "createdAt": lambda s: datetime(2026, 1, s[1]),
+           "xp": lambda s: s[2].get("xp"), "level": lambda s: s[2].get("level")}[sort]
+    rows = [(key(s), f"{section}-{i}") for i, s in enumerate(STUDENTS) if sort in ("username", "createdAt") or s[2]]
+    present = sorted((r for r in rows if r[0] is not None), reverse=descending)
+    missing = sorted((r for r in rows if r[0] is None), reverse=descending)
+    return [student_id for _, student_id in (missing + present if descending else present + missing)]
+
+
+def _pages(section: str, sort: str, descending: bool, limit: int):
+    async def main():
+        await _seed(section)
+        try:
+            async with AsyncSessionLocal() as db:
+                ids, cursor, pages = [], None, 0
+                while True:
+                    page = await list_students(db, section=section, sort=sort, descending=descending,
+                                               fields=["id", "username"], limit=limit, cursor=cursor)
+                    ids.extend(s["id"] for s in page["students"])
+                    pages += 1
+                    cursor = page["nextCursor"]
+                    if cursor is None:
+                        return ids, pages
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("sort", ["username", "createdAt", "xp", "level"])
+def test_pages_cover_the_listing_in_order(sort, descending):
+    section = uuid.uuid4().hex[:8]
+    ids, pages = _pages(section, sort, descending, limit=2)
+    expected = _expected(section, sort, descending)
+    assert ids == expected
+    assert pages == -(-len(expected) // 2)  # The last page is never empty
+
+
+def test_single_page_has_no_cursor():
+    section = uuid.uuid4().hex[:8]
+    ids, pages = _pages(section, "username", False, limit=100)
+    assert pages == 1
+    assert len(ids) == len(STUDENTS)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"sort": "mood"},
+    {"sort": "xp", "cursor": "not a cursor!"},
+    {"sort": "xp", "cursor": encode_cursor("username", "asha", "x-1")},
+])
+def test_bad_listing_requests_are_rejected(kwargs):
+    async def main():
+        try:
+            async with AsyncSessionLocal() as db:
+                await list_students(db, **kwargs)
+        finally:
+            await engine.dispose()
+
+    with pytest.raises(InvalidQuery):
+        asyncio.run(main())
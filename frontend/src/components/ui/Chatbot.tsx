@@ -22,6 +22,7 @@ const Chatbot = ({ context = 'general learning' }: ChatbotProps) => {
     const [input, setInput] = useState('');
     const [isLoading, setIsLoading] = useState(false);
     const [suggestions, setSuggestions] = useState(['Help with reading', 'Help with math', "I'm stuck"]);
+    const [sessionId, setSessionId] = useState<string | null>(null);
     const messagesEndRef = useRef<HTMLDivElement>(null);
 
     useEffect(() => {
@@ -43,7 +44,7 @@ const Chatbot = ({ context = 'general learning' }: ChatbotProps) => {
                 body: JSON.stringify({
                     message: text,
                     context,
-                    history: messages.slice(-6)
+                    sessionId
                 })
             });
 
@@ -51,6 +52,7 @@ const Chatbot = ({ context = 'general learning' }: ChatbotProps) => {
                 const data = await response.json();
                 setMessages(prev => [...prev, { role: 'assistant', content: data.reply }]);
                 setSuggestions(data.suggestions || []);
+                if (data.sessionId) setSessionId(data.sessionId);
             } else {
                 throw new Error('API error');
             }